@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2026 FreeIPA Contributors see COPYING for license
+#
+"""Micro benchmark for ipapython.dn
+
+Measures construction, comparison, hashing and endswith() throughput of
+DN objects for a set of DNs shaped like the results of a large user or
+group search. To compare two implementations, run the script from both
+source trees, e.g.
+
+    $ PYTHONPATH=. python3 contrib/dn-benchmark.py
+    $ git stash
+    $ PYTHONPATH=. python3 contrib/dn-benchmark.py
+"""
+import argparse
+import timeit
+
+from ipapython import dn as dnmod
+from ipapython.dn import DN
+
+
+BASEDN = 'dc=ipa,dc=example'
+CONTAINERS = (
+    'cn=users,cn=accounts',
+    'cn=groups,cn=accounts',
+    'cn=hosts,cn=accounts',
+    'cn=hbac',
+)
+
+
+def make_dns(count):
+    return [
+        'uid=user{0},{1},{2}'.format(i, CONTAINERS[i % len(CONTAINERS)],
+                                     BASEDN)
+        for i in range(count)
+    ]
+
+
+def report(name, ops, seconds):
+    print('{0:<28} {1:>12,.0f} ops/s'.format(name, ops / seconds))
+
+
+def bench(name, func, ops, repeat):
+    report(name, ops, min(timeit.repeat(func, number=1, repeat=repeat)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=20000,
+                        help='number of distinct DNs (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timing repetitions (default: %(default)s)')
+    args = parser.parse_args()
+
+    strings = make_dns(args.count)
+    container = DN(CONTAINERS[0], BASEDN)
+    cache = getattr(dnmod, 'str2rdns', None)
+
+    def construct_cold():
+        if cache is not None:
+            cache.cache_clear()
+        for s in strings:
+            DN(s)
+
+    def construct_warm():
+        for s in strings:
+            DN(s)
+
+    bench('construct (cold)', construct_cold, args.count, args.repeat)
+    bench('construct (warm)', construct_warm, args.count, args.repeat)
+
+    dns = [DN(s) for s in strings]
+    others = [DN(s) for s in strings]
+
+    bench('compare ==',
+          lambda: [a == b for a, b in zip(dns, others)],
+          args.count, args.repeat)
+    bench('construct + hash',
+          lambda: [hash(DN(s)) for s in strings],
+          args.count, args.repeat)
+    bench('endswith',
+          lambda: [d.endswith(container) for d in dns],
+          args.count, args.repeat)
+    bench('set membership',
+          lambda: len(set(dns).intersection(others)),
+          args.count, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2026 FreeIPA Contributors see COPYING for license
+#
+"""Startup benchmark for the client schema cache
+
+Writes a synthetic API schema in the zip format used by older clients and in
+the current indexed format, then measures how long it takes to load the
+cache and look up the schema and help of a single command, and the peak RSS
+of a fresh process doing so. This is what every "ipa <command>" invocation
+does before the command runs.
+
+    $ PYTHONPATH=. python3 contrib/schema-cache-benchmark.py
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import timeit
+import zipfile
+
+from ipaclient.remote_plugins import schema as schema_mod
+
+
+FINGERPRINT = 'benchmark'
+
+
+def make_schema(count):
+    param = {
+        'name': 'param', 'cli_name': 'param', 'type': 'str',
+        'doc': 'A parameter of a synthetic command. ' * 4,
+        'flags': ['no_update'], 'label': 'Parameter',
+    }
+    commands = {}
+    topics = {}
+    for i in range(count):
+        full_name = 'command{}/1'.format(i)
+        commands[full_name] = {
+            'full_name': full_name, 'name': 'command{}'.format(i),
+            'doc': 'Synthetic command {}.\n\n{}'.format(i, 'Details. ' * 40),
+            'topic_topic': 'topic{}/1'.format(i % 100),
+            'params': [dict(param, name='param{}'.format(j))
+                       for j in range(20)],
+            'output': [{'name': 'result', 'type': 'dict'}],
+        }
+    for i in range(100):
+        full_name = 'topic{}/1'.format(i)
+        topics[full_name] = {
+            'full_name': full_name, 'name': 'topic{}'.format(i),
+            'doc': 'Synthetic topic {}.\n\n{}'.format(i, 'Details. ' * 200),
+        }
+    return {'classes': {}, 'commands': commands, 'topics': topics}
+
+
+def write_zip(filename, data, halp):
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as schema:
+        for ns, members in data.items():
+            for name, value in members.items():
+                schema.writestr('{}/{}'.format(ns, name), json.dumps(value))
+        schema.writestr('_help', json.dumps(halp))
+
+
+def write_indexed(directory, data):
+    schema = schema_mod.Schema.__new__(schema_mod.Schema)
+    schema._dict = data
+    schema._help = schema._generate_help(data)
+    schema._DIR = directory
+    schema._write_schema(FINGERPRINT)
+    return schema._help
+
+
+def load_zip(filename, command):
+    # the zip cache reads every member at once and decodes on access
+    members = {}
+    with zipfile.ZipFile(filename, 'r') as schema:
+        for name in schema.namelist():
+            members[name] = schema.read(name)
+    json.loads(members['commands/' + command])
+    json.loads(members['_help'])
+
+
+def load_indexed(directory, command):
+    class BenchSchema(schema_mod.Schema):
+        _DIR = directory
+
+    schema = BenchSchema(None, FINGERPRINT)
+    schema['commands'][command]
+    schema['commands'].get_help(command)
+
+
+def maxrss(func, *args):
+    code = (
+        'import resource, sys\n'
+        'sys.path.insert(0, {path!r})\n'
+        'sys.argv = [None]\n'
+        'import runpy\n'
+        'mod = runpy.run_path({script!r}, run_name="bench")\n'
+        'base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n'
+        'mod[{func!r}](*{args!r})\n'
+        'rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n'
+        'print(rss - base)\n'
+    ).format(path=os.getcwd(), script=os.path.abspath(__file__),
+             func=func.__name__, args=args)
+    out = subprocess.check_output([sys.executable, '-c', code])
+    return int(out)
+
+
+def report(name, seconds, rss):
+    print('{0:<12} {1:>10.2f} ms {2:>10,} KiB'.format(
+        name, seconds * 1000, rss))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=2000,
+                        help='number of commands (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timing repetitions (default: %(default)s)')
+    args = parser.parse_args()
+
+    data = make_schema(args.count)
+    command = 'command{}/1'.format(args.count // 2)
+
+    with tempfile.TemporaryDirectory() as directory:
+        zipname = os.path.join(directory, 'schema.zip')
+        halp = write_indexed(directory, data)
+        write_zip(zipname, data, halp)
+
+        for name, func, arg in (('zip', load_zip, zipname),
+                                ('indexed', load_indexed, directory)):
+            seconds = min(timeit.repeat(lambda: func(arg, command),
+                                        number=1, repeat=args.repeat))
+            report(name, seconds, maxrss(func, arg, command))
+
+
+if __name__ == '__main__':
+    main()
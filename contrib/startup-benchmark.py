@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2026 FreeIPA Contributors see COPYING for license
+#
+"""Startup benchmark for the ipa command line client and the server API
+
+Every run uses a fresh interpreter, so module imports are included. A cold
+CLI start uses an empty schema cache, a warm start reuses the cache written
+by the cold start. The server run bootstraps and finalizes the API like a
+WSGI worker of httpd does, it is skipped on machines which are not an IPA
+server. Needs an enrolled client with a valid Kerberos ticket, e.g.
+
+    $ kinit admin
+    $ PYTHONPATH=. python3 contrib/startup-benchmark.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from ipaplatform.paths import paths
+
+
+PROFILE_SCRIPT = """
+import json
+import sys
+
+# like install/share/wsgi.py
+sys.modules['OpenSSL.SSL'] = None
+
+from ipalib import api
+
+api.bootstrap(context={context!r}, confdir={confdir!r}, log=None,
+              startup_profile=True)
+api.finalize()
+for name in {commands!r}:
+    api.Command[name].ensure_finalized()
+json.dump(api.startup_profile.timings, sys.stdout)
+"""
+
+
+def run_python(args, env=None):
+    """Run Python with args, return elapsed wall clock time and stdout"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable] + args, env=env, check=True,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    return time.perf_counter() - start, result.stdout
+
+
+def profile_api(context, commands=(), env=None):
+    script = PROFILE_SCRIPT.format(
+        context=context, confdir=paths.ETC_IPA, commands=tuple(commands))
+    elapsed, out = run_python(['-c', script], env=env)
+    return elapsed, json.loads(out.decode('utf-8'))
+
+
+def report(label, elapsed):
+    print('{0:<28} {1:>10.1f} ms'.format(label, elapsed * 1000))
+
+
+def report_profile(label, elapsed, timings, count):
+    report(label, elapsed)
+    for phase, items in timings.items():
+        report('  {}'.format(phase), sum(items.values()))
+        slowest = sorted(items.items(), key=lambda i: i[1], reverse=True)
+        for name, seconds in slowest[:count]:
+            report('    {}'.format(name), seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='warm runs, the fastest one is reported '
+                             '(default: %(default)s)')
+    parser.add_argument('--slowest', type=int, default=5,
+                        help='slowest items reported per phase '
+                             '(default: %(default)s)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = os.environ.copy()
+        env['XDG_CACHE_HOME'] = directory
+        argv = ['-m', 'ipaclient', 'help', 'user-show']
+
+        # the cold run fetches the schema and fills the cache
+        report('cli cold', run_python(argv, env=env)[0])
+        report('cli warm', min(run_python(argv, env=env)[0]
+                               for _i in range(args.repeat)))
+
+        elapsed, timings = profile_api('cli', ['user_show'], env=env)
+        report_profile('cli api', elapsed, timings, args.slowest)
+
+    if os.path.isfile(paths.HTTP_KEYTAB):
+        elapsed, timings = min(
+            (profile_api('server') for _i in range(args.repeat)),
+            key=lambda result: result[0]
+        )
+        report_profile('server api', elapsed, timings, args.slowest)
+
+
+if __name__ == '__main__':
+    main()
@@ -19,16 +19,21 @@
 
 from __future__ import absolute_import
 
+import concurrent.futures
+import json
 import logging
+import os
 import socket
+import threading
+import time
 
 import six
 
-from dns import rdatatype
+from dns import rdata, rdataclass, rdatatype
 from dns.exception import DNSException
 from ipalib import errors
 from ipalib.util import validate_domain_name
-from ipapython.dnsutil import query_srv, resolve
+from ipapython.dnsutil import resolve, sort_prio_weight
 
 from ipaplatform.paths import paths
 from ipapython.ipautil import valid_ip, realm_to_suffix
@@ -56,6 +61,11 @@ UNKNOWN_ERROR = -15
 
 IPA_BASEDN_INFO = 'ipa v2.0'
 
+# Number of DNS queries or LDAP server checks run at the same time
+DISCOVERY_WORKERS = 8
+# Seconds a failed DNS query is remembered by the running process
+DNS_NEGATIVE_TTL = 60
+
 error_names = {
     SUCCESS: 'Success',
     NOT_FQDN: 'NOT_FQDN',
@@ -70,6 +80,109 @@ error_names = {
 }
 
 
+def run_concurrently(func, args_list, workers=DISCOVERY_WORKERS):
+    """
+    Call func with each tuple of arguments in args_list on up to workers
+    threads and return the results in the order of args_list.
+    """
+    args_list = list(args_list)
+    if len(args_list) < 2 or workers < 2:
+        return [func(*args) for args in args_list]
+
+    with concurrent.futures.ThreadPoolExecutor(
+            min(workers, len(args_list))) as executor:
+        futures = [executor.submit(func, *args) for args in args_list]
+        try:
+            return [future.result() for future in futures]
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+class DNSCache:
+    """
+    Cache of the DNS records used by discovery.
+
+    Records are kept for the TTL of their answer. Found records are also
+    stored in a file when running as root, so that tools run one after
+    another (e.g. ipa-client-automount after ipa-client-install) query
+    them only once. Failed queries are remembered by the running process
+    for DNS_NEGATIVE_TTL seconds.
+    """
+
+    def __init__(self, path=paths.IPA_CLIENT_DISCOVERY_CACHE):
+        self._path = path
+        self._lock = threading.Lock()
+        self._records = None
+
+    def _load(self):
+        self._records = {}
+        try:
+            with open(self._path) as f:
+                # do not trust a file root did not write
+                if os.fstat(f.fileno()).st_uid != 0:
+                    return
+                records = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        now = time.time()
+        for key, (expires, texts) in records.items():
+            if expires > now:
+                self._records[key] = (expires, texts)
+
+    def _save(self):
+        if os.geteuid() != 0:
+            return
+        now = time.time()
+        records = {
+            key: value for key, value in self._records.items()
+            if value[1] and value[0] > now
+        }
+        try:
+            with open(self._path + '.tmp', 'w') as f:
+                json.dump(records, f)
+            os.rename(self._path + '.tmp', self._path)
+        except (IOError, OSError) as e:
+            logger.debug("Cannot store DNS records in %s: %s", self._path, e)
+
+    def resolve(self, qname, rdtype):
+        """
+        Return the list of records of the given type for qname.
+
+        An empty list is returned if the query fails.
+        """
+        key = '%s %s' % (rdatatype.to_text(rdtype), qname)
+        with self._lock:
+            if self._records is None:
+                self._load()
+            cached = self._records.get(key)
+        if cached is not None and cached[0] > time.time():
+            logger.debug("Using cached DNS records of %s", qname)
+            return [rdata.from_text(rdataclass.IN, rdtype, text)
+                    for text in cached[1]]
+
+        try:
+            answer = resolve(qname, rdtype)
+        except DNSException as e:
+            logger.debug("DNS record not found: %s", e.__class__.__name__)
+            with self._lock:
+                self._records[key] = (time.time() + DNS_NEGATIVE_TTL, [])
+            return []
+
+        records = list(answer)
+        with self._lock:
+            self._records[key] = (
+                time.time() + answer.rrset.ttl,
+                [r.to_text() for r in records],
+            )
+            self._save()
+        return records
+
+
+dns_cache = DNSCache()
+
+
 def get_ipa_basedn(conn):
     """
     Get base DN of IPA suffix in given LDAP server.
@@ -181,6 +294,7 @@ class IPADiscovery:
         servers = None
         logger.debug('Start searching for LDAP SRV record in "%s" (%s) '
                      'and its sub-domains', domain, reason)
+        self.prefetch(self.__get_parent_domains(domain))
         while not servers:
             if domain in tried:
                 logger.debug("Already searched %s; skipping", domain)
@@ -200,6 +314,30 @@ class IPADiscovery:
                 domain = domain[p + 1:]
         return None, None
 
+    @staticmethod
+    def __get_parent_domains(domain):
+        """Return domain followed by all its parent domains
+        """
+        labels = domain.split('.')
+        return ['.'.join(labels[i:]) for i in range(len(labels))]
+
+    def prefetch(self, domains):
+        """
+        Look up all DNS records used by discovery for the given domains
+        concurrently, so that the records are in the cache when the
+        domains are searched one by one.
+        """
+        queries = []
+        for domain in domains:
+            for qname, rdtype in (('_ldap._tcp.%s' % domain, rdatatype.SRV),
+                                  ('_kerberos.%s' % domain, rdatatype.TXT),
+                                  ('_kerberos._udp.%s' % domain,
+                                   rdatatype.SRV)):
+                if (qname, rdtype) not in queries:
+                    queries.append((qname, rdtype))
+        logger.debug("Prefetching %d DNS queries", len(queries))
+        run_concurrently(dns_cache.resolve, queries)
+
     def search(self, domain="", servers="", realm=None, hostname=None,
                ca_cert_path=None):
         """
@@ -243,6 +381,14 @@ class IPADiscovery:
                 # not first. We could end up with the wrong SRV record.
                 domains = self.__get_resolver_domains()
                 domains = [(domain, 'domain of the hostname')] + domains
+                valid_domains = []
+                for d, _reason in domains:
+                    try:
+                        validate_domain_name(d)
+                    except ValueError:
+                        continue
+                    valid_domains.extend(self.__get_parent_domains(d))
+                self.prefetch(valid_domains)
                 tried = set()
                 for domain, reason in domains:
                     # Domain name should not be single-label
@@ -265,6 +411,7 @@ class IPADiscovery:
                     return NO_LDAP_SERVER
             else:
                 logger.debug("Search for LDAP SRV record in %s", domain)
+                self.prefetch([domain])
                 servers = self.ipadns_search_srv(domain, '_ldap._tcp', 389,
                                                  break_on_first=False)
                 if servers:
@@ -312,13 +459,8 @@ class IPADiscovery:
         ldapaccess = True
         logger.debug("[LDAP server check]")
         valid_servers = []
-        for server in servers:
-            logger.debug('Verifying that %s (realm %s) is an IPA server',
-                         server, self.realm)
-            # check ldap now
-            ldapret = self.ipacheckldap(
-                server, self.realm, ca_cert_path=ca_cert_path
-            )
+        for server, ldapret in self.__check_servers(
+                servers, self.realm, ca_cert_path):
 
             if ldapret[0] == SUCCESS:
                 # Make sure that realm is not single-label
@@ -396,6 +538,32 @@ class IPADiscovery:
 
         return ldapret[0]
 
+    def __check_servers(self, servers, realm, ca_cert_path):
+        """
+        Check the servers concurrently, DISCOVERY_WORKERS at a time, and
+        yield (server, result of ipacheckldap) pairs in the order of
+        servers. The base DN found by a check is applied when its result
+        is yielded, as if the servers were checked one by one.
+        """
+        def check(server):
+            logger.debug('Verifying that %s (realm %s) is an IPA server',
+                         server, realm)
+            probe = IPADiscovery()
+            ldapret = probe.ipacheckldap(
+                server, realm, ca_cert_path=ca_cert_path)
+            return ldapret, probe.basedn, probe.basedn_source
+
+        servers = list(servers)
+        for i in range(0, len(servers), DISCOVERY_WORKERS):
+            chunk = servers[i:i + DISCOVERY_WORKERS]
+            results = run_concurrently(check, [(s,) for s in chunk])
+            for server, (ldapret, basedn, basedn_source) in zip(chunk,
+                                                                 results):
+                if basedn is not None:
+                    self.basedn = basedn
+                    self.basedn_source = basedn_source
+                yield server, ldapret
+
     def ipacheckldap(self, thost, trealm, ca_cert_path=None):
         """
         Given a host and kerberos realm verify that it is an IPA LDAP
@@ -527,11 +695,7 @@ class IPADiscovery:
 
         logger.debug("Search DNS for SRV record of %s", qname)
 
-        try:
-            answers = query_srv(qname)
-        except DNSException as e:
-            logger.debug("DNS record not found: %s", e.__class__.__name__)
-            answers = []
+        answers = sort_prio_weight(dns_cache.resolve(qname, rdatatype.SRV))
 
         for answer in answers:
             logger.debug("DNS record found: %s", answer)
@@ -561,11 +725,7 @@ class IPADiscovery:
 
         logger.debug("Search DNS for TXT record of %s", qname)
 
-        try:
-            answers = resolve(qname, rdatatype.TXT)
-        except DNSException as e:
-            logger.debug("DNS record not found: %s", e.__class__.__name__)
-            answers = []
+        answers = dns_cache.resolve(qname, rdatatype.TXT)
 
         realm = None
         for answer in answers:
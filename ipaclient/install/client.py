@@ -3556,6 +3556,7 @@ def uninstall(options):
     remove_file(paths.IPA_CA_CRT)
     remove_file(paths.KDC_CA_BUNDLE_PEM)
     remove_file(paths.CA_BUNDLE_PEM)
+    remove_file(paths.IPA_CLIENT_DISCOVERY_CACHE)
 
     logger.info("Client uninstall complete.")
 
@@ -23,12 +23,15 @@
 from __future__ import absolute_import, print_function
 
 import ast
+import concurrent.futures
 import grp
 import json
 import os
 import pwd
 import logging
+import queue
 import smtplib
+import threading
 import time
 
 from collections import deque
@@ -59,6 +62,8 @@ EPN_CONFIG = {
     "smtp_security": "none",
     "smtp_admin": "root@localhost",
     "smtp_delay": None,
+    "smtp_rate": None,
+    "smtp_connections": 1,
     "mail_from": None,
     "notify_ttls": "28,14,7,3,1",
     "msg_charset": "utf8",
@@ -66,6 +71,9 @@ EPN_CONFIG = {
     "msg_subject": "Your password will expire soon.",
 }
 
+# Number of messages sent between two throughput reports
+EPN_BATCH_SIZE = 1000
+
 logger = logging.getLogger(__name__)
 
 
@@ -98,6 +106,29 @@ def drop_privileges(new_username="daemon", new_groupname="daemon"):
         )
 
 
+class RateLimiter:
+    """Spaces out events shared by several threads so that there is at
+       least interval seconds between two of them.
+    """
+
+    def __init__(self, interval):
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        """Block until the next event is allowed.
+        """
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if delay > 0:
+            time.sleep(delay)
+
+
 class EPNUserList:
     """Maintains a list of users whose passwords are expiring.
        Provides add(), check(), pop(), and json_print().
@@ -206,9 +237,10 @@ class EPN(admintool.AdminTool):
         super(EPN, self).__init__(options, args)
         self._conn = None
         self._expiring_password_user_list = EPNUserList()
-        self._ldap_data = []
         self._date_ranges = []
-        self._mailer = None
+        self._mailers = []
+        self._rate_limiter = None
+        self._template = None
         self.env = None
         self.default_email_domain = None
 
@@ -300,27 +332,28 @@ class EPN(admintool.AdminTool):
         drop_privileges()
         if self.options.mailtest:
             self._gentestdata()
-        else:
-            if self.options.to_nbdays:
-                self._build_cli_date_ranges()
+        elif self.options.to_nbdays:
+            self._build_cli_date_ranges()
+        if self.options.dry_run:
             for date_range in self._date_ranges:
                 self._fetch_data_from_ldap(date_range)
-                self._parse_ldap_data()
-        if self.options.dry_run:
             self._pretty_print_data()
-        else:
-            self._mailer = MailUserAgent(
-                security_protocol=api.env.smtp_security,
-                smtp_hostname=api.env.smtp_server,
-                smtp_port=api.env.smtp_port,
-                smtp_timeout=api.env.smtp_timeout,
-                smtp_username=api.env.smtp_user,
-                smtp_password=api.env.smtp_password,
-                x_mailer=self.command_name,
-                msg_subtype=api.env.msg_subtype,
-                msg_charset=api.env.msg_charset,
-            )
-            self._send_emails()
+            return
+
+        # The date ranges are sorted and do not overlap, so notifying the
+        # users of one range after the other keeps the most urgent first
+        # and only holds the users of one range in memory.
+        self._create_mailers()
+        try:
+            if self.options.mailtest:
+                self._send_emails()
+            else:
+                for date_range in self._date_ranges:
+                    self._fetch_data_from_ldap(date_range)
+                    self._send_emails()
+        finally:
+            for mailer in self._mailers:
+                mailer.cleanup()
 
     def _get_date_range_from_nbdays(self, nbdays_end, nbdays_start=None):
         """Detects current time and returns a date range, given a number
@@ -406,6 +439,18 @@ class EPN(admintool.AdminTool):
                 raise RuntimeError('smtp_delay is misformatted: %s' % e)
             if float(api.env.smtp_delay) < 0:
                 raise RuntimeError('smtp_delay cannot be less than zero')
+        if api.env.smtp_rate is not None:
+            try:
+                float(api.env.smtp_rate)
+            except ValueError as e:
+                raise RuntimeError('smtp_rate is misformatted: %s' % e)
+            if float(api.env.smtp_rate) <= 0:
+                raise RuntimeError('smtp_rate must be greater than zero')
+        try:
+            if int(api.env.smtp_connections) < 1:
+                raise RuntimeError('smtp_connections must be at least 1')
+        except ValueError as e:
+            raise RuntimeError('smtp_connections is misformatted: %s' % e)
 
     def _parse_configuration(self):
         """
@@ -423,6 +468,13 @@ class EPN(admintool.AdminTool):
         loader = FileSystemLoader(os.path.join(api.env.confdir, 'epn'))
         self.env = Environment(loader=loader)
 
+        interval = 0
+        if api.env.smtp_delay:
+            interval = float(api.env.smtp_delay) / 1000
+        if api.env.smtp_rate is not None:
+            interval = max(interval, 1 / float(api.env.smtp_rate))
+        self._rate_limiter = RateLimiter(interval)
+
     def _read_ipa_configuration(self):
         """Get the IPA configuration"""
         api.Backend.rpcclient.connect()
@@ -458,8 +510,9 @@ class EPN(admintool.AdminTool):
         return self._conn
 
     def _fetch_data_from_ldap(self, date_range):
-        """Run a LDAP query to fetch a list of user entries whose passwords
-           would expire in the near future. Store in self._ldap_data.
+        """Run a paged LDAP query to fetch the user entries whose passwords
+           would expire in the near future. Add them to
+           self._expiring_password_user_list.
         """
 
         if self._conn is None:
@@ -481,31 +534,21 @@ class EPN(admintool.AdminTool):
             )
         )
 
+        count = 0
         try:
-            self._ldap_data = self._conn.get_entries(
+            for entry in self._conn.iter_entries(
                 search_base,
                 filter=search_filter,
                 attrs_list=attrs_list,
                 scope=self._conn.SCOPE_SUBTREE,
-            )
+                paged_search=True,
+            ):
+                self._expiring_password_user_list.add(entry)
+                count += 1
         except errors.EmptyResult:
             logger.debug("Empty Result.")
         finally:
-            logger.debug("%d entries found", len(self._ldap_data))
-
-    def _parse_ldap_data(self):
-        """Fill out self._expiring_password_user_list from data from ldap.
-        """
-        if self._ldap_data:
-            for entry in self._ldap_data:
-                self._expiring_password_user_list.add(entry)
-            # Validate json.
-            try:
-                self._pretty_print_data(really_print=False)
-            except Exception as e:
-                logger.error("IPA-EPN: Could not create JSON: %s", e)
-            finally:
-                self._ldap_data = []
+            logger.debug("%d entries found", count)
 
     def _pretty_print_data(self, really_print=True):
         """Dump self._expiring_password_user_list to JSON.
@@ -514,46 +557,116 @@ class EPN(admintool.AdminTool):
             really_print=really_print
         )
 
-    def _send_emails(self):
-        if self._mailer is None:
-            logger.error("IPA-EPN: mailer was not configured.")
-            return
-        else:
+    def _create_mailers(self):
+        """Connect to the SMTP server, one persistent connection for each
+           sending thread.
+        """
+        for _i in range(int(api.env.smtp_connections)):
+            self._mailers.append(
+                MailUserAgent(
+                    security_protocol=api.env.smtp_security,
+                    smtp_hostname=api.env.smtp_server,
+                    smtp_port=api.env.smtp_port,
+                    smtp_timeout=api.env.smtp_timeout,
+                    smtp_username=api.env.smtp_user,
+                    smtp_password=api.env.smtp_password,
+                    x_mailer=self.command_name,
+                    msg_subtype=api.env.msg_subtype,
+                    msg_charset=api.env.msg_charset,
+                )
+            )
+
+    def _get_template(self):
+        """Compile the message template once for all messages.
+        """
+        if self._template is None:
             try:
-                template = self.env.get_template("expire_msg.template")
+                self._template = self.env.get_template("expire_msg.template")
             except TemplateSyntaxError as e:
                 raise RuntimeError("Parsing template %s failed: %s" %
                                    (e.filename, e))
-            if api.env.mail_from:
-                mail_from = api.env.mail_from
-            else:
-                mail_from = "noreply@%s" % self.default_email_domain
-            while self._expiring_password_user_list:
-                entry = self._expiring_password_user_list.pop()
-                body = template.render(
-                    uid=entry["uid"],
-                    first=entry["givenname"],
-                    last=entry["sn"],
-                    fullname=entry["cn"],
-                    expiration=entry["krbpasswordexpiration"],
-                )
-                self._mailer.send_message(
-                    mail_subject=api.env.msg_subject,
-                    mail_body=body,
-                    subscribers=ast.literal_eval(entry["mail"]),
-                    mail_from=mail_from,
-                )
-                now = datetime.utcnow()
-                expdate = datetime.strptime(
-                    entry["krbpasswordexpiration"],
-                    '%Y-%m-%d %H:%M:%S')
-                logger.debug(
-                    "Notified %s (%s). Password expiring in %d days at %s.",
-                    entry["mail"], entry["uid"], (expdate - now).days,
-                    expdate)
-                if api.env.smtp_delay:
-                    time.sleep(float(api.env.smtp_delay) / 1000)
-            self._mailer.cleanup()
+        return self._template
+
+    def _send_email(self, mailer, entry, mail_from):
+        body = self._get_template().render(
+            uid=entry["uid"],
+            first=entry["givenname"],
+            last=entry["sn"],
+            fullname=entry["cn"],
+            expiration=entry["krbpasswordexpiration"],
+        )
+        self._rate_limiter.wait()
+        mailer.send_message(
+            mail_subject=api.env.msg_subject,
+            mail_body=body,
+            subscribers=ast.literal_eval(entry["mail"]),
+            mail_from=mail_from,
+        )
+        now = datetime.utcnow()
+        expdate = datetime.strptime(
+            entry["krbpasswordexpiration"],
+            '%Y-%m-%d %H:%M:%S')
+        logger.debug(
+            "Notified %s (%s). Password expiring in %d days at %s.",
+            entry["mail"], entry["uid"], (expdate - now).days,
+            expdate)
+
+    def _send_batch(self, batch, mail_from):
+        """Send the messages for the users in batch, each mailer is used
+           by one thread at a time.
+        """
+        mailers = self._mailers[:len(batch)]
+        if len(mailers) == 1:
+            for entry in batch:
+                self._send_email(mailers[0], entry, mail_from)
+            return
+
+        idle = queue.Queue()
+        for mailer in mailers:
+            idle.put(mailer)
+
+        def send(entry):
+            # there are as many mailers as threads, one is always idle
+            mailer = idle.get_nowait()
+            try:
+                self._send_email(mailer, entry, mail_from)
+            finally:
+                idle.put(mailer)
+
+        with concurrent.futures.ThreadPoolExecutor(len(mailers)) as executor:
+            futures = [executor.submit(send, entry) for entry in batch]
+            try:
+                for future in futures:
+                    future.result()
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _send_emails(self):
+        if not self._mailers:
+            logger.error("IPA-EPN: mailer was not configured.")
+            return
+
+        self._get_template()
+        if api.env.mail_from:
+            mail_from = api.env.mail_from
+        else:
+            mail_from = "noreply@%s" % self.default_email_domain
+
+        while self._expiring_password_user_list:
+            batch = []
+            while (self._expiring_password_user_list and
+                   len(batch) < EPN_BATCH_SIZE):
+                batch.append(self._expiring_password_user_list.pop())
+            start = time.monotonic()
+            self._send_batch(batch, mail_from)
+            duration = time.monotonic() - start
+            logger.info(
+                "IPA-EPN: Sent %d messages in %.3f sec (%.1f messages/sec)",
+                len(batch), duration,
+                len(batch) / duration if duration else len(batch),
+            )
 
     def _gentestdata(self):
         """Generate a sample user to process through the template.
@@ -633,9 +746,19 @@ class MTAClient:
     def send_message(self, message_str=None, subscribers=None):
         result = None
         try:
-            result = self._conn.sendmail(
-                api.env.smtp_admin, subscribers, message_str,
-            )
+            try:
+                result = self._conn.sendmail(
+                    api.env.smtp_admin, subscribers, message_str,
+                )
+            except smtplib.SMTPServerDisconnected:
+                # the connection is kept open for many messages and the
+                # server may have closed it in the meantime
+                logger.debug("IPA-EPN: SMTP server disconnected, "
+                             "reconnecting")
+                self._connect()
+                result = self._conn.sendmail(
+                    api.env.smtp_admin, subscribers, message_str,
+                )
         except Exception as e:
             logger.info("IPA-EPN: Failed to send mail: %s", e)
         finally:
@@ -734,7 +857,10 @@ class MTAClient:
                 logger.error(err_str)
 
     def _disconnect(self):
-        self._conn.quit()
+        try:
+            self._conn.quit()
+        except smtplib.SMTPServerDisconnected:
+            pass
 
 
 class MailUserAgent:
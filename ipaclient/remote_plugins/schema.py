@@ -5,11 +5,12 @@
 import errno
 import json
 import logging
+import mmap
 import os
+import struct
 import sys
 import tempfile
 import types
-import zipfile
 
 from cryptography import x509 as crypto_x509
 
@@ -36,7 +37,14 @@ else:
 
 logger = logging.getLogger(__name__)
 
-FORMAT = '1'
+FORMAT = '2'
+
+# Cache file layout: magic, length of the index as unsigned 64-bit little
+# endian integer, index, data. The index is a JSON object that maps every
+# namespace member and '_help' to an [offset, length] pair of its JSON
+# in the data section, so a single member is read without parsing the rest.
+_MAGIC = b'IPASCHEMA\n'
+_INDEX_LENGTH = struct.Struct('<Q')
 
 if six.PY3:
     unicode = str
@@ -348,6 +356,18 @@ class _SchemaNameSpace(Mapping):
             raise KeyError(key)
 
 
+class _SchemaTopicModule(types.ModuleType):
+    """Module of a help topic that reads its documentation on demand"""
+
+    def set_topic_schema(self, topics, full_name):
+        self._topics = topics
+        self._full_name = full_name
+
+    @property
+    def __doc__(self):
+        return self._topics[self._full_name].get('doc')
+
+
 class NotAvailable(Exception):
     pass
 
@@ -379,6 +399,8 @@ class Schema:
         self._dict = {}
         self._namespaces = {}
         self._help = None
+        self._data = None
+        self._data_offset = 0
 
         for ns in self.namespaces:
             self._dict[ns] = {}
@@ -444,16 +466,32 @@ class Schema:
         return (fp, ttl,)
 
     def _read_schema(self, fingerprint):
-        # It's more efficient to read zip file members at once than to open
-        # the zip file a couple of times, see #6690.
+        # The cache file is memory-mapped and only the index is parsed
+        # here. Members are decoded on first access, so a command touches
+        # only the pages of the schema it actually uses.
         filename = os.path.join(self._DIR, fingerprint)
-        with zipfile.ZipFile(filename, 'r') as schema:
-            for name in schema.namelist():
-                ns, _slash, key = name.partition('/')
-                if ns in self.namespaces:
-                    self._dict[ns][key] = schema.read(name)
-                elif name == '_help':
-                    self._help = schema.read(name)
+        with open(filename, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        offset = len(_MAGIC)
+        if data[:offset] != _MAGIC:
+            raise ValueError("{}: unknown schema format".format(filename))
+        (length,) = _INDEX_LENGTH.unpack_from(data, offset)
+        offset += _INDEX_LENGTH.size
+        index = json.loads(data[offset:offset + length].decode('utf-8'))
+
+        for ns in self.namespaces:
+            self._dict[ns] = {
+                key: tuple(location) for key, location in index[ns].items()
+            }
+        self._help = tuple(index['_help'])
+        self._data = data
+        self._data_offset = offset + length
+
+    def _read_data(self, location):
+        offset, length = location
+        offset += self._data_offset
+        return json.loads(self._data[offset:offset + length].decode('utf-8'))
 
     def __getitem__(self, key):
         try:
@@ -502,27 +540,35 @@ class Schema:
                 os.rename(f.name, os.path.join(self._DIR, fingerprint))
 
     def _write_schema_data(self, fileobj):
-        with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as schema:
-            for key, value in self._dict.items():
-                if key in self.namespaces:
-                    ns = value
-                    for member in ns:
-                        path = '{}/{}'.format(key, member)
-                        s = json.dumps(ns[member], default=json_default)
-                        schema.writestr(path, s.encode('utf-8'))
-                else:
-                    schema.writestr(key, json.dumps(value).encode('utf-8'))
-
-            schema.writestr(
-                '_help',
-                json.dumps(self._help, default=json_default).encode('utf-8')
-            )
+        index = {}
+        chunks = []
+        offset = 0
+
+        for key in self.namespaces:
+            ns = self._dict[key]
+            index[key] = {}
+            for member in ns:
+                s = json.dumps(ns[member], default=json_default)
+                chunks.append(s.encode('utf-8'))
+                index[key][member] = (offset, len(chunks[-1]))
+                offset += len(chunks[-1])
+
+        s = json.dumps(self._help, default=json_default)
+        chunks.append(s.encode('utf-8'))
+        index['_help'] = (offset, len(chunks[-1]))
+
+        index_data = json.dumps(index).encode('utf-8')
+        fileobj.write(_MAGIC)
+        fileobj.write(_INDEX_LENGTH.pack(len(index_data)))
+        fileobj.write(index_data)
+        for chunk in chunks:
+            fileobj.write(chunk)
 
     def read_namespace_member(self, namespace, member):
         value = self._dict[namespace][member]
 
-        if isinstance(value, bytes):
-            value = json.loads(value.decode('utf-8'))
+        if isinstance(value, tuple):
+            value = self._read_data(value)
             self._dict[namespace][member] = value
 
         return value
@@ -531,10 +577,8 @@ class Schema:
         return iter(self._dict[namespace])
 
     def get_help(self, namespace, member):
-        if isinstance(self._help, bytes):
-            self._help = json.loads(
-                self._help.decode('utf-8')  # pylint: disable=no-member
-            )
+        if isinstance(self._help, tuple):
+            self._help = self._read_data(self._help)
 
         return self._help[namespace][member]
 
@@ -595,15 +639,20 @@ def get_package(server_info, client):
             plugin = module.register()(plugin)  # pylint: disable=no-member
     sys.modules[module_name] = module
 
-    for full_name, topic in six.iteritems(schema['topics']):
+    # topic modules are created from the help index; the full topic schema
+    # is only read when the documentation of the topic is displayed
+    topics = schema['topics']
+    for full_name in topics:
+        topic = topics.get_help(full_name)
         name = str(topic['name'])
         module_name = '.'.join((package_name, name))
         try:
             module = sys.modules[module_name]
         except KeyError:
-            module = sys.modules[module_name] = types.ModuleType(module_name)
+            module = sys.modules[module_name] = _SchemaTopicModule(
+                module_name)
             module.__file__ = os.path.join(package_dir, '{}.py'.format(name))
-        module.__doc__ = topic.get('doc')
+        module.set_topic_schema(topics, full_name)
         if 'topic_topic' in topic:
             s = topic['topic_topic']
             if isinstance(s, bytes):
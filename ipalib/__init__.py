@@ -958,6 +958,13 @@ class API(plugable.API):
 
         return result
 
+    @property
+    def eager_bases(self):
+        # WSGI applications mount themselves when they are finalized
+        if self.env.in_server:
+            return (Backend,)
+        return ()
+
 
 def create_api(mode='dummy'):
     """
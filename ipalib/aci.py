@@ -17,13 +17,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import shlex
+import functools
 import re
 
-import six
+# Maximum number of parsed ACI strings kept by parse_aci()
+ACI_CACHE_SIZE = 4096
 
 # The Python re module doesn't do nested parenthesis
 
+# A single target: (keyword = "expression") or (keyword != "expression")
+TargetPat = re.compile(r'\s*\(\s*([\w.]+)\s*(!?)\s*=\s*'
+                       r'("[^"]*"|\'[^\']*\'|[\w.]+|[^\w\s])\s*\)',
+                       re.UNICODE)
+
 # Break the ACI into 3 pieces: target, name, permissions/bind_rules
 ACIPat = re.compile(r'\(version\s+3.0\s*;\s*ac[li]\s+\"([^\"]*)\"\s*;'
                     r'\s*(.*);\s*\)', re.UNICODE)
@@ -59,7 +65,20 @@ class ACI:
         self.permissions = ["write"]
         self.bindrule = {}
         if acistr is not None:
-            self._parse_acistr(acistr)
+            self._copy_parsed(parse_aci(acistr))
+
+    def _copy_parsed(self, other):
+        """Copy the parsed components of another ACI"""
+        self.name = other.name
+        self.action = other.action
+        self.permissions = list(other.permissions)
+        self.bindrule = dict(other.bindrule)
+        self.target = {}
+        for var, value in other.target.items():
+            value = dict(value)
+            if isinstance(value['expression'], list):
+                value['expression'] = list(value['expression'])
+            self.target[var] = value
 
     def __getitem__(self,key):
         """Fake getting attributes by key for sorting"""
@@ -115,29 +134,18 @@ class ACI:
         return s
 
     def _parse_target(self, aci):
-        if six.PY2:
-            aci = aci.encode('utf-8')
-        lexer = shlex.shlex(aci)
-        lexer.wordchars = lexer.wordchars + "."
-
-        var = False
-        op = "="
-        for token in lexer:
-            # We should have the form (a = b)(a = b)...
-            if token == "(":
-                var = next(lexer).strip()
-                operator = next(lexer)
-                if operator not in ("=", "!="):
-                    # Peek at the next char before giving up
-                    operator = operator + next(lexer)
-                    if operator not in ("=", "!="):
-                        raise SyntaxError("No operator in target, got '%s'" % operator)
-                op = operator
-                val = next(lexer).strip()
-                val = self._remove_quotes(val)
-                end = next(lexer)
-                if end != ")":
-                    raise SyntaxError('No end parenthesis in target, got %s' % end)
+        # We should have the form (a = b)(a = b)...
+        pos = 0
+        end = len(aci.rstrip())
+        while pos < end:
+            match = TargetPat.match(aci, pos)
+            if match is None:
+                raise SyntaxError(
+                    "malformed target in ACI, got '%s'" % aci[pos:].strip())
+            pos = match.end()
+            var = match.group(1)
+            op = match.group(2) + "="
+            val = self._remove_quotes(match.group(3).strip())
 
             if var == 'targetattr':
                 # Make a string of the form attr || attr || ... into a list
@@ -288,3 +296,17 @@ class ACI:
 
     def __ne__(self, b):
         return not self == b
+
+
+@functools.lru_cache(maxsize=ACI_CACHE_SIZE)
+def parse_aci(acistr):
+    """
+    Parse an ACI string, reusing the result for identical strings.
+
+    The returned object is shared by all callers and must not be modified.
+    ``ACI(acistr)`` returns a private copy.
+    """
+    aci = ACI()
+    aci.orig_acistr = acistr
+    aci._parse_acistr(acistr)  # pylint: disable=protected-access
+    return aci
@@ -518,10 +518,6 @@ class Env:
                 "tls_ca_cert has to be an absolute path to a CA certificate, "
                 "got '{}'".format(self.tls_ca_cert))
 
-        # Set plugins_on_demand:
-        if 'plugins_on_demand' not in self:
-            self.plugins_on_demand = (self.context == 'cli')
-
     def _finalize_core(self, **defaults):
         """
         Complete initialization of standard IPA environment.
@@ -571,6 +567,11 @@ class Env:
         if 'in_server' not in self:
             self.in_server = (self.context == 'server')
 
+        # Set plugins_on_demand, after the config files so that the server
+        # can be switched back to finalizing all plugins at startup:
+        if 'plugins_on_demand' not in self:
+            self.plugins_on_demand = self.context in ('cli', 'server')
+
         # Set logdir:
         if 'logdir' not in self:
             if self.in_tree or not self.in_server:
@@ -188,10 +188,22 @@ DEFAULT_CONFIG = (
     # Session stuff:
     ('kinit_lifetime', None),
 
+    # Number of threads used to run consecutive read-only commands of a
+    # batch concurrently, 0 runs the whole batch sequentially
+    ('batch_parallel_workers', 0),
+
+    # Number of idle GSSAPI-bound LDAP connections the server keeps per
+    # principal for reuse by later requests, 0 disables the pool
+    ('ldap_pool_size', 4),
+    # Maximum time a pooled LDAP connection is reused [seconds]
+    ('ldap_pool_ttl', 60),
+
     # Debugging:
     ('verbose', 0),
     ('debug', False),
     ('startup_traceback', False),
+    # Record plugin import and finalize times, see StartupProfile
+    ('startup_profile', False),
     ('mode', 'production'),
     ('wait_for_dns', 0),
 
@@ -259,12 +271,12 @@ DEFAULT_CONFIG = (
     ('env_confdir', None),  # conf dir specified by IPA_CONFDIR env variable
     ('conf', object),  # File containing context specific config
     ('conf_default', object),  # File containing context independent config
-    ('plugins_on_demand', object),  # Whether to finalize plugins on-demand (bool)
     ('nss_dir', object),  # Path to nssdb, default {confdir}/nssdb
     ('tls_ca_cert', object),  # Path to CA cert file
 
     # Set in Env._finalize_core():
     ('in_server', object),  # Whether or not running in-server (bool)
+    ('plugins_on_demand', object),  # Whether to finalize plugins on-demand (bool)
     ('logdir', object),  # Directory containing log files
     ('log', object),  # Path to context specific log file
 
@@ -30,6 +30,7 @@ import operator
 import re
 import sys
 import threading
+import time
 import os
 from os import path
 import optparse  # pylint: disable=deprecated-module
@@ -131,6 +132,53 @@ class Registry:
         return iter(self.__registry.values())
 
 
+class StartupProfile:
+    """
+    Import and initialization times of an `API` instance.
+
+    Enabled by the ``startup_profile`` environment variable. Times are
+    recorded per phase: ``api`` for the bootstrap, load_plugins and finalize
+    steps, ``import`` for plugin modules, ``instantiate`` and ``finalize`` for
+    plugins. Import and finalize times include the time spent in nested
+    imports and finalizations.
+    """
+
+    PHASES = ('api', 'import', 'instantiate', 'finalize')
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.timings = {phase: {} for phase in self.PHASES}
+
+    def add(self, phase, name, start):
+        """
+        Record the time elapsed since ``start`` (a `time.perf_counter` value).
+        """
+        elapsed = time.perf_counter() - start
+        with self.__lock:
+            timings = self.timings[phase]
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+    def total(self, phase):
+        return sum(self.timings[phase].values())
+
+    def slowest(self, phase, count=None):
+        """
+        Return a list of ``(name, seconds)`` pairs, slowest first.
+        """
+        items = sorted(self.timings[phase].items(),
+                       key=operator.itemgetter(1), reverse=True)
+        return items[:count]
+
+    def log_summary(self, count=10):
+        for phase in self.PHASES:
+            logger.info("startup profile: %s: %d items, %.1f ms",
+                        phase, len(self.timings[phase]),
+                        self.total(phase) * 1000)
+            for name, seconds in self.slowest(phase, count):
+                logger.info("startup profile: %10.1f ms  %s",
+                            seconds * 1000, name)
+
+
 class Plugin(ReadOnly):
     """
     Base class for all plugins.
@@ -143,7 +191,12 @@ class Plugin(ReadOnly):
         self.__api = api
         self.__finalize_called = False
         self.__finalized = False
-        self.__finalize_lock = threading.RLock()
+        # Plugins finalized on demand finalize other plugins they depend on,
+        # so they share the lock of their API to rule out lock order
+        # inversions between threads.
+        self.__finalize_lock = getattr(api, '_API__lock', None)
+        if self.__finalize_lock is None:
+            self.__finalize_lock = threading.RLock()
 
     @classmethod
     def __name_getter(cls):
@@ -217,8 +270,12 @@ class Plugin(ReadOnly):
                 # No recursive calls!
                 return
             self.__finalize_called = True
+            start = time.perf_counter()
             self._on_finalize()
             self.__finalized = True
+            profile = getattr(self.__api, 'startup_profile', None)
+            if profile is not None:
+                profile.add('finalize', self.full_name, start)
             if not self.__api.is_production_mode():
                 lock(self)
 
@@ -234,6 +291,8 @@ class Plugin(ReadOnly):
         """
         Finalize plugin initialization if it has not yet been finalized.
         """
+        if self.__finalized:
+            return
         with self.__finalize_lock:
             if not self.__finalized:
                 self.finalize()
@@ -298,9 +357,14 @@ class APINameSpace(Mapping):
         if self.__plugins is not None and self.__plugins_by_key is not None:
             return
 
+        with self.__api._API__lock:
+            if self.__plugins is None:
+                self.__do_enumerate()
+
+    def __do_enumerate(self):
         default_map = self.__api._API__default_map
         plugins = set()
-        key_dict = self.__plugins_by_key = {}
+        key_dict = {}
 
         for plugin in self.__api._API__plugins:
             if not any(issubclass(b, self.__base) for b in plugin.bases):
@@ -312,6 +376,7 @@ class APINameSpace(Mapping):
             if plugin.version == default_map.get(plugin.name, '1'):
                 key_dict[plugin.name] = plugin
 
+        self.__plugins_by_key = key_dict
         self.__plugins = sorted(plugins, key=operator.attrgetter('full_name'))
 
     def __len__(self):
@@ -365,7 +430,10 @@ class API(ReadOnly):
         self.__instances = {}
         self.__next = {}
         self.__done = set()
+        # Guards on-demand instantiation and finalization of plugins
+        self.__lock = threading.RLock()
         self.env = Env()
+        self.startup_profile = None
 
     @property
     def bases(self):
@@ -375,6 +443,14 @@ class API(ReadOnly):
     def packages(self):
         raise NotImplementedError
 
+    @property
+    def eager_bases(self):
+        """
+        Bases whose plugins are finalized by `finalize()` even when plugins
+        are finalized on demand.
+        """
+        return ()
+
     def __len__(self):
         """
         Return the number of plugin namespaces in this API object.
@@ -444,10 +520,15 @@ class API(ReadOnly):
         """
         Initialize environment variables and logging.
         """
+        start = time.perf_counter()
         self.__doing('bootstrap')
         self.env._bootstrap(**overrides)
         self.env._finalize_core(**dict(DEFAULT_CONFIG))
 
+        if self.env.startup_profile:  # pylint: disable=using-constant-test
+            self.startup_profile = StartupProfile()
+            self.startup_profile.add('api', 'bootstrap', start)
+
         # Add the argument parser
         if not parser:
             parser = self.build_global_parser()
@@ -635,8 +716,11 @@ class API(ReadOnly):
         self.__do_if_not_done('bootstrap')
         if self.env.mode in ('dummy', 'unit_test'):
             return
+        start = time.perf_counter()
         for package in self.packages:
             self.add_package(package)
+        if self.startup_profile is not None:
+            self.startup_profile.add('api', 'load_plugins', start)
 
     # FIXME: This method has no unit test
     def add_package(self, package):
@@ -662,6 +746,7 @@ class API(ReadOnly):
 
         for name in modules:
             logger.debug("importing plugin module %s", name)
+            start = time.perf_counter()
             try:
                 module = importlib.import_module(name)
             except errors.SkipPluginModule as e:
@@ -672,6 +757,8 @@ class API(ReadOnly):
                 if tb:  # pylint: disable=using-constant-test
                     logger.exception("could not load plugin module %s", name)
                 raise
+            if self.startup_profile is not None:
+                self.startup_profile.add('import', name, start)
 
             try:
                 self.add_module(module)
@@ -757,6 +844,7 @@ class API(ReadOnly):
         """
         self.__doing('finalize')
         self.__do_if_not_done('load_plugins')
+        start = time.perf_counter()
 
         if self.env.env_confdir is not None:
             if self.env.env_confdir == self.env.confdir:
@@ -783,12 +871,14 @@ class API(ReadOnly):
             self.__default_map[plugin.name] = plugin.version
 
         production_mode = self.is_production_mode()
+        eager_bases = tuple(self.eager_bases)
 
         for base in self.bases:
+            eager = not self.env.plugins_on_demand or base in eager_bases
             for plugin in self.__plugins:
                 if not any(issubclass(b, base) for b in plugin.bases):
                     continue
-                if not self.env.plugins_on_demand:
+                if eager:
                     self._get(plugin)
 
             name = base.__name__
@@ -796,16 +886,22 @@ class API(ReadOnly):
                 assert not hasattr(self, name)
             setattr(self, name, APINameSpace(self, base))
 
-        for instance in six.itervalues(self.__instances):
+        # finalizing a plugin may instantiate the plugins it depends on
+        for instance in list(self.__instances.values()):
             if not production_mode:
                 assert instance.api is self
-            if not self.env.plugins_on_demand:
+            if (not self.env.plugins_on_demand or
+                    isinstance(instance, eager_bases)):
                 instance.ensure_finalized()
                 if not production_mode:
                     assert islocked(instance)
 
         self.__finalized = True
 
+        if self.startup_profile is not None:
+            self.startup_profile.add('api', 'finalize', start)
+            self.startup_profile.log_summary()
+
         if not production_mode:
             lock(self)
 
@@ -816,9 +912,19 @@ class API(ReadOnly):
             raise KeyError(plugin)
 
         try:
-            instance = self.__instances[plugin]
+            return self.__instances[plugin]
         except KeyError:
-            instance = self.__instances[plugin] = plugin(self)
+            pass
+
+        with self.__lock:
+            try:
+                instance = self.__instances[plugin]
+            except KeyError:
+                start = time.perf_counter()
+                instance = self.__instances[plugin] = plugin(self)
+                if self.startup_profile is not None:
+                    self.startup_profile.add(
+                        'instantiate', plugin.full_name, start)
 
         return instance
 
@@ -43,6 +43,7 @@ import re
 import socket
 import gzip
 import urllib
+import zlib
 from ssl import SSLError
 
 from cryptography import x509 as crypto_x509
@@ -277,6 +278,45 @@ def xml_dumps(params, version, methodname=None, methodresponse=False,
     )
 
 
+class EncodedJSONDict(dict):
+    """dict that carries its own JSON encoding
+
+    json_encode_binary() inserts the stored encoding instead of priming and
+    serializing the content again. Only use it for data that is encoded the
+    same way for all client versions: text, numbers, booleans, None, lists
+    and dicts.
+
+    :param data: dict content
+    :param encoded: UTF-8 encoded JSON of data, serialized if not given
+    """
+    __slots__ = ('encoded', '_deflated')
+
+    def __init__(self, data, encoded=None):
+        super(EncodedJSONDict, self).__init__(data)
+        if encoded is None:
+            encoded = json.dumps(data).encode('utf-8')
+        self.encoded = encoded
+        self._deflated = None
+
+    def get_deflated(self):
+        """Return the encoded JSON as raw deflate stream
+
+        The stream ends with a full flush instead of a final block, so it
+        can be embedded into another deflate stream. It is compressed only
+        once.
+        """
+        if self._deflated is None:
+            compressor = zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+            self._deflated = (compressor.compress(self.encoded) +
+                              compressor.flush(zlib.Z_FULL_FLUSH))
+        return self._deflated
+
+    def set_deflated(self, deflated):
+        """Set a raw deflate stream previously returned by get_deflated()"""
+        self._deflated = deflated
+
+
 class _JSONPrimer(dict):
     """Fast JSON primer and pre-converter
 
@@ -300,13 +340,15 @@ class _JSONPrimer(dict):
     * bytes -> {'__base64__': b64encode}
     * datetime -> {'__datetime__': LDAP_GENERALIZED_TIME}
     * DNSName -> {'__dns_name__': unicode}
+    * EncodedJSONDict -> placeholder text, see json_encode_parts()
 
     The _ipa_obj_hook() functions unserializes the marked JSON objects to
     bytes, datetime and DNSName.
 
     :see: _ipa_obj_hook
     """
-    __slots__ = ('version', '_cap_datetime', '_cap_dnsname')
+    __slots__ = ('version', '_cap_datetime', '_cap_dnsname', 'fragments',
+                 'placeholder')
 
     _identity = object()
 
@@ -315,6 +357,8 @@ class _JSONPrimer(dict):
         self.version = version
         self._cap_datetime = None
         self._cap_dnsname = None
+        self.fragments = []
+        self.placeholder = None
         self.update({
             unicode: _identity,
             bool: _identity,
@@ -332,6 +376,7 @@ class _JSONPrimer(dict):
             dict: self._enc_dict,
             crypto_x509.Certificate: self._enc_certificate,
             crypto_x509.CertificateSigningRequest: self._enc_certificate,
+            EncodedJSONDict: self._enc_fragment,
         })
 
     def __missing__(self, typ):
@@ -398,6 +443,41 @@ class _JSONPrimer(dict):
     def _enc_certificate(self, val):
         return self._enc_bytes(val.public_bytes(x509_Encoding.DER))
 
+    def _enc_fragment(self, val):
+        if self.placeholder is None:
+            # NUL is always escaped by json.dumps(), so the placeholder
+            # cannot be confused with a string of the serialized data
+            self.placeholder = u'\x00{}\x00'.format(os.urandom(8).hex())
+        self.fragments.append(val)
+        return u'{}{}'.format(self.placeholder, len(self.fragments) - 1)
+
+
+def json_encode_parts(val, version, pretty_print=False):
+    """Serialize a Python object structure to JSON fragments
+
+    Like json_encode_binary(), but the EncodedJSONDict objects in val are
+    not expanded. Returns the serialized text split around them, i.e. a
+    list of text and EncodedJSONDict items in output order.
+    """
+    primer = _JSONPrimer(version)
+    result = primer.convert(val)
+    if pretty_print:
+        dump = json.dumps(result, indent=4, sort_keys=True)
+    else:
+        dump = json.dumps(result)
+    if not primer.fragments:
+        return [dump]
+
+    placeholder = re.escape(json.dumps(primer.placeholder)[:-1])
+    pieces = re.split(r'{}(\d+)"'.format(placeholder), dump)
+    parts = []
+    for i, piece in enumerate(pieces):
+        if i % 2:
+            parts.append(primer.fragments[int(piece)])
+        elif piece:
+            parts.append(piece)
+    return parts
+
 
 def json_encode_binary(val, version, pretty_print=False):
     """Serialize a Python object structure to JSON
@@ -409,11 +489,14 @@ def json_encode_binary(val, version, pretty_print=False):
     :note: pretty printing triggers a slow path in Python's JSON module. Only
            use pretty_print in debug mode.
     """
-    result = _JSONPrimer(version).convert(val)
-    if pretty_print:
-        return json.dumps(result, indent=4, sort_keys=True)
-    else:
-        return json.dumps(result)
+    parts = json_encode_parts(val, version, pretty_print=pretty_print)
+    if len(parts) == 1 and isinstance(parts[0], str):
+        return parts[0]
+    return u''.join(
+        part.encoded.decode('utf-8') if isinstance(part, EncodedJSONDict)
+        else part
+        for part in parts
+    )
 
 
 def _ipa_obj_hook(dct, _iteritems=six.iteritems, _list=list):
@@ -562,6 +562,30 @@ else:
         return s
 
 
+# Number of DN strings whose parsed form is remembered by str2rdns().
+DN_CACHE_SIZE = 8192
+
+
+@functools.lru_cache(maxsize=DN_CACHE_SIZE)
+def str2rdns(value):
+    """
+    Parse a DN string into RDNs with sorted AVAs and their comparison keys.
+
+    The same DN strings (base DN, containers, group DNs in member values)
+    are parsed over and over again, so the result is cached. The returned
+    RDNs are tuples because they are shared between all DN objects
+    created from the same string.
+    """
+    try:
+        rdns = str2dn(val_encode(value))
+    except DECODING_ERROR:
+        raise ValueError("malformed RDN string = \"%s\"" % value)
+    for rdn in rdns:
+        sort_avas(rdn)
+    rdns = tuple(tuple(tuple(ava) for ava in rdn) for rdn in rdns)
+    return rdns, tuple(rdn_key(rdn) for rdn in rdns)
+
+
 @functools.total_ordering
 class AVA:
     '''
@@ -1109,8 +1133,23 @@ class DN:
     AVA_type = AVA
     RDN_type = RDN
 
+    # normalized comparison keys of the RDNs and the hash derived from
+    # them, computed on first use (DN objects are never modified in place)
+    _keys = None
+    _hash = None
+
     def __init__(self, *args, **kwds):
-        self.rdns = self._rdns_from_sequence(args)
+        if len(args) == 1 and isinstance(args[0], str):
+            rdns, self._keys = str2rdns(args[0])
+            self.rdns = list(rdns)
+        else:
+            self.rdns = self._rdns_from_sequence(args)
+
+    def _get_keys(self):
+        keys = self._keys
+        if keys is None:
+            keys = self._keys = tuple(rdn_key(rdn) for rdn in self.rdns)
+        return keys
 
     def _copy_rdns(self, rdns=None):
         if not rdns:
@@ -1119,14 +1158,7 @@ class DN:
 
     def _rdns_from_value(self, value):
         if isinstance(value, str):
-            try:
-                if isinstance(value, str):
-                    value = val_encode(value)
-                rdns = str2dn(value)
-            except DECODING_ERROR:
-                raise ValueError("malformed RDN string = \"%s\"" % value)
-            for rdn in rdns:
-                sort_avas(rdn)
+            rdns = str2rdns(value)[0]
         elif isinstance(value, DN):
             rdns = value._copy_rdns()
         elif isinstance(value, (tuple, list, AVA)):
@@ -1192,6 +1224,8 @@ class DN:
             cls = self.__class__
             new_dn = cls.__new__(cls)
             new_dn.rdns = self.rdns[key]
+            if self._keys is not None:
+                new_dn._keys = self._keys[key]
             return new_dn
         elif isinstance(key, str):
             for rdn in self.rdns:
@@ -1204,19 +1238,14 @@ class DN:
                                 (key.__class__.__name__))
 
     def __hash__(self):
-        # Hash is computed from DN's string representation.
+        # Hash is computed from the normalized RDN keys used for comparison.
         #
         # Because attrs & values are comparison case-insensitive the
         # hash value between two objects which compare as equal but
         # differ in case must yield the same hash value.
-
-        str_dn = ';,'.join([
-            '++'.join([
-                '=='.join((atype, avalue or ''))
-                for atype, avalue, _dummy in rdn
-            ]) for rdn in self.rdns
-        ])
-        return hash(str_dn.lower())
+        if self._hash is None:
+            self._hash = hash(self._get_keys())
+        return self._hash
 
     def __eq__(self, other):
         # Try coercing to DN, if successful compare to coerced object
@@ -1250,15 +1279,14 @@ class DN:
         return self._cmp_sequence(other, 0, len(self)) < 0
 
     def _cmp_sequence(self, pattern, self_start, pat_len):
-        self_idx = self_start
-        pat_idx = 0
-        while pat_idx < pat_len:
-            r = cmp_rdns(self.rdns[self_idx], pattern.rdns[pat_idx])
-            if r != 0:
-                return r
-            self_idx += 1
-            pat_idx += 1
-        return 0
+        self_keys = self._get_keys()[self_start:self_start + pat_len]
+        pat_keys = pattern._get_keys()[:pat_len]
+        if self_keys == pat_keys:
+            return 0
+        elif self_keys < pat_keys:
+            return -1
+        else:
+            return 1
 
     def __add__(self, other):
         return self.__class__(self, other)
@@ -21,6 +21,8 @@ import collections
 import gzip
 import io
 import logging
+import threading
+import time
 from urllib.parse import urlencode
 import xml.dom.minidom
 import zlib
@@ -64,6 +66,12 @@ INCLUDED_PROFILES = {
 DEFAULT_PROFILE = u'caIPAserviceCert'
 KDC_PROFILE = u'KDCs_PKINIT_Certs'
 
+# Maximum number of idle keep-alive connections per Dogtag endpoint
+HTTPS_POOL_SIZE = 4
+# Idle connections older than this (in seconds) are closed, not reused.
+# Tomcat closes idle keep-alive connections after its connectionTimeout.
+HTTPS_POOL_IDLE_TIMEOUT = 15
+
 
 if six.PY3:
     gzip_decompress = gzip.decompress  # pylint: disable=no-member
@@ -150,6 +158,69 @@ def ca_status(ca_host=None):
     return _parse_ca_status(body)
 
 
+class ConnectionPool:
+    """
+    Pool of idle keep-alive HTTP(S) connections shared by all threads.
+
+    Connections are grouped by a key describing the endpoint and the
+    credentials used to establish them. At most maxsize idle connections
+    are kept per key, and connections idle for idle_timeout seconds or
+    longer are closed instead of being reused.
+    """
+
+    def __init__(self, maxsize=HTTPS_POOL_SIZE,
+                 idle_timeout=HTTPS_POOL_IDLE_TIMEOUT):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = collections.defaultdict(collections.deque)
+
+    def get(self, key):
+        """
+        Get the most recently used idle connection for key.
+
+        Returns None if there is no connection to reuse.
+        """
+        expired = []
+        conn = None
+        now = time.monotonic()
+        with self._lock:
+            # connections are appended in the order they became idle
+            idle = self._idle.get(key)
+            while idle and now - idle[0][0] >= self.idle_timeout:
+                expired.append(idle.popleft()[1])
+            if idle:
+                conn = idle.pop()[1]
+        for idle_conn in expired:
+            idle_conn.close()
+        return conn
+
+    def put(self, key, conn):
+        """
+        Return a connection with no outstanding response to the pool.
+        """
+        with self._lock:
+            idle = self._idle[key]
+            if len(idle) < self.maxsize:
+                idle.append((time.monotonic(), conn))
+                return
+        conn.close()
+
+    def clear(self):
+        """
+        Close all idle connections.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, collections.defaultdict(
+                collections.deque)
+        for connections in idle.values():
+            for _timestamp, conn in connections:
+                conn.close()
+
+
+https_pool = ConnectionPool()
+
+
 def https_request(
         host, port, url, cafile, client_certfile, client_keyfile,
         method='POST', headers=None, body=None, **kw):
@@ -161,7 +232,9 @@ def https_request(
     :return:   (http_status, http_headers, http_body)
                as (integer, dict, str)
 
-    Perform a client authenticated HTTPS request
+    Perform a client authenticated HTTPS request. Connections are kept
+    alive and reused by later requests to the same endpoint, see
+    https_pool.
     """
 
     def connection_factory(host, port):
@@ -175,9 +248,13 @@ def https_request(
 
     if body is None:
         body = urlencode(kw)
+    pool_key = (
+        host, port, cafile, client_certfile, client_keyfile,
+        api.env.tls_version_min, api.env.tls_version_max
+    )
     return _httplib_request(
         'https', host, port, url, connection_factory, body,
-        method=method, headers=headers)
+        method=method, headers=headers, pool=https_pool, pool_key=pool_key)
 
 
 def http_request(host, port, url, timeout=None, **kw):
@@ -203,7 +280,8 @@ def http_request(host, port, url, timeout=None, **kw):
 
 def _httplib_request(
         protocol, host, port, path, connection_factory, request_body,
-        method='POST', headers=None, connection_options=None):
+        method='POST', headers=None, connection_options=None,
+        pool=None, pool_key=None):
     """
     :param request_body: Request body
     :param connection_factory: Connection class to use. Will be called
@@ -211,6 +289,9 @@ def _httplib_request(
     :param method: HTTP request method (default: 'POST')
     :param connection_options: a dictionary that will be passed to
         connection_factory as keyword arguments.
+    :param pool: ConnectionPool to take a keep-alive connection from and
+        to return the connection to after the response was read.
+    :param pool_key: key of the connections in pool
 
     Perform a HTTP(s) request.
     """
@@ -228,17 +309,48 @@ def _httplib_request(
     ):
         headers['content-type'] = 'application/x-www-form-urlencoded'
 
+    conn = None
     try:
-        conn = connection_factory(host, port, **connection_options)
-        conn.request(method, path, body=request_body, headers=headers)
-        res = conn.getresponse()
+        if pool is not None:
+            conn = pool.get(pool_key)
+        if conn is not None:
+            # The server may have closed the idle keep-alive connection.
+            # Only retry on a new connection when the request provably
+            # never reached the server: sending it failed, or the server
+            # closed the connection without sending a single byte of the
+            # response. Any other error may have happened after the server
+            # processed the request and is raised as NetworkError.
+            stale = False
+            try:
+                conn.request(method, path, body=request_body, headers=headers)
+            except (BrokenPipeError, ConnectionResetError):
+                stale = True
+            else:
+                try:
+                    res = conn.getresponse()
+                except httplib.RemoteDisconnected:
+                    stale = True
+            if stale:
+                logger.debug("reused connection was closed, reconnecting")
+                conn.close()
+                conn = None
+        if conn is None:
+            conn = connection_factory(host, port, **connection_options)
+            conn.request(method, path, body=request_body, headers=headers)
+            res = conn.getresponse()
 
         http_status = res.status
         http_headers = res.msg
         http_body = res.read()
-        conn.close()
+        if pool is not None and not res.will_close:
+            pool.put(pool_key, conn)
+        else:
+            conn.close()
+        conn = None
     except Exception as e:
         logger.debug("httplib request failed:", exc_info=True)
+        if conn is not None:
+            conn.close()
         raise NetworkError(uri=uri, error=str(e))
 
     encoding = res.getheader('Content-Encoding')
@@ -21,6 +21,8 @@
 
 import binascii
 import errno
+import hashlib
+import json
 import logging
 import time
 import datetime
@@ -38,12 +40,13 @@ import ldap
 import ldap.sasl
 import ldap.filter
 from ldap.controls import SimplePagedResultsControl, GetEffectiveRightsControl
+from ldap.controls.readentry import PostReadControl
 import ldapurl
 import six
 
 # pylint: disable=ipa-forbidden-import
 from ipalib import errors, x509, _
-from ipalib.constants import LDAP_GENERALIZED_TIME_FORMAT
+from ipalib.constants import LDAP_GENERALIZED_TIME_FORMAT, USER_CACHE_PATH
 # pylint: enable=ipa-forbidden-import
 from ipaplatform.paths import paths
 from ipapython.ipautil import format_netloc, CIDict
@@ -82,6 +85,10 @@ TRUNCATED_ADMIN_LIMIT = object()
 
 DIRMAN_DN = DN(('cn', 'directory manager'))
 
+# Maximum number of modify requests update_entries() sends before it waits
+# for their results
+MODIFY_PIPELINE_DEPTH = 100
+
 
 if six.PY2 and hasattr(ldap, 'LDAPBytesWarning'):
     # XXX silence python-ldap's BytesWarnings
@@ -157,8 +164,22 @@ class _ServerSchema:
 class SchemaCache:
     '''
     Cache the schema's from individual LDAP servers.
+
+    Retrieved schemas are also stored on disk together with the
+    modifyTimestamp and nsSchemaCSN of the schema entry. A new process
+    validates the stored copy with a base search for these two attributes
+    and only downloads the whole schema when it has changed.
+
+    On a server the schemas are stored in a directory owned by ipaapi,
+    whose home directory is not writable. Other processes, e.g. on a
+    client, store them in the cache directory of the user.
     '''
 
+    _SERVER_DIR = paths.IPA_LDAP_SCHEMA_CACHE
+    _USER_DIR = os.path.join(USER_CACHE_PATH, 'ipa', 'ldap-schema')
+    _SCHEMA_ATTRS = ['attributetypes', 'objectclasses']
+    _STAMP_ATTRS = ['modifyTimestamp', 'nsSchemaCSN']
+
     def __init__(self):
         self.servers = {}
 
@@ -177,7 +198,11 @@ class SchemaCache:
 
         server_schema = self.servers.get(url)
         if server_schema is None:
-            schema = self._retrieve_schema_from_server(url, conn)
+            schema = None
+            if not force_update:
+                schema = self._read_schema(url, conn)
+            if schema is None:
+                schema = self._retrieve_schema_from_server(url, conn)
             server_schema = _ServerSchema(url, schema)
             self.servers[url] = server_schema
         return server_schema.schema
@@ -189,6 +214,97 @@ class SchemaCache:
         except KeyError:
             pass
 
+    def _get_dir(self):
+        if os.access(self._SERVER_DIR, os.W_OK | os.X_OK):
+            return self._SERVER_DIR
+        return self._USER_DIR
+
+    def _get_path(self, url):
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self._get_dir(), name)
+
+    @staticmethod
+    def _get_stamp(entry_attrs):
+        stamp = {}
+        for attr, values in entry_attrs.items():
+            if attr.lower() in ('modifytimestamp', 'nsschemacsn'):
+                stamp[attr.lower()] = sorted(v.decode('utf-8') for v in values)
+        return stamp
+
+    def _read_schema(self, url, conn):
+        """
+        Read the schema of the server at url from the on-disk cache.
+
+        Returns None when there is no cached schema or the schema on the
+        server has changed since it was stored.
+        """
+        path = self._get_path(url)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data['url'] != url:
+                return None
+            stamp = data['stamp']
+            attrs = data['schema']
+        except Exception as e:
+            if not (isinstance(e, EnvironmentError) and
+                    e.errno == errno.ENOENT):  # pylint: disable=no-member
+                logger.debug('Failed to read cached schema %s: %s', path, e)
+            return None
+
+        try:
+            schema_entry = conn.search_s(
+                data['dn'], ldap.SCOPE_BASE, attrlist=self._STAMP_ATTRS)[0]
+        except ldap.LDAPError as e:
+            logger.debug('Failed to validate cached schema %s: %s', path, e)
+            return None
+        if self._get_stamp(schema_entry[1]) != stamp:
+            logger.debug('cached schema %s is outdated', path)
+            return None
+
+        logger.debug('using cached schema for SchemaCache url=%s', url)
+        return ldap.schema.SubSchema({
+            attr: [v.encode('utf-8') for v in values]
+            for attr, values in attrs.items()
+        })
+
+    def _write_schema(self, url, dn, entry_attrs):
+        """
+        Store the schema entry of the server at url in the on-disk cache.
+        """
+        path = self._get_path(url)
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            stamp = self._get_stamp(entry_attrs)
+            if not stamp:
+                # without a stamp a cached copy cannot be validated
+                return
+            data = {
+                'url': url,
+                'dn': dn,
+                'stamp': stamp,
+                'schema': {
+                    attr: [v.decode('utf-8') for v in values]
+                    for attr, values in entry_attrs.items()
+                    if attr.lower() in self._SCHEMA_ATTRS
+                },
+            }
+            try:
+                os.makedirs(os.path.dirname(path), mode=0o700)
+            except EnvironmentError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.rename(tmp, path)
+        except (EnvironmentError, ValueError) as e:
+            logger.debug('Failed to write cached schema %s: %s', path, e)
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
     def _retrieve_schema_from_server(self, url, conn):
         """
         Retrieve the LDAP schema from the provided url and determine if
@@ -207,16 +323,17 @@ class SchemaCache:
         logger.debug(
             'retrieving schema for SchemaCache url=%s conn=%s', url, conn)
 
+        attrlist = self._SCHEMA_ATTRS + self._STAMP_ATTRS
         try:
             try:
                 schema_entry = conn.search_s('cn=schema', ldap.SCOPE_BASE,
-                    attrlist=['attributetypes', 'objectclasses'])[0]
+                    attrlist=attrlist)[0]
             except ldap.NO_SUCH_OBJECT:
                 # try different location for schema
                 # openldap has schema located in cn=subschema
                 logger.debug('cn=schema not found, fallback to cn=subschema')
                 schema_entry = conn.search_s('cn=subschema', ldap.SCOPE_BASE,
-                    attrlist=['attributetypes', 'objectclasses'])[0]
+                    attrlist=attrlist)[0]
         except ldap.SERVER_DOWN:
             raise errors.NetworkError(uri=url,
                                error=u'LDAP Server Down, unable to retrieve LDAP schema')
@@ -230,6 +347,8 @@ class SchemaCache:
         # TODO: DS uses 'cn=schema', support for other server?
         #       raise a more appropriate exception
 
+        self._write_schema(url, schema_entry[0], schema_entry[1])
+
         return ldap.schema.SubSchema(schema_entry[1])
 
 schema_cache = SchemaCache()
@@ -346,6 +465,25 @@ class LDAPEntry(MutableMapping):
         if nice == nice_sync and raw == raw_sync:
             return
 
+        if not nice and not nice_sync and not raw_sync:
+            # Values read from LDAP and not yet decoded: decode them in
+            # order, skipping duplicates, without the set arithmetic below
+            decode = self._conn._get_attribute_decoder(name)
+            seen = set()
+            for value in raw:
+                if value in seen:
+                    continue
+                seen.add(value)
+                try:
+                    nice.append(decode(value))
+                except ValueError as e:
+                    raise ValueError("{error} in LDAP entry '{dn}'".format(
+                        error=e, dn=self._dn))
+            self._sync[name] = (deepcopy(nice), list(raw))
+            if len(nice) > 1:
+                self._not_list.discard(name)
+            return
+
         nice_adds = set(nice) - set(nice_sync)
         nice_dels = set(nice_sync) - set(nice)
         raw_adds = set(raw) - set(raw_sync)
@@ -403,18 +541,8 @@ class LDAPEntry(MutableMapping):
         if name in self._names:
             return self._names[name]
 
-        if self._conn.schema is not None:
-            if six.PY2:
-                encoded_name = name.encode('utf-8')
-            else:
-                encoded_name = name
-            attrtype = self._conn.schema.get_obj(
-                ldap.schema.AttributeType, encoded_name)
-            if attrtype is not None:
-                for altname in attrtype.names:
-                    if six.PY2:
-                        altname = altname.decode('utf-8')
-                    self._names[altname] = name
+        for altname in self._conn.get_attribute_names(name):
+            self._names[altname] = name
 
         self._names[name] = name
 
@@ -555,7 +683,11 @@ class LDAPEntry(MutableMapping):
         if other is None:
             other = self
         assert isinstance(other, LDAPEntry)
-        self._orig_raw = deepcopy(dict(other.raw))
+        # raw values are lists of immutable bytes, copying the lists is
+        # as good as a deep copy
+        self._orig_raw = {
+            name: list(value) for name, value in other.raw.items()
+        }
 
     def generate_modlist(self):
         modlist = []
@@ -797,6 +929,7 @@ class LDAPClient:
 
         self._has_schema = False
         self._schema = None
+        self._schema_lookups = None
 
         if ldap_uri is not None:
             self._conn = self._connect()
@@ -932,6 +1065,95 @@ class LDAPClient:
 
         return unicode
 
+    def _get_schema_lookups(self):
+        """
+        Get the per-attribute lookup tables of the current schema.
+
+        Returns a tuple of the schema, a dict of attribute decoders and a
+        dict of attribute names. The tables are filled lazily and start
+        over whenever the schema object changes.
+        """
+        schema = self._get_schema()
+        lookups = self._schema_lookups
+        if lookups is None or lookups[0] is not schema:
+            lookups = (schema, {}, {})
+            # bypass ldap2's locking
+            object.__setattr__(self, '_schema_lookups', lookups)
+        return lookups
+
+    def _get_attribute_decoder(self, attr):
+        """
+        Get a function which decodes a single raw value of attribute attr.
+
+        The function raises ValueError if the value cannot be decoded.
+        """
+        decoders = self._get_schema_lookups()[1]
+        try:
+            return decoders[attr]
+        except KeyError:
+            pass
+
+        target_type = self.get_attribute_type(attr)
+        if target_type is bytes:
+            def convert(val):
+                return val
+        elif target_type is unicode:
+            def convert(val):
+                return val.decode('utf-8')
+        elif target_type is datetime.datetime:
+            def convert(val):
+                return datetime.datetime.strptime(
+                    val.decode('utf-8'), LDAP_GENERALIZED_TIME_FORMAT)
+        elif target_type is DNSName:
+            def convert(val):
+                return DNSName.from_text(val.decode('utf-8'))
+        elif target_type in (DN, Principal):
+            def convert(val):
+                return target_type(val.decode('utf-8'))
+        elif target_type is crypto_x509.Certificate:
+            convert = x509.load_der_x509_certificate
+        else:
+            convert = target_type
+
+        def decoder(val):
+            try:
+                return convert(val)
+            except Exception:
+                msg = 'unable to convert the attribute %r value %r to type %s' % (attr, val, target_type)
+                logger.error('%s', msg)
+                raise ValueError(msg)
+
+        decoders[attr] = decoder
+        return decoder
+
+    def get_attribute_names(self, name):
+        """
+        Get all names of attribute name according to the schema.
+
+        Returns an empty tuple if the schema is not available or the
+        attribute is not defined in it.
+        """
+        schema, _decoders, names = self._get_schema_lookups()
+        try:
+            return names[name]
+        except KeyError:
+            pass
+
+        altnames = ()
+        if schema is not None:
+            if six.PY2:
+                encoded_name = name.encode('utf-8')
+            else:
+                encoded_name = name
+            attrtype = schema.get_obj(ldap.schema.AttributeType, encoded_name)
+            if attrtype is not None:
+                altnames = tuple(attrtype.names)
+                if six.PY2:
+                    altnames = tuple(n.decode('utf-8') for n in altnames)
+
+        names[name] = altnames
+        return altnames
+
     def has_dn_syntax(self, name_or_oid):
         """
         Check the schema to see if the attribute uses DN syntax.
@@ -963,6 +1185,27 @@ class LDAPClient:
 
         return None
 
+    def get_attribute_operational(self, name_or_oid):
+        """
+        Check the schema to see if the attribute is operational.
+
+        If the attribute is in the schema then returns True/False
+
+        If there is a problem loading the schema or the attribute is
+        not in the schema return None
+        """
+        if six.PY2 and isinstance(name_or_oid, unicode):
+            name_or_oid = name_or_oid.encode('utf-8')
+
+        schema = self._get_schema()
+        if schema is not None:
+            obj = schema.get_obj(ldap.schema.AttributeType, name_or_oid)
+            if obj is not None:
+                # any usage other than userApplications
+                return obj.usage != 0
+
+        return None
+
     def encode(self, val):
         """
         Encode attribute value to LDAP representation (str/bytes).
@@ -1003,27 +1246,7 @@ class LDAPClient:
         Decode attribute value from LDAP representation (str/bytes).
         """
         if isinstance(val, bytes):
-            target_type = self.get_attribute_type(attr)
-            try:
-                if target_type is bytes:
-                    return val
-                elif target_type is unicode:
-                    return val.decode('utf-8')
-                elif target_type is datetime.datetime:
-                    return datetime.datetime.strptime(
-                        val.decode('utf-8'), LDAP_GENERALIZED_TIME_FORMAT)
-                elif target_type is DNSName:
-                    return DNSName.from_text(val.decode('utf-8'))
-                elif target_type in (DN, Principal):
-                    return target_type(val.decode('utf-8'))
-                elif target_type is crypto_x509.Certificate:
-                    return x509.load_der_x509_certificate(val)
-                else:
-                    return target_type(val)
-            except Exception:
-                msg = 'unable to convert the attribute %r value %r to type %s' % (attr, val, target_type)
-                logger.error('%s', msg)
-                raise ValueError(msg)
+            return self._get_attribute_decoder(attr)(val)
         elif isinstance(val, list):
             return [self.decode(m, attr) for m in val]
         elif isinstance(val, tuple):
@@ -1447,9 +1670,35 @@ class LDAPClient:
         :param kwargs: additional keyword arguments. See find_entries method
         for their description.
         """
-        entries, truncated = self.find_entries(
-            base_dn=base_dn, scope=scope, filter=filter, attrs_list=attrs_list,
+        return list(self.iter_entries(
+            base_dn, scope=scope, filter=filter, attrs_list=attrs_list,
             get_effective_rights=get_effective_rights,
+            **kwargs))
+
+    def iter_entries(self, base_dn, scope=ldap.SCOPE_SUBTREE, filter=None,
+                     attrs_list=None, get_effective_rights=False, **kwargs):
+        """Return an iterator over matching entries.
+
+        This is the streaming counterpart of get_entries. Entries are
+        yielded as soon as they are received from the server, so with
+        paged_search=True at most one page of results is held in memory.
+
+        :raises: errors.LimitsExceeded if the result is truncated by the
+                 server, after all received entries have been yielded
+        :raises: errors.NotFound if result set is empty
+                                 or base_dn doesn't exist
+
+        :param base_dn: dn of the entry at which to start the search
+        :param scope: search scope, see LDAP docs (default ldap2.SCOPE_SUBTREE)
+        :param filter: LDAP filter to apply
+        :param attrs_list: ist of attributes to return, all if None (default)
+        :param get_effective_rights: use GetEffectiveRights control
+        :param kwargs: additional keyword arguments. See find_entries method
+        for their description.
+        """
+        truncated = yield from self._search_entries(
+            filter=filter, attrs_list=attrs_list, base_dn=base_dn,
+            scope=scope, get_effective_rights=get_effective_rights,
             **kwargs)
         try:
             self.handle_truncated_result(truncated)
@@ -1460,8 +1709,6 @@ class LDAPClient:
             )
             raise
 
-        return entries
-
     def find_entries(
             self, filter=None, attrs_list=None, base_dn=None,
             scope=ldap.SCOPE_SUBTREE, time_limit=None, size_limit=None,
@@ -1484,6 +1731,39 @@ class LDAPClient:
         :param paged_search: search using paged results control
         :param get_effective_rights: use GetEffectiveRights control
 
+        :raises: errors.NotFound if result set is empty
+                                 or base_dn doesn't exist
+        """
+        res = []
+        search = self._search_entries(
+            filter=filter, attrs_list=attrs_list, base_dn=base_dn,
+            scope=scope, time_limit=time_limit, size_limit=size_limit,
+            paged_search=paged_search,
+            get_effective_rights=get_effective_rights)
+        while True:
+            try:
+                res.append(next(search))
+            except StopIteration as e:
+                truncated = e.value
+                break
+
+        return (res, truncated)
+
+    def _search_entries(
+            self, filter=None, attrs_list=None, base_dn=None,
+            scope=ldap.SCOPE_SUBTREE, time_limit=None, size_limit=None,
+            paged_search=False, get_effective_rights=False):
+        """
+        Generator yielding entries matching the search parameters.
+
+        Takes the same arguments as find_entries. The truncated flag is
+        the return value of the generator, i.e. it is available as the
+        value of ``yield from`` or of the final StopIteration.
+
+        If the generator is closed before it is exhausted, the outstanding
+        search operation is abandoned and a paged search in progress is
+        cancelled.
+
         :raises: errors.NotFound if result set is empty
                                  or base_dn doesn't exist
         """
@@ -1492,7 +1772,7 @@ class LDAPClient:
         assert isinstance(base_dn, DN)
         if not filter:
             filter = '(objectClass=*)'
-        res = []
+        found = False
         truncated = False
 
         if time_limit is None:
@@ -1520,6 +1800,17 @@ class LDAPClient:
         if page_size == 0:
             paged_search = False
 
+        def cancel_paged_search():
+            sctrls = [SimplePagedResultsControl(0, 0, cookie)]
+            try:
+                self.conn.search_ext_s(
+                    str(base_dn), scope, filter, attrs_list,
+                    serverctrls=sctrls, timeout=time_limit,
+                    sizelimit=size_limit)
+            except ldap.LDAPError as e2:
+                logger.warning(
+                    "Error cancelling paged search: %s", e2)
+
         # pass arguments to python-ldap
         with self.error_handler():
             if six.PY2:
@@ -1534,6 +1825,7 @@ class LDAPClient:
                 else:
                     sctrls = base_sctrls or None
 
+                id = None
                 try:
                     id = self.conn.search_ext(
                         str(base_dn), scope, filter, attrs_list,
@@ -1544,10 +1836,12 @@ class LDAPClient:
                         result = self.conn.result3(id, 0)
                         objtype, res_list, _res_id, res_ctrls = result
                         if objtype == ldap.RES_SEARCH_RESULT:
+                            id = None
                             break
                         res_list = self._convert_result(res_list)
                         if res_list:
-                            res.append(res_list[0])
+                            found = True
+                            yield res_list[0]
 
                     if paged_search:
                         # Get cookie for the next page
@@ -1557,6 +1851,18 @@ class LDAPClient:
                                 break
                         else:
                             cookie = ''
+                except GeneratorExit:
+                    # The consumer stopped iterating, release server side
+                    # resources held by the search
+                    if id is not None:
+                        try:
+                            self.conn.abandon(id)
+                        except ldap.LDAPError as e2:
+                            logger.debug(
+                                "Error abandoning search: %s", e2)
+                    if paged_search and cookie:
+                        cancel_paged_search()
+                    raise
                 except ldap.ADMINLIMIT_EXCEEDED:
                     truncated = TRUNCATED_ADMIN_LIMIT
                     break
@@ -1569,15 +1875,7 @@ class LDAPClient:
                 except ldap.LDAPError as e:
                     # If paged search is in progress, try to cancel it
                     if paged_search and cookie:
-                        sctrls = [SimplePagedResultsControl(0, 0, cookie)]
-                        try:
-                            self.conn.search_ext_s(
-                                str(base_dn), scope, filter, attrs_list,
-                                serverctrls=sctrls, timeout=time_limit,
-                                sizelimit=size_limit)
-                        except ldap.LDAPError as e2:
-                            logger.warning(
-                                "Error cancelling paged search: %s", e2)
+                        cancel_paged_search()
                         cookie = ''
 
                     try:
@@ -1590,10 +1888,10 @@ class LDAPClient:
                 if not paged_search or not cookie:
                     break
 
-        if not res and not truncated:
+        if not found and not truncated:
             raise errors.EmptyResult(reason='no matching entry found')
 
-        return (res, truncated)
+        return truncated
 
     def __get_effective_rights_control(self):
         """Construct a GetEffectiveRights control for current user."""
@@ -1643,20 +1941,42 @@ class LDAPClient:
 
         return entries[0]
 
-    def add_entry(self, entry):
+    def _get_post_read_controls(self, post_read):
+        if post_read is None:
+            return None
+        attrs_list = [a.lower() for a in set(post_read)]
+        if six.PY2:
+            attrs_list = self.encode(attrs_list)
+        return [PostReadControl(criticality=False, attrList=attrs_list)]
+
+    def _get_post_read_entry(self, resp_ctrls):
+        for ctrl in resp_ctrls or ():
+            if ctrl.controlType == PostReadControl.controlType:
+                return self._convert_result([(ctrl.dn, ctrl.entry)])[0]
+        return None
+
+    def add_entry(self, entry, post_read=None):
         """Create a new entry.
 
         This should be called as add_entry(entry).
+
+        If post_read is a list of attributes, they are requested with the
+        RFC 4527 Post-Read control and the entry as it was created is
+        returned. None is returned if the server did not send it.
         """
         # remove all [] values (python-ldap hates 'em)
         attrs = dict((k, v) for k, v in entry.raw.items() if v)
 
         with self.error_handler():
             attrs = self.encode(attrs)
-            self.conn.add_s(str(entry.dn), list(attrs.items()))
+            _type, _data, _msgid, resp_ctrls = self.conn.add_ext_s(
+                str(entry.dn), list(attrs.items()),
+                serverctrls=self._get_post_read_controls(post_read))
 
         entry.reset_modlist()
 
+        return self._get_post_read_entry(resp_ctrls)
+
     def move_entry(self, dn, new_dn, del_old=True):
         """
         Move an entry (either to a new superior or/and changing relative distinguished name)
@@ -1688,10 +2008,14 @@ class LDAPClient:
                                delold=int(del_old))
             time.sleep(.3)  # Give memberOf plugin a chance to work
 
-    def update_entry(self, entry):
+    def update_entry(self, entry, post_read=None):
         """Update entry's attributes.
 
         This should be called as update_entry(entry).
+
+        If post_read is a list of attributes, they are requested with the
+        RFC 4527 Post-Read control and the entry as it was modified is
+        returned. None is returned if the server did not send it.
         """
         # generate modlist
         modlist = entry.generate_modlist()
@@ -1702,10 +2026,60 @@ class LDAPClient:
         with self.error_handler():
             modlist = [(a, str(b), self.encode(c))
                        for a, b, c in modlist]
-            self.conn.modify_s(str(entry.dn), modlist)
+            _type, _data, _msgid, resp_ctrls = self.conn.modify_ext_s(
+                str(entry.dn), modlist,
+                serverctrls=self._get_post_read_controls(post_read))
 
         entry.reset_modlist()
 
+        return self._get_post_read_entry(resp_ctrls)
+
+    def update_entries(self, entries):
+        """Update the attributes of entries with pipelined modify operations.
+
+        This is the bulk variant of update_entry(). Up to
+        MODIFY_PIPELINE_DEPTH requests are sent before their results are
+        waited for.
+
+        Returns a list with, for each entry of entries, None if it was
+        updated or the error raised if it was not. Entries which are not
+        modified get errors.EmptyModlist and are not sent at all.
+        """
+        entries = list(entries)
+        results = [None] * len(entries)
+        pending = []
+
+        def wait():
+            for i, msgid in pending:
+                try:
+                    with self.error_handler():
+                        self.conn.result3(msgid, all=1)
+                except errors.PublicError as e:
+                    results[i] = e
+                else:
+                    entries[i].reset_modlist()
+            del pending[:]
+
+        for i, entry in enumerate(entries):
+            modlist = entry.generate_modlist()
+            if not modlist:
+                results[i] = errors.EmptyModlist()
+                continue
+            try:
+                with self.error_handler():
+                    modlist = [(a, str(b), self.encode(c))
+                               for a, b, c in modlist]
+                    msgid = self.conn.modify_ext(str(entry.dn), modlist)
+            except errors.PublicError as e:
+                results[i] = e
+                continue
+            pending.append((i, msgid))
+            if len(pending) >= MODIFY_PIPELINE_DEPTH:
+                wait()
+        wait()
+
+        return results
+
     def delete_entry(self, entry_or_dn):
         """Delete an entry given either the DN or the entry itself"""
         if isinstance(entry_or_dn, DN):
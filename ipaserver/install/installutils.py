@@ -29,6 +29,7 @@ import ldif
 import os
 import re
 import fileinput
+import subprocess
 import sys
 import tempfile
 import shutil
@@ -649,6 +650,47 @@ def decrypt_file(source, dest, password, workdir=None):
     gpg_command(extra_args, password, workdir)
 
 
+def run_pipeline(producer, consumer, cwd=None):
+    """
+    Run two commands with the output of producer piped into consumer.
+
+    Nothing is buffered on disk between the two commands. Raises
+    ScriptError if any of them fails.
+    """
+    logger.debug('Starting external process')
+    logger.debug('args=%s | %s', ' '.join(producer), ' '.join(consumer))
+    with tempfile.TemporaryFile() as producer_err, \
+            tempfile.TemporaryFile() as consumer_err:
+        p1 = subprocess.Popen(producer, stdout=subprocess.PIPE,
+                              stderr=producer_err, cwd=cwd, close_fds=True)
+        try:
+            p2 = subprocess.Popen(consumer, stdin=p1.stdout,
+                                  stderr=consumer_err, cwd=cwd,
+                                  close_fds=True)
+        except Exception:
+            p1.kill()
+            p1.wait()
+            raise
+        finally:
+            # the consumer owns the read end now, so the producer gets
+            # SIGPIPE if the consumer exits early
+            p1.stdout.close()
+        p2.wait()
+        p1.wait()
+        logger.debug('Process finished, return codes: %s, %s',
+                     p1.returncode, p2.returncode)
+
+        for args, process, err in ((producer, p1, producer_err),
+                                   (consumer, p2, consumer_err)):
+            if process.returncode != 0:
+                err.seek(0)
+                error_log = err.read().decode('utf-8', 'replace')
+                raise ScriptError(
+                    '%s returned non-zero code %d: %s' %
+                    (os.path.basename(args[0]), process.returncode,
+                     error_log))
+
+
 def expand_replica_info(filename, password):
     """
     Decrypt and expand a replica installation file into a temporary
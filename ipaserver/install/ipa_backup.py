@@ -75,6 +75,38 @@ EOF
 """
 
 
+# Compression codecs of the archive of backed up files. gzip is the default
+# since every version of ipa-restore can read it. The outer ipa-full and
+# ipa-data archives are always compressed with gzip.
+COMPRESSION_CODECS = ('gzip', 'zstd')
+DEFAULT_COMPRESSION = 'gzip'
+
+
+def get_compress_program(compression):
+    """
+    Get the program used by tar to (de)compress archives with a codec.
+
+    gzip uses pigz for parallel compression when it is installed, zstd
+    always runs with one thread per CPU.
+    """
+    if compression == 'zstd':
+        return '{} -T0 -q'.format(paths.ZSTD)
+    elif compression == 'gzip':
+        if os.path.isfile(paths.PIGZ):
+            return paths.PIGZ
+        return paths.GZIP
+    else:
+        raise admintool.ScriptError(
+            'Unsupported compression: %s' % compression)
+
+
+def compresses_in_parallel(compression):
+    """
+    Check whether archives are compressed with a codec using all CPUs.
+    """
+    return compression == 'zstd' or os.path.isfile(paths.PIGZ)
+
+
 def encrypt_file(filename, remove_original=True):
     source = filename
     dest = filename + '.gpg'
@@ -250,6 +282,11 @@ class Backup(admintool.AdminTool):
         parser.add_option(
             "--data", dest="data_only", action="store_true",
             default=False, help="Backup only the data")
+        parser.add_option(
+            "--compression", dest="compression", type="choice",
+            choices=COMPRESSION_CODECS, default=DEFAULT_COMPRESSION,
+            help="Compression of the backup: {} (default: {})".format(
+                ', '.join(COMPRESSION_CODECS), DEFAULT_COMPRESSION))
         parser.add_option(
             "--logs", dest="logs", action="store_true",
             default=False, help="Include log files in backup")
@@ -293,6 +330,10 @@ class Backup(admintool.AdminTool):
             self.option_parser.error("You cannot specify --data "
                 "with --logs")
 
+        if options.compression == 'zstd' and not os.path.isfile(paths.ZSTD):
+            self.option_parser.error(
+                "--compression=zstd requires %s" % paths.ZSTD)
+
     def run(self):
         options = self.options
         super(Backup, self).run()
@@ -309,6 +350,7 @@ class Backup(admintool.AdminTool):
         os.mkdir(self.dir, 0o750)
         constants.DS_USER.chown(self.dir)
         self.tarfile = None
+        self.compress_later = False
 
         self.header = os.path.join(self.top_dir, 'header')
 
@@ -324,7 +366,7 @@ class Backup(admintool.AdminTool):
 
             self.check_roles(raiseonerr=options.rolecheck)
 
-            self.create_header(options.data_only)
+            self.create_header(options.data_only, options.compression)
             if options.data_only:
                 if not options.online:
                     logger.info('Stopping Directory Server')
@@ -630,14 +672,22 @@ class Backup(admintool.AdminTool):
 
         self.tarfile = os.path.join(self.dir, 'files.tar')
 
+        # A parallel compressor compresses the archive while it is written,
+        # which keeps up with tar. gzip alone would prolong the time the
+        # services are stopped, so the archive is then compressed after
+        # they are restarted, see compress_file_backup().
+        self.compress_later = not compresses_in_parallel(options.compression)
+
         logger.info("Backing up files")
         args = ['tar',
                 '--exclude=%s' % paths.IPA_BACKUP_DIR,
                 '--xattrs',
                 '--selinux',
-                '-cf',
-                self.tarfile
                ]
+        if not self.compress_later:
+            args.append('--use-compress-program=%s' %
+                        get_compress_program(options.compression))
+        args.extend(['-cf', self.tarfile])
 
         args.extend(verify_directories(self.dirs))
         args.extend(verify_directories(self.files))
@@ -645,39 +695,23 @@ class Backup(admintool.AdminTool):
         if options.logs:
             args.extend(verify_directories(self.logs))
 
-        result = run(args, raiseonerr=False)
-        if result.returncode != 0:
-            raise admintool.ScriptError('tar returned non-zero code %d: %s' %
-                                        (result.returncode, result.error_log))
-
-        # Backup the necessary directory structure. This is a separate
-        # call since we are using the '--no-recursion' flag to store
-        # the directory structure only, no files.
+        # Backup the necessary directory structure, store the
+        # directories only, no files. This is done in the same run since
+        # 'tar' cannot append to a compressed archive.
         missing_directories = verify_directories(self.required_dirs)
-
         if missing_directories:
-            args = ['tar',
-                    '--exclude=%s' % paths.IPA_BACKUP_DIR,
-                    '--xattrs',
-                    '--selinux',
-                    '--no-recursion',
-                    '-rf',  # -r appends to an existing archive
-                    self.tarfile,
-                   ]
+            args.append('--no-recursion')
             args.extend(missing_directories)
 
-            result = run(args, raiseonerr=False)
-            if result.returncode != 0:
-                raise admintool.ScriptError(
-                    'tar returned non-zero code %d '
-                    'when adding directory structure: %s' %
-                    (result.returncode, result.error_log))
+        result = run(args, raiseonerr=False)
+        if result.returncode != 0:
+            raise admintool.ScriptError('tar returned non-zero code %d: %s' %
+                                        (result.returncode, result.error_log))
 
     def compress_file_backup(self):
 
-        # Compress the archive. This is done separately, since 'tar' cannot
-        # append to a compressed archive.
-        if self.tarfile:
+        # Compress the archive unless it was compressed while written.
+        if self.tarfile and self.compress_later:
             result = run([paths.GZIP, self.tarfile], raiseonerr=False)
             if result.returncode != 0:
                 raise admintool.ScriptError(
@@ -688,7 +722,7 @@ class Backup(admintool.AdminTool):
             # Rename the archive back to files.tar to preserve compatibility
             os.rename(os.path.join(self.dir, 'files.tar.gz'), self.tarfile)
 
-    def create_header(self, data_only):
+    def create_header(self, data_only, compression=DEFAULT_COMPRESSION):
         '''
         Create the backup file header that contains the meta data about
         this particular backup.
@@ -705,6 +739,7 @@ class Backup(admintool.AdminTool):
         config.set('ipa', 'host', api.env.host)
         config.set('ipa', 'ipa_version', str(version.VERSION))
         config.set('ipa', 'version', '1')
+        config.set('ipa', 'compression', compression)
 
         dn = DN(('cn', api.env.host), api.env.container_masters,
                 api.env.basedn)
@@ -730,6 +765,10 @@ class Backup(admintool.AdminTool):
         Create the final location of the backup files and move the files
         we've backed up there, optionally encrypting them.
 
+        The archive is compressed and encrypted as it is written, tar
+        output is piped through gpg so that no unencrypted copy is ever
+        stored.
+
         This is done in a couple of steps. We have a directory that
         contains the tarball of the files, a directory that contains
         the db2bak output and an LDIF.
@@ -763,17 +802,32 @@ class Backup(admintool.AdminTool):
             )
 
         args = [
-            'tar', '--xattrs', '--selinux', '-czf', filename, '.'
+            'tar', '--xattrs', '--selinux',
+            '--use-compress-program=%s' %
+            get_compress_program(DEFAULT_COMPRESSION),
+            '-cf',
         ]
-        result = run(args, raiseonerr=False, cwd=self.dir)
-        if result.returncode != 0:
-            raise admintool.ScriptError(
-                'tar returned non-zero code %s: %s' %
-                (result.returncode, result.error_log)
-            )
         if encrypt:
             logger.info('Encrypting %s', filename)
-            filename = encrypt_file(filename)
+            # the archive is compressed already
+            gpg_args = [
+                paths.GPG2,
+                '--batch',
+                '--default-recipient-self',
+                '--compress-algo', 'none',
+                '--output', filename + '.gpg',
+                '--encrypt',
+            ]
+            installutils.run_pipeline(
+                args + ['-', '.'], gpg_args, cwd=self.dir)
+        else:
+            args.extend([filename, '.'])
+            result = run(args, raiseonerr=False, cwd=self.dir)
+            if result.returncode != 0:
+                raise admintool.ScriptError(
+                    'tar returned non-zero code %s: %s' %
+                    (result.returncode, result.error_log)
+                )
         try:
             shutil.move(self.header, backup_dir)
         except (IOError, OSError) as e:
@@ -41,6 +41,8 @@ from ipapython.dn import DN
 from ipaserver.install.replication import (wait_for_task, ReplicationManager,
                                            get_cs_replication_manager)
 from ipaserver.install import installutils
+from ipaserver.install.ipa_backup import (
+    DEFAULT_COMPRESSION, get_compress_program)
 from ipaserver.install import dsinstance, httpinstance, cainstance, krbinstance
 from ipaserver.masters import get_masters
 from ipapython import ipaldap
@@ -79,30 +81,6 @@ def recursive_chown(path, uid, gid):
             os.chmod(os.path.join(root, file), 0o640)
 
 
-def decrypt_file(tmpdir, filename):
-    source = filename
-    (dest, ext) = os.path.splitext(filename)
-
-    if ext != '.gpg':
-        raise admintool.ScriptError('Trying to decrypt a non-gpg file')
-
-    dest = os.path.basename(dest)
-    dest = os.path.join(tmpdir, dest)
-
-    args = [
-        paths.GPG2,
-        '--batch',
-        '--output', dest,
-        '--decrypt', source,
-    ]
-
-    result = run(args, raiseonerr=False)
-    if result.returncode != 0:
-        raise admintool.ScriptError('gpg failed: %s' % result.error_log)
-
-    return dest
-
-
 class RemoveRUVParser(ldif.LDIFParser):
     def __init__(self, input_file, writer):
         ldif.LDIFParser.__init__(self, input_file)
@@ -707,7 +685,9 @@ class Restore(admintool.AdminTool):
         args = ['tar',
                 '--xattrs',
                 '--selinux',
-                '-xzf',
+                '--use-compress-program=%s' %
+                get_compress_program(self.backup_compression),
+                '-xf',
                 os.path.join(self.dir, 'files.tar'),
                 paths.IPA_DEFAULT_CONF[1:],
                 ]
@@ -758,7 +738,9 @@ class Restore(admintool.AdminTool):
         args = ['tar',
                 '--xattrs',
                 '--selinux',
-                '-xzf',
+                '--use-compress-program=%s' %
+                get_compress_program(self.backup_compression),
+                '-xf',
                 os.path.join(self.dir, 'files.tar')
                 ]
         if nologs:
@@ -782,6 +764,9 @@ class Restore(admintool.AdminTool):
         self.backup_host = config.get('ipa', 'host')
         self.backup_ipa_version = config.get('ipa', 'ipa_version')
         self.backup_version = config.get('ipa', 'version')
+        # backups made before the codec was selectable are gzip compressed
+        self.backup_compression = config.get(
+            'ipa', 'compression', fallback=DEFAULT_COMPRESSION)
         # pylint: disable=no-member
         # we can assume that returned object is string and it has .split()
         # method
@@ -792,6 +777,9 @@ class Restore(admintool.AdminTool):
         '''
         Extract the contents of the tarball backup into a temporary location,
         decrypting if necessary.
+
+        An encrypted backup is decrypted by gpg and piped straight into
+        tar, the decrypted tarball is never written to disk.
         '''
 
         encrypt = False
@@ -807,28 +795,28 @@ class Restore(admintool.AdminTool):
                 filename = filename + '.gpg'
                 encrypt = True
 
-        if encrypt:
-            logger.info('Decrypting %s', filename)
-            filename = decrypt_file(self.dir, filename)
-
         args = ['tar',
                 '--xattrs',
                 '--selinux',
                 '-xzf',
-                filename,
-                '.'
                 ]
-        run(args, cwd=self.dir)
+        if encrypt:
+            logger.info('Decrypting %s', filename)
+            gpg_args = [
+                paths.GPG2,
+                '--batch',
+                '--decrypt', filename,
+            ]
+            installutils.run_pipeline(
+                gpg_args, args + ['-', '.'], cwd=self.dir)
+        else:
+            run(args + [filename, '.'], cwd=self.dir)
 
         constants.DS_USER.chown(self.top_dir)
         recursive_chown(
             self.dir, constants.DS_USER.uid, constants.DS_USER.pgid
         )
 
-        if encrypt:
-            # We can remove the decoded tarball
-            os.unlink(filename)
-
     def __create_dogtag_log_dirs(self):
         """
         If we are doing a full restore and the dogtag log directories do
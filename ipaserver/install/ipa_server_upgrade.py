@@ -26,7 +26,8 @@ class ServerUpgrade(admintool.AdminTool):
         super(ServerUpgrade, cls).add_options(parser)
         parser.add_option("--force", action="store_true",
                           dest="force", default=False,
-                          help="force upgrade (alias for --skip-version-check)")
+                          help="force full upgrade, reapply all update "
+                               "files (implies --skip-version-check)")
         parser.add_option("--skip-version-check", action="store_true",
                           dest="skip_version_check", default=False,
                           help="skip version check. WARNING: this may break "
@@ -51,7 +52,7 @@ class ServerUpgrade(admintool.AdminTool):
 
         try:
             server.upgrade_check(self.options)
-            server.upgrade()
+            server.upgrade(force=self.options.force)
         except RuntimeError as e:
             raise admintool.ScriptError(str(e))
 
@@ -24,6 +24,8 @@
 from __future__ import absolute_import
 
 import base64
+import collections
+import hashlib
 import logging
 import sys
 import uuid
@@ -32,9 +34,11 @@ import os
 import fnmatch
 import warnings
 
+import ldap
 import six
 
 from ipaserver.install import installutils
+from ipaserver.install import sysupgrade
 from ipapython import ipautil, ipaldap
 from ipalib import errors
 from ipalib import api, create_api
@@ -43,6 +47,7 @@ from ipaplatform.constants import constants as platformconstants
 from ipaplatform.paths import paths
 from ipaplatform.tasks import tasks
 from ipapython.dn import DN
+from ipapython.version import VERSION
 
 if six.PY3:
     unicode = str
@@ -146,6 +151,7 @@ class LDAPUpdate:
         ('cn', 'index'), ('cn', 'userRoot'), ('cn', 'ldbm database'),
         ('cn', 'plugins'), ('cn', 'config')
     )
+    schema_dn = DN(('cn', 'schema'))
 
     def __init__(self, dm_password=_sentinel, sub_dict=None,
                  online=_sentinel, ldapi=_sentinel, api=api):
@@ -274,6 +280,11 @@ class LDAPUpdate:
         self.sub_dict = sub_dict if sub_dict is not None else {}
         self.conn = None
         self.modified = False
+        self.failed = False
+        # set when an update was skipped because its entry or the parent
+        # of its entry did not exist, the update file is then not recorded
+        # as applied
+        self.incomplete = False
         self.ldapuri = ipaldap.realm_to_ldapi_uri(api.env.realm)
 
         default_sub = dict(
@@ -602,17 +613,66 @@ class LDAPUpdate:
 
         return entry
 
-    def _get_entry(self, dn):
-        """Retrieve an object from LDAP.
+    def _get_entries(self, dns):
+        """Retrieve the entries with the given DNs from LDAP.
 
-           The return type is ipaldap.LDAPEntry
+           The base searches are pipelined, all requests are sent before
+           the first result is read.
+
+           Returns a dict mapping each DN to an ipaldap.LDAPEntry, or to
+           None if the entry does not exist.
         """
-        assert isinstance(dn, DN)
-        searchfilter="objectclass=*"
+        searchfilter = "(objectclass=*)"
         sattrs = ["*", "aci", "attributeTypes", "objectClasses"]
         scope = self.conn.SCOPE_BASE
 
-        return self.conn.get_entries(dn, scope, searchfilter, sattrs)
+        msgids = collections.deque()
+        entries = {}
+        try:
+            for dn in dns:
+                assert isinstance(dn, DN)
+                with self.conn.error_handler():
+                    msgid = self.conn.conn.search_ext(
+                        str(dn), scope, searchfilter, sattrs,
+                        timeout=UPDATE_SEARCH_TIME_LIMIT)
+                msgids.append((dn, msgid))
+
+            while msgids:
+                dn, msgid = msgids[0]
+                entries[dn] = None
+                try:
+                    with self.conn.error_handler():
+                        _type, result, _msgid, _ctrls = (
+                            self.conn.conn.result3(msgid, all=1))
+                except errors.NotFound:
+                    result = []
+                except errors.DatabaseError as e:
+                    logger.debug("Cannot retrieve %s, using default value: "
+                                 "%s", dn, e)
+                    result = []
+                # the search is complete, it must not be abandoned
+                msgids.popleft()
+
+                result = [r for r in result if r[0] is not None]
+                if len(result) > 1:
+                    # we should only ever get back one entry
+                    raise BadSyntax(
+                        "More than 1 entry returned on a dn search!? %s" % dn)
+                if result:
+                    entry = self.conn.make_entry(dn)
+                    for attr, values in result[0][1].items():
+                        entry.raw[attr] = values
+                    entry.reset_modlist()
+                    entries[dn] = entry
+        finally:
+            # do not leave searches outstanding on the shared connection
+            for _dn, msgid in msgids:
+                try:
+                    self.conn.conn.abandon(msgid)
+                except ldap.LDAPError as e:
+                    logger.debug("Error abandoning search: %s", e)
+
+        return entries
 
     def _apply_update_disposition(self, updates, entry):
         """
@@ -678,7 +738,9 @@ class LDAPUpdate:
                              safe_output(attr, entry_values))
                 # Only add the attribute if it doesn't exist. Only works
                 # with single-value attributes. Entry must exist.
-                if entry.get('objectclass') and len(entry_values) == 0:
+                if not entry.get('objectclass'):
+                    self.incomplete = True
+                elif len(entry_values) == 0:
                     entry_values.append(update_value)
                     logger.debug('addifnew: set %s to %s',
                                  attr, safe_output(attr, entry_values))
@@ -695,6 +757,8 @@ class LDAPUpdate:
                     logger.debug('addifexist: set %s to %s',
                                  attr, safe_output(attr, entry_values))
                     entry.raw[attr] = entry_values
+                else:
+                    self.incomplete = True
             elif action == 'only':
                 logger.debug("only: set %s to '%s', current value %s",
                              attr,
@@ -724,6 +788,8 @@ class LDAPUpdate:
                     logger.debug('onlyifexist: set %s to %s',
                                  attr, safe_output(attr, entry_values))
                     entry.raw[attr] = entry_values
+                else:
+                    self.incomplete = True
             elif action == 'deleteentry':
                 # skip this update type, it occurs in  __delete_entries()
                 return None
@@ -755,90 +821,137 @@ class LDAPUpdate:
             for l in value:
                 logger.debug("\t%s", safe_output(a, l))
 
-    def _update_record(self, update):
-        found = False
+    def _update_entries(self, entries):
+        """Update the entries with pipelined modify requests.
 
-        new_entry = self._create_default_entry(update.get('dn'),
-                                               update.get('default'))
+           Returns the list of entries which were updated.
+        """
+        results = self.conn.update_entries(entries)
+        updated = []
+        for entry, e in zip(entries, results):
+            if e is None:
+                updated.append(entry)
+            elif isinstance(e, (errors.DatabaseError, errors.ACIError)):
+                logger.error("Update of %s failed: %s", entry.dn, e)
+                self.failed = True
+            elif isinstance(e, errors.DuplicateEntry):
+                logger.debug("Update already exists, skip it: %s", e)
+            else:
+                raise e
+        return updated
+
+    def _update_records(self, updates):
+        """Bring the entries of a list of updates up to date.
+
+           All entries are retrieved at once and the updates are applied in
+           memory in the order given. New entries are added when their
+           first update is reached, as they may be parents of each other.
+           The modifications of existing entries between two adds are
+           merged into one write per entry and pipelined, so no write is
+           sent before an add which precedes it. Schema changes are written
+           on their own. Entries which are already up to date are neither
+           written nor logged.
+
+           Returns the list of entries which were added or updated.
+        """
+        dns = []
+        for update in updates:
+            if update['dn'] not in dns:
+                dns.append(update['dn'])
+
+        current = self._get_entries(dns)
+        entries = {}
+        # existing entries modified since the last write, in order
+        pending = collections.OrderedDict()
+        # entries whose write failed, they are retrieved again
+        stale = set()
+        modified = []
+
+        def write_pending():
+            to_update = []
+            for dn in pending:
+                entry = entries[dn]
+                changes = entry.generate_modlist()
+                if not changes:
+                    continue
+                self.print_entity(entry, "Updating existing entry")
+                logger.debug("%s", [(op, attr, safe_output(attr, values))
+                                    for op, attr, values in changes])
+                to_update.append(entry)
+            pending.clear()
+
+            updated = self._update_entries(to_update)
+            updated_dns = {entry.dn for entry in updated}
+            for entry in to_update:
+                if entry.dn not in updated_dns:
+                    del entries[entry.dn]
+                    stale.add(entry.dn)
+            modified.extend(updated)
 
-        try:
-            e = self._get_entry(new_entry.dn)
-            if len(e) > 1:
-                # we should only ever get back one entry
-                raise BadSyntax("More than 1 entry returned on a dn search!? %s" % new_entry.dn)
-            entry = e[0]
-            found = True
-            logger.debug("Updating existing entry: %s", entry.dn)
-        except errors.NotFound:
-            # Doesn't exist, start with the default entry
-            entry = new_entry
-            logger.debug("New entry: %s", entry.dn)
-        except errors.DatabaseError:
-            # Doesn't exist, start with the default entry
-            entry = new_entry
-            logger.debug("New entry, using default value: %s", entry.dn)
-
-        self.print_entity(entry, "Initial value")
-
-        # Bring this entry up to date
-        entry = self._apply_update_disposition(update.get('updates'), entry)
-        if entry is None:
-            # It might be None if it is just deleting an entry
-            return None, False
-
-        self.print_entity(entry, "Final value after applying updates")
-
-        added = False
-        updated = False
-        if not found:
-            try:
-                if len(entry):
+        for update in updates:
+            dn = update['dn']
+            if dn in stale:
+                current.update(self._get_entries([dn]))
+                stale.discard(dn)
+
+            entry = entries.get(dn)
+            if entry is None or (current[dn] is None and not len(entry)):
+                # an entry which does not exist and was not created by a
+                # previous update starts with the default entry
+                entry = current[dn]
+                if entry is None:
+                    entry = self._create_default_entry(
+                        dn, update.get('default'))
+
+            # Bring this entry up to date
+            entry = self._apply_update_disposition(
+                update.get('updates'), entry)
+            if entry is None:
+                # It might be None if it is just deleting an entry
+                continue
+            entries[dn] = entry
+
+            if current[dn] is None:
+                if not len(entry):
                     # addifexist may result in an entry with only a
                     # dn defined. In that case there is nothing to do.
                     # It means the entry doesn't exist, so skip it.
-                    try:
-                        self.conn.add_entry(entry)
-                    except errors.NotFound:
-                        # parent entry of the added entry does not exist
-                        # this may not be an error (e.g. entries in NIS container)
-                        logger.error("Parent DN of %s may not exist, cannot "
-                                     "create the entry", entry.dn)
-                        return entry, False
-                added = True
-                self.modified = True
-            except Exception as e:
-                logger.error("Add failure %s", e)
-        else:
-            # Update LDAP
-            try:
-                changes = entry.generate_modlist()
-                if len(changes) >= 1:
-                    updated = True
-                safe_changes = []
-                for (type, attr, values) in changes:
-                    safe_changes.append((type, attr, safe_output(attr, values)))
-                logger.debug("%s", safe_changes)
-                logger.debug("Updated %d", updated)
-                if updated:
-                    self.conn.update_entry(entry)
-                logger.debug("Done")
-            except errors.EmptyModlist:
-                logger.debug("Entry already up-to-date")
-                updated = False
-            except errors.DatabaseError as e:
-                logger.error("Update failed: %s", e)
-                updated = False
-            except errors.DuplicateEntry as e:
-                logger.debug("Update already exists, skip it: %s", e)
-                updated = False
-            except errors.ACIError as e:
-                logger.error("Update failed: %s", e)
-                updated = False
+                    continue
+                write_pending()
+                self.print_entity(entry, "New entry")
+                try:
+                    self.conn.add_entry(entry)
+                except errors.NotFound:
+                    # parent entry of the added entry does not exist
+                    # this may not be an error (e.g. entries in NIS container)
+                    logger.error("Parent DN of %s may not exist, cannot "
+                                 "create the entry", entry.dn)
+                    self.incomplete = True
+                    del entries[dn]
+                except Exception as e:
+                    logger.error("Add failure %s", e)
+                    self.failed = True
+                    del entries[dn]
+                else:
+                    # later updates of the entry modify it
+                    current[dn] = entry
+                    modified.append(entry)
+                continue
+
+            if dn == self.schema_dn:
+                # schema changes must be in place before and after the
+                # entries which use them are modified
+                write_pending()
+                pending[dn] = None
+                write_pending()
+            else:
+                pending[dn] = None
 
-            if updated:
-                self.modified = True
+        write_pending()
 
-        return entry, added or updated
+        if modified:
+            self.modified = True
+        return modified
 
     def _delete_record(self, updates):
         """
@@ -855,6 +968,7 @@ class LDAPUpdate:
             self.modified = True
         except errors.DatabaseError as e:
             logger.error("Delete failed: %s", e)
+            self.failed = True
 
     def get_all_files(self, root, recursive=False):
         """Get all update files"""
@@ -868,6 +982,23 @@ class LDAPUpdate:
         f.sort()
         return f
 
+    def _get_file_digest(self, data):
+        """Return a digest of the content of an update file.
+
+           The substitutions are part of the digest as they are a part of
+           the updates. TIME changes with every run and is left out. The
+           IPA version is included, so all files are applied again after
+           an upgrade.
+        """
+        h = hashlib.sha256()
+        h.update(('VERSION=%s\n' % VERSION).encode('utf-8'))
+        for key, value in sorted(self.sub_dict.items()):
+            if key != 'TIME':
+                h.update(('%s=%s\n' % (key, value)).encode('utf-8'))
+        for line in data:
+            h.update(line.encode('utf-8'))
+        return h.hexdigest()
+
     def _run_update_plugin(self, plugin_name):
         logger.debug("Executing upgrade plugin: %s", plugin_name)
         restart_ds, updates = self.api.Updater[plugin_name]()
@@ -889,15 +1020,24 @@ class LDAPUpdate:
 
     def _run_updates(self, all_updates):
         index_attributes = set()
+        records = []
+
+        def flush_records():
+            for entry in self._update_records(records):
+                if entry.dn.endswith(self.index_suffix):
+                    index_attributes.add(entry.single_value['cn'])
+            del records[:]
+
         for update in all_updates:
             if 'deleteentry' in update:
+                flush_records()
                 self._delete_record(update)
             elif 'plugin' in update:
+                flush_records()
                 self._run_update_plugin(update['plugin'])
             else:
-                entry, modified = self._update_record(update)
-                if modified and entry.dn.endswith(self.index_suffix):
-                    index_attributes.add(entry.single_value['cn'])
+                records.append(update)
+        flush_records()
 
         if index_attributes:
             # The LDAPUpdate framework now keeps record of all changed/added
@@ -907,9 +1047,16 @@ class LDAPUpdate:
             task_dn = self.create_index_task(*sorted(index_attributes))
             self.monitor_index_task(task_dn)
 
-    def update(self, files, ordered=True):
+    def update(self, files, ordered=True, incremental=False, force=False):
         """Execute the update. files is a list of the update files to use.
         :param ordered: Update files are executed in alphabetical order
+        :param incremental: Record the update files which were applied and
+            skip the entries of those which were already applied unchanged.
+            Files with updates which failed or were skipped because an entry
+            or its parent did not exist are not recorded. Update plugins are
+            executed every time, they check the replicated data on their own.
+        :param force: Apply all update files even if incremental is set, the
+            applied state is still recorded
 
         returns True if anything was changed, otherwise False
         """
@@ -932,7 +1079,30 @@ class LDAPUpdate:
 
                 all_updates = []
                 self.parse_update_file(f, data, all_updates)
+
+                digest = None
+                if incremental:
+                    name = os.path.basename(f)
+                    digest = self._get_file_digest(data)
+                    if (not force and sysupgrade.get_upgrade_state(
+                            'ldapupdate', name) == digest):
+                        # the plugins are executed every time
+                        logger.debug(
+                            "Update file '%s' was already applied", f)
+                        all_updates = [
+                            u for u in all_updates if 'plugin' in u]
+
+                self.failed = self.incomplete = False
                 self._run_updates(all_updates)
+                if digest is not None and not self.failed:
+                    if self.incomplete:
+                        logger.debug(
+                            "Update file '%s' skipped updates of entries "
+                            "which do not exist, it is applied again next "
+                            "time", f)
+                    else:
+                        sysupgrade.set_upgrade_state(
+                            'ldapupdate', name, digest)
                 dur = time.time() - start
                 logger.debug(
                     "LDAP update duration: %s %.03f sec", f, dur,
@@ -1890,14 +1890,21 @@ def empty_ccache():
         shutil.rmtree(kpath_dir)
 
 
-def upgrade():
+def upgrade(force=False):
+    """
+    Upgrade the LDAP data and the configuration of the IPA services.
+
+    The entries of update files which were already applied unchanged are
+    skipped, unless force is set. Update plugins are executed every time.
+    """
     realm = api.env.realm
     schema_files = [os.path.join(paths.USR_SHARE_IPA_DIR, f) for f
                     in dsinstance.ALL_SCHEMA_FILES]
 
     schema_files.extend(dsinstance.get_all_external_schema_files(
                         paths.EXTERNAL_SCHEMA_DIR))
-    data_upgrade = IPAUpgrade(realm, schema_files=schema_files)
+    data_upgrade = IPAUpgrade(realm, schema_files=schema_files,
+                              incremental=True, force=force)
 
     try:
         data_upgrade.create_instance()
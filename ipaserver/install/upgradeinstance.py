@@ -78,10 +78,14 @@ class IPAUpgrade(service.Service):
     listeners and updating over ldapi. This way we know the server is
     quiet.
     """
-    def __init__(self, realm_name, files=[], schema_files=[]):
+    def __init__(self, realm_name, files=[], schema_files=[],
+                 incremental=False, force=False):
         """
         realm_name: kerberos realm name, used to determine DS instance dir
         files: list of update files to process. If none use UPDATEDIR
+        incremental: skip the entries of update files which were already
+                     applied unchanged
+        force: apply all updates even if incremental is set
         """
 
         ext = ''
@@ -97,6 +101,8 @@ class IPAUpgrade(service.Service):
         self.modified = False
         self.serverid = serverid
         self.schema_files = schema_files
+        self.incremental = incremental
+        self.force = force
 
     def __start(self):
         srv = services.service(self.service_name, api)
@@ -272,7 +278,10 @@ class IPAUpgrade(service.Service):
             ld = ldapupdate.LDAPUpdate(api=self.api)
             if len(self.files) == 0:
                 self.files = ld.get_all_files(ldapupdate.UPDATES_DIR)
-            self.modified = (ld.update(self.files) or self.modified)
+            self.modified = (ld.update(self.files,
+                                       incremental=self.incremental,
+                                       force=self.force) or
+                             self.modified)
         except ldapupdate.BadSyntax as e:
             logger.error('Bad syntax in upgrade %s', e)
             raise
@@ -146,6 +146,17 @@ def find_providing_server(svcname, conn=None, preferred_hosts=(), api=api):
         return servers[0]
 
 
+def _get_cached(conn, key, func, *dns):
+    """Memoize func() in the request cache of the ldap2 backend
+
+    Other connections have no request cache, func() is called every time.
+    """
+    get_cached = getattr(conn, 'get_cached', None)
+    if get_cached is None:
+        return func()
+    return get_cached(key, func, *dns)
+
+
 def get_masters(conn=None, api=api):
     """Get all master hostnames
 
@@ -157,8 +168,12 @@ def get_masters(conn=None, api=api):
         conn = api.Backend.ldap2
 
     dn = DN(api.env.container_masters, api.env.basedn)
-    entries = conn.get_entries(dn, conn.SCOPE_ONELEVEL, None, ['cn'])
-    return list(e['cn'][0] for e in entries)
+
+    def get_master_names():
+        entries = conn.get_entries(dn, conn.SCOPE_ONELEVEL, None, ['cn'])
+        return tuple(e['cn'][0] for e in entries)
+
+    return list(_get_cached(conn, 'masters', get_master_names, dn))
 
 
 def is_service_enabled(svcname, conn=None, api=api):
@@ -185,13 +200,17 @@ def is_service_enabled(svcname, conn=None, api=api):
         },
         rules='&'
     )
-    try:
-        conn.find_entries(
-            filter=query_filter,
-            attrs_list=[],
-            base_dn=dn
-        )
-    except errors.NotFound:
-        return False
-    else:
-        return True
+
+    def find_service():
+        try:
+            conn.find_entries(
+                filter=query_filter,
+                attrs_list=[],
+                base_dn=dn
+            )
+        except errors.NotFound:
+            return False
+        else:
+            return True
+
+    return _get_cached(conn, ('service_enabled', svcname), find_service, dn)
@@ -702,43 +702,34 @@ Search for ACIs.
         entry = ldap.get_entry(self.api.env.basedn, ['aci'])
 
         acis = _convert_strings_to_acis(entry.get('aci', []))
-        results = []
+
+        # Every option adds a predicate; an ACI is returned when it
+        # matches all of them, so the ACIs are filtered in a single pass.
+        filters = []
 
         if term:
             term = term.lower()
-            for a in acis:
-                if a.name.lower().find(term) != -1 and a not in results:
-                    results.append(a)
-            acis = list(results)
-        else:
-            results = list(acis)
+            filters.append(lambda a: term in a.name.lower())
 
         if kw.get('aciname'):
-            for a in acis:
-                prefix, name = _parse_aci_name(a.name)
-                if name != kw['aciname']:
-                    results.remove(a)
-            acis = list(results)
+            filters.append(
+                lambda a: _parse_aci_name(a.name)[1] == kw['aciname'])
 
         if kw.get('aciprefix'):
-            for a in acis:
-                prefix, name = _parse_aci_name(a.name)
-                if prefix != kw['aciprefix']:
-                    results.remove(a)
-            acis = list(results)
+            filters.append(
+                lambda a: _parse_aci_name(a.name)[0] == kw['aciprefix'])
 
         if kw.get('attrs'):
-            for a in acis:
+            attrs = [t.lower() for t in kw['attrs']]
+
+            def match_attrs(a):
                 if 'targetattr' not in a.target:
-                    results.remove(a)
-                    continue
-                alist1 = sorted(
-                    [t.lower() for t in a.target['targetattr']['expression']]
-                )
-                alist2 = sorted([t.lower() for t in kw['attrs']])
-                if len(set(alist1) & set(alist2)) != len(alist2):
-                    results.remove(a)
-            acis = list(results)
+                    return False
+                targetattrs = set(
+                    t.lower() for t in a.target['targetattr']['expression'])
+                return len(targetattrs & set(attrs)) == len(attrs)
+
+            filters.append(match_attrs)
 
         if kw.get('permission'):
             try:
@@ -748,19 +739,14 @@ Search for ACIs.
             except errors.NotFound:
                 pass
             else:
-                for a in acis:
-                    uri = 'ldap:///%s' % entry.dn
-                    if a.bindrule['expression'] != uri:
-                        results.remove(a)
-                acis = list(results)
+                uri = 'ldap:///%s' % entry.dn
+                filters.append(lambda a: a.bindrule['expression'] == uri)
 
         if kw.get('permissions'):
-            for a in acis:
-                alist1 = sorted(a.permissions)
-                alist2 = sorted(kw['permissions'])
-                if len(set(alist1) & set(alist2)) != len(alist2):
-                    results.remove(a)
-            acis = list(results)
+            permissions = kw['permissions']
+            filters.append(
+                lambda a: (len(set(a.permissions) & set(permissions)) ==
+                           len(permissions)))
 
         if kw.get('memberof'):
             try:
@@ -769,95 +755,67 @@ Search for ACIs.
                 pass
             else:
                 memberof_filter = '(memberOf=%s)' % dn
-                for a in acis:
-                    if 'targetfilter' in a.target:
-                        targetfilter = a.target['targetfilter']['expression']
-                        if targetfilter != memberof_filter:
-                            results.remove(a)
-                    else:
-                        results.remove(a)
+                filters.append(
+                    lambda a: ('targetfilter' in a.target and
+                               a.target['targetfilter']['expression'] ==
+                               memberof_filter))
 
         if kw.get('type'):
-            for a in acis:
-                if 'target' in a.target:
-                    target = a.target['target']['expression']
-                else:
-                    results.remove(a)
-                    continue
-                found = False
-                for k, value in _type_map.items():
-                    if value == target and kw['type'] == k:
-                        found = True
-                        break
-                if not found:
-                    try:
-                        results.remove(a)
-                    except ValueError:
-                        pass
+            type_target = _type_map.get(kw['type'])
+            filters.append(
+                lambda a: ('target' in a.target and
+                           a.target['target']['expression'] == type_target))
 
         if kw.get('selfaci', False) is True:
-            for a in acis:
-                if a.bindrule['expression'] != u'ldap:///self':
-                    try:
-                        results.remove(a)
-                    except ValueError:
-                        pass
+            filters.append(
+                lambda a: a.bindrule['expression'] == u'ldap:///self')
 
         if kw.get('group'):
-            for a in acis:
+            def match_group(a):
                 groupdn = a.bindrule['expression']
                 groupdn = DN(groupdn.replace('ldap:///',''))
                 try:
                     cn = groupdn[0]['cn']
                 except (IndexError, KeyError):
                     cn = None
-                if cn is None or cn != kw['group']:
-                    try:
-                        results.remove(a)
-                    except ValueError:
-                        pass
+                return cn is not None and cn == kw['group']
+
+            filters.append(match_group)
 
         if kw.get('targetgroup'):
-            for a in acis:
-                found = False
-                if 'target' in a.target:
-                    target = a.target['target']['expression']
-                    targetdn = DN(target.replace('ldap:///',''))
-                    group_container_dn = DN(api.env.container_group, api.env.basedn)
-                    if targetdn.endswith(group_container_dn):
-                        try:
-                            cn = targetdn[0]['cn']
-                        except (IndexError, KeyError):
-                            cn = None
-                        if cn == kw['targetgroup']:
-                            found = True
-                if not found:
-                    try:
-                        results.remove(a)
-                    except ValueError:
-                        pass
+            group_container_dn = DN(api.env.container_group, api.env.basedn)
+
+            def match_targetgroup(a):
+                if 'target' not in a.target:
+                    return False
+                target = a.target['target']['expression']
+                targetdn = DN(target.replace('ldap:///',''))
+                if not targetdn.endswith(group_container_dn):
+                    return False
+                try:
+                    cn = targetdn[0]['cn']
+                except (IndexError, KeyError):
+                    cn = None
+                return cn == kw['targetgroup']
+
+            filters.append(match_targetgroup)
 
         if kw.get('filter'):
             if not kw['filter'].startswith('('):
                 kw['filter'] = unicode('('+kw['filter']+')')
-            for a in acis:
-                if 'targetfilter' not in a.target or\
-                    not a.target['targetfilter']['expression'] or\
-                    a.target['targetfilter']['expression'] != kw['filter']:
-                    results.remove(a)
+            filters.append(
+                lambda a: ('targetfilter' in a.target and
+                           a.target['targetfilter']['expression'] ==
+                           kw['filter']))
 
         if kw.get('subtree'):
-            for a in acis:
-                if 'target' in a.target:
-                    target = a.target['target']['expression']
-                else:
-                    results.remove(a)
-                    continue
-                if kw['subtree'].lower() != target.lower():
-                    try:
-                        results.remove(a)
-                    except ValueError:
-                        pass
+            subtree = kw['subtree'].lower()
+            filters.append(
+                lambda a: ('target' in a.target and
+                           a.target['target']['expression'].lower() ==
+                           subtree))
+
+        results = [a for a in acis if all(f(a) for f in filters)]
 
         acis = []
         for result in results:
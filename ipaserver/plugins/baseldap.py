@@ -24,6 +24,7 @@ import re
 import time
 from copy import deepcopy
 import base64
+import functools
 
 import six
 
@@ -37,6 +38,7 @@ from ipalib.util import json_serialize, validate_hostname
 from ipalib.capabilities import client_has_capability
 from ipalib.messages import add_message, SearchResultTruncated
 from ipapython.dn import DN, RDN
+from ipapython.ipaldap import LDAPEntry
 from ipapython.version import API_VERSION
 
 if six.PY3:
@@ -44,6 +46,10 @@ if six.PY3:
 
 DNA_MAGIC = -1
 
+# Number of raw member values whose classification is cached per member
+# attribute of an object
+MEMBER_CLASSIFIER_CACHE_SIZE = 65536
+
 global_output_params = (
     Flag('has_password',
         label=_('Password'),
@@ -527,6 +533,260 @@ def add_missing_object_class(ldap, objectclass, dn, entry_attrs=None, update=Tru
     return entry_attrs
 
 
+class MemberClassifier:
+    """
+    Classify raw values of a member attribute by the object they refer to.
+
+    The containers of the objects the attribute can refer to are computed
+    once. Raw values in the normalized form returned by the server are
+    matched against them and their primary key is extracted without
+    parsing them into DN objects. Other values fall back to DN matching.
+    Results are kept in a LRU cache shared between requests.
+    """
+
+    def __init__(self, api, attr, ldap_obj_names):
+        self.candidates = []
+        for ldap_obj_name in ldap_obj_names:
+            ldap_obj = api.Object[ldap_obj_name]
+            container_dn = DN(ldap_obj.container_dn, api.env.basedn)
+            suffix = b',' + str(container_dn).lower().encode('utf-8')
+            self.candidates.append((
+                ldap_obj, container_dn, suffix,
+                '%s_%s' % (attr, ldap_obj.name)))
+        self._classify = functools.lru_cache(
+            maxsize=MEMBER_CLASSIFIER_CACHE_SIZE)(self._classify_value)
+
+    def classify(self, value):
+        """
+        Return (attribute name, primary key) for a raw member value, or None
+        if the value does not refer to any of the objects.
+        """
+        result = self._classify(value)
+        if result is None:
+            return None
+        new_attr_name, new_value, ldap_obj = result
+        if ldap_obj is not None:
+            # the primary key of objects with a RDN attribute is read from
+            # the entry and can change while the DN stays the same
+            new_value = ldap_obj.get_primary_key_from_dn(
+                DN(value.decode('utf-8')))
+        return new_attr_name, new_value
+
+    @staticmethod
+    def _is_normalized(value):
+        return not any(c in value for c in (b'\\', b'+', b'"', b'=#',
+                                            b', ', b' ,', b'= ', b' ='))
+
+    def _classify_value(self, value):
+        if self._is_normalized(value):
+            lower = value.lower()
+            for ldap_obj, _container_dn, suffix, new_attr_name in (
+                    self.candidates):
+                if not lower.endswith(suffix):
+                    continue
+                if ldap_obj.rdn_attribute:
+                    return new_attr_name, None, ldap_obj
+                name = ldap_obj.primary_key.name
+                for rdn in value.split(b','):
+                    rdn_attr, _sep, rdn_value = rdn.partition(b'=')
+                    if rdn_attr.decode('utf-8') == name:
+                        return new_attr_name, rdn_value.decode('utf-8'), None
+                break
+
+        memberdn = DN(value.decode('utf-8'))
+        for ldap_obj, container_dn, _suffix, new_attr_name in self.candidates:
+            if memberdn.endswith(container_dn):
+                if ldap_obj.rdn_attribute:
+                    return new_attr_name, None, ldap_obj
+                return (new_attr_name,
+                        ldap_obj.get_primary_key_from_dn(memberdn), None)
+        return None
+
+
+class IndirectMembership:
+    """
+    Resolve indirect members and memberships of many entries at once.
+
+    The nesting and membership edges of the given entries are fetched with
+    one paged search for every filter_chunk_size entries, the first time
+    they are needed. Because memberOf values are maintained transitively by
+    the server, the subgraph reachable from the entries is fully described
+    by the entries which are nested in them or which refer to them, so only
+    that part of the tree is loaded, regardless of the size of the directory.
+    The results are the same as those of LDAPObject.get_memberindirect and
+    LDAPObject.get_memberofindirect.
+
+    Direct memberships are derived from memberOf without reading the member
+    lists of the parent entries, which may be large: a memberOf value is
+    direct if the parent was found by the search for the entries it refers
+    to, and it is not reachable through another parent of the entry. Only
+    a parent which is both is checked with a base search.
+
+    Member values are matched by their raw value. Entries whose DN contains
+    escaped characters may be serialized differently by the server and are
+    not resolvable, see resolvable().
+    """
+    member_attrs = ('member', 'memberuser', 'memberhost')
+
+    # Maximum number of DNs combined into the filter of a single search
+    filter_chunk_size = 100
+
+    def __init__(self, ldap, base_dn, entries):
+        self.ldap = ldap
+        self.base_dn = base_dn
+        self._entries = [e for e in entries if self.resolvable(e)]
+        self._dns = [e.dn for e in self._entries]
+        # memberof value -> set of members of the nested groups
+        self._nested = None
+        # entry DN -> set of memberof values of its direct parents
+        self._parents = None
+
+    @staticmethod
+    def _key(value):
+        return value.lower()
+
+    def _dn_key(self, dn):
+        return self._key(str(dn).encode('utf-8'))
+
+    def _chunks(self, values):
+        for i in range(0, len(values), self.filter_chunk_size):
+            yield values[i:i + self.filter_chunk_size]
+
+    def _search(self, filter, attrs_list):
+        try:
+            yield from self.ldap.iter_entries(
+                self.base_dn,
+                filter=filter,
+                attrs_list=attrs_list,
+                size_limit=-1,  # paged search will get everything
+                paged_search=True)
+        except errors.NotFound:
+            pass
+
+    def _nested_filter(self, dns):
+        mo_filter = self.ldap.make_filter(
+            {'memberof': dns}, rules=self.ldap.MATCH_ANY)
+        return self.ldap.combine_filters(
+            ('(member=*)', mo_filter), self.ldap.MATCH_ALL)
+
+    def _ancestors_filter(self, dns):
+        has_members = self.ldap.combine_filters(
+            ['({}=*)'.format(attr) for attr in self.member_attrs],
+            self.ldap.MATCH_ANY)
+        mo_filter = self.ldap.make_filter(
+            {'memberof': dns}, rules=self.ldap.MATCH_ANY)
+        return self.ldap.combine_filters(
+            (has_members, mo_filter), self.ldap.MATCH_ALL)
+
+    def _parents_filter(self, dns):
+        return self.ldap.make_filter(
+            {attr: dns for attr in self.member_attrs},
+            rules=self.ldap.MATCH_ANY)
+
+    def _get_nested(self):
+        if self._nested is None:
+            nested = {}
+            for dns in self._chunks(self._dns):
+                for entry in self._search(self._nested_filter(dns),
+                                          ['member', 'memberof']):
+                    members = entry.raw.get('member', [])
+                    for value in entry.raw.get('memberof', []):
+                        nested.setdefault(
+                            self._key(value), set()).update(members)
+            self._nested = nested
+        return self._nested
+
+    def _get_ancestors(self, memberof):
+        """
+        Get the memberOf values of the parents of the entries.
+
+        Returns a dict mapping the key of every parent which is nested in
+        another parent to the keys of its memberOf values.
+        """
+        ancestors = {}
+        dns = [DN(value.decode('utf-8')) for value in memberof.values()]
+        for chunk in self._chunks(dns):
+            for entry in self._search(self._ancestors_filter(chunk),
+                                      ['memberof']):
+                key = self._dn_key(entry.dn)
+                if key in memberof:
+                    ancestors[key] = {
+                        self._key(v) for v in entry.raw.get('memberof', [])}
+        return ancestors
+
+    def _is_direct_member(self, parent, dn):
+        try:
+            self.ldap.get_entries(
+                DN(parent.decode('utf-8')), self.ldap.SCOPE_BASE,
+                self._parents_filter([dn]), [''])
+        except errors.NotFound:
+            return False
+        return True
+
+    def _get_parents(self):
+        if self._parents is None:
+            # key of every memberof value of the entries -> the value
+            memberof = {}
+            for entry in self._entries:
+                for value in entry.raw.get('memberof', []):
+                    memberof.setdefault(self._key(value), value)
+            ancestors = self._get_ancestors(memberof)
+
+            parents = {}
+            for chunk in self._chunks(self._entries):
+                # parents which refer to at least one entry of the chunk,
+                # only their DNs are read
+                found = {
+                    self._dn_key(entry.dn)
+                    for entry in self._search(
+                        self._parents_filter([e.dn for e in chunk]), [''])
+                }
+                for entry in chunk:
+                    keys = {
+                        self._key(v) for v in entry.raw.get('memberof', [])}
+                    through = set()
+                    for key in keys:
+                        through.update(ancestors.get(key, ()))
+                    direct = set()
+                    for key in keys & found:
+                        if (key not in through or self._is_direct_member(
+                                memberof[key], entry.dn)):
+                            direct.add(key)
+                    parents[self._dn_key(entry.dn)] = direct
+            self._parents = parents
+        return self._parents
+
+    def resolvable(self, entry):
+        """
+        Return True if the DN of the entry can be matched against raw
+        member values.
+        """
+        return '\\' not in str(entry.dn)
+
+    def get_memberindirect(self, group_entry):
+        """
+        Get indirect members
+        """
+        key = self._dn_key(group_entry.dn)
+
+        indirect = set(self._get_nested().get(key, ()))
+        indirect.difference_update(group_entry.raw.get('member', []))
+
+        if indirect:
+            group_entry.raw['memberindirect'] = list(indirect)
+
+    def get_memberofindirect(self, entry):
+        parents = self._get_parents().get(self._dn_key(entry.dn), ())
+
+        indirect = set(entry.raw.get('memberof', []))
+        direct = {v for v in indirect if self._key(v) in parents}
+        indirect.difference_update(direct)
+
+        entry.raw['memberof'] = list(direct)
+        if indirect:
+            entry.raw['memberofindirect'] = list(indirect)
+
+
 class LDAPObject(Object):
     """
     Object representing a LDAP entry.
@@ -583,6 +843,11 @@ class LDAPObject(Object):
     object_not_found_msg = _('%(pkey)s: %(oname)s not found')
     already_exists_msg = _('%(oname)s with name "%(pkey)s" already exists')
 
+    def _on_finalize(self):
+        super(LDAPObject, self)._on_finalize()
+        # member attribute -> MemberClassifier, created on first use
+        self._member_classifiers = {}
+
     def get_dn(self, *keys, **kwargs):
         if self.parent_object:
             parent_dn = self.api.Object[self.parent_object].get_dn(*keys[:-1])
@@ -607,8 +872,11 @@ class LDAPObject(Object):
 
     def get_dn_if_exists(self, *keys, **kwargs):
         dn = self.get_dn(*keys, **kwargs)
-        entry = self.backend.get_entry(dn, [''])
-        return entry.dn
+        # only existing entries are memoized, NotFound is raised every time
+        return self.backend.get_cached(
+            ('dn_if_exists', dn),
+            lambda: self.backend.get_entry(dn, ['']).dn,
+            dn)
 
     def get_primary_key_from_dn(self, dn):
         assert isinstance(dn, DN)
@@ -649,11 +917,21 @@ class LDAPObject(Object):
         oc = [x.lower() for x in classes]
         return objectclass.lower() in oc
 
+    def get_member_classifier(self, attr):
+        """
+        Return the MemberClassifier of a member attribute of this object.
+        """
+        try:
+            return self._member_classifiers[attr]
+        except KeyError:
+            classifier = MemberClassifier(
+                self.api, attr, self.attribute_members[attr])
+            return self._member_classifiers.setdefault(attr, classifier)
+
     def convert_attribute_members(self, entry_attrs, *keys, **options):
         if options.get('raw', False):
             return
 
-        container_dns = {}
         new_attrs = {}
 
         for attr in self.attribute_members:
@@ -663,32 +941,34 @@ class LDAPObject(Object):
                 continue
             del entry_attrs[attr]
 
+            classifier = self.get_member_classifier(attr)
             for member in value:
-                memberdn = DN(member.decode('utf-8'))
-                for ldap_obj_name in self.attribute_members[attr]:
-                    ldap_obj = self.api.Object[ldap_obj_name]
-                    try:
-                        container_dn = container_dns[ldap_obj_name]
-                    except KeyError:
-                        container_dn = DN(ldap_obj.container_dn, api.env.basedn)
-                        container_dns[ldap_obj_name] = container_dn
-
-                    if memberdn.endswith(container_dn):
-                        new_value = ldap_obj.get_primary_key_from_dn(memberdn)
-                        new_attr_name = '%s_%s' % (attr, ldap_obj.name)
-                        try:
-                            new_attr = new_attrs[new_attr_name]
-                        except KeyError:
-                            new_attr = entry_attrs.setdefault(new_attr_name, [])
-                            new_attrs[new_attr_name] = new_attr
-                        new_attr.append(new_value)
-                        break
+                result = classifier.classify(member)
+                if result is None:
+                    continue
+                new_attr_name, new_value = result
+                try:
+                    new_attr = new_attrs[new_attr_name]
+                except KeyError:
+                    new_attr = entry_attrs.setdefault(new_attr_name, [])
+                    new_attrs[new_attr_name] = new_attr
+                new_attr.append(new_value)
+
+    def get_indirect_members(self, entry_attrs, attrs_list, membership=None):
+        """
+        Add indirect members and memberships to the entry.
 
-    def get_indirect_members(self, entry_attrs, attrs_list):
+        :param membership: IndirectMembership instance used to resolve the
+            indirect membership in memory instead of searching for it
+        """
+        if membership is not None and membership.resolvable(entry_attrs):
+            obj = membership
+        else:
+            obj = self
         if 'memberindirect' in attrs_list:
-            self.get_memberindirect(entry_attrs)
+            obj.get_memberindirect(entry_attrs)
         if 'memberofindirect' in attrs_list:
-            self.get_memberofindirect(entry_attrs)
+            obj.get_memberofindirect(entry_attrs)
 
     def get_memberindirect(self, group_entry):
         """
@@ -698,19 +978,17 @@ class LDAPObject(Object):
         mo_filter = self.backend.make_filter({'memberof': group_entry.dn})
         filter = self.backend.combine_filters(
             ('(member=*)', mo_filter), self.backend.MATCH_ALL)
+        indirect = set()
         try:
-            result = self.backend.get_entries(
-                self.api.env.basedn,
-                filter=filter,
-                attrs_list=['member'],
-                size_limit=-1, # paged search will get everything anyway
-                paged_search=True)
+            for entry in self.backend.iter_entries(
+                    self.api.env.basedn,
+                    filter=filter,
+                    attrs_list=['member'],
+                    size_limit=-1,  # paged search will get everything anyway
+                    paged_search=True):
+                indirect.update(entry.raw.get('member', []))
         except errors.NotFound:
-            result = []
-
-        indirect = set()
-        for entry in result:
-            indirect.update(entry.raw.get('member', []))
+            pass
         indirect.difference_update(group_entry.raw.get('member', []))
 
         if indirect:
@@ -721,23 +999,21 @@ class LDAPObject(Object):
         dn = entry.dn
         filter = self.backend.make_filter(
             {'member': dn, 'memberuser': dn, 'memberhost': dn})
-        try:
-            result = self.backend.get_entries(
-                self.api.env.basedn,
-                filter=filter,
-                attrs_list=[''],
-                size_limit=-1,  # paged search will get everything anyway
-                paged_search=True)
-        except errors.NotFound:
-            result = []
-
         direct = set()
         indirect = set(entry.raw.get('memberof', []))
-        for group_entry in result:
-            dn = str(group_entry.dn).encode('utf-8')
-            if dn in indirect:
-                indirect.remove(dn)
-                direct.add(dn)
+        try:
+            for group_entry in self.backend.iter_entries(
+                    self.api.env.basedn,
+                    filter=filter,
+                    attrs_list=[''],
+                    size_limit=-1,  # paged search will get everything anyway
+                    paged_search=True):
+                dn = str(group_entry.dn).encode('utf-8')
+                if dn in indirect:
+                    indirect.remove(dn)
+                    direct.add(dn)
+        except errors.NotFound:
+            pass
 
         entry.raw['memberof'] = list(direct)
         if indirect:
@@ -1109,6 +1385,27 @@ last, after all sets and adds."""),
         """Shortcut for register_callback('exc', ...)"""
         cls.register_callback('exc', callback, first)
 
+    def _get_post_read_attrs(self, attrs_list):
+        """
+        Get the attributes to request with the Post-Read control of a write,
+        or None if the entry has to be read again after the write.
+
+        The Post-Read control returns the entry as the operation wrote it.
+        Operational attributes and memberOf, which server plugins update
+        after the operation, are not reliably included.
+        """
+        ldap = self.obj.backend
+        for attr in attrs_list:
+            attr = attr.lower()
+            if attr == '+' or attr == 'memberof':
+                return None
+            if attr == '*':
+                if 'memberof' in self.obj.attribute_members:
+                    return None
+            elif ldap.get_attribute_operational(attr):
+                return None
+        return attrs_list
+
     def _exc_wrapper(self, keys, options, call_func):
         """Function wrapper that automatically calls exception callbacks"""
         def wrapped(*call_args, **call_kwargs):
@@ -1206,8 +1503,10 @@ class LDAPCreate(BaseLDAPCommand, crud.Create):
         _check_limit_object_class(self.api.Backend.ldap2.schema.attribute_types(self.obj.limit_object_classes), list(entry_attrs), allow_only=True)
         _check_limit_object_class(self.api.Backend.ldap2.schema.attribute_types(self.obj.disallow_object_classes), list(entry_attrs), allow_only=False)
 
+        post_read = self._get_post_read_attrs(attrs_list)
         try:
-            self._exc_wrapper(keys, options, ldap.add_entry)(entry_attrs)
+            created = self._exc_wrapper(keys, options, ldap.add_entry)(
+                entry_attrs, post_read=post_read)
         except errors.NotFound:
             parent = self.obj.parent_object
             if parent:
@@ -1226,7 +1525,10 @@ class LDAPCreate(BaseLDAPCommand, crud.Create):
             self.obj.handle_duplicate_entry(*keys)
 
         try:
-            if self.obj.rdn_attribute:
+            if isinstance(created, LDAPEntry):
+                # the server returned the entry as it was created
+                entry_attrs = created
+            elif self.obj.rdn_attribute:
                 # make sure objectclass is either set or None
                 if self.obj.object_class:
                     object_class = self.obj.object_class
@@ -1484,20 +1786,26 @@ class LDAPUpdate(LDAPQuery, crud.Update):
                 entry_attrs.dn, list(entry_attrs))
             update.update(entry_attrs)
 
-            self._exc_wrapper(keys, options, ldap.update_entry)(update)
+            updated = self._exc_wrapper(keys, options, ldap.update_entry)(
+                update, post_read=self._get_post_read_attrs(attrs_list))
         except errors.EmptyModlist as e:
             if not rdnupdate:
                 raise e
+            updated = None
         except errors.NotFound:
             raise self.obj.handle_not_found(*keys)
 
-        try:
-            entry_attrs = self._exc_wrapper(keys, options, ldap.get_entry)(
-                entry_attrs.dn, attrs_list)
-        except errors.NotFound:
-            raise errors.MidairCollision(
-                message=_('the entry was deleted while being modified')
-            )
+        if isinstance(updated, LDAPEntry):
+            # the server returned the entry as it was modified
+            entry_attrs = updated
+        else:
+            try:
+                entry_attrs = self._exc_wrapper(keys, options, ldap.get_entry)(
+                    entry_attrs.dn, attrs_list)
+            except errors.NotFound:
+                raise errors.MidairCollision(
+                    message=_('the entry was deleted while being modified')
+                )
 
         self.obj.get_indirect_members(entry_attrs, attrs_list)
 
@@ -1705,13 +2013,15 @@ class LDAPAddMember(LDAPModMember):
         completed = 0
         for (attr, objs) in member_dns.items():
             for ldap_obj_name in objs:
+                m_dns = []
                 for m_dn in member_dns[attr][ldap_obj_name]:
                     assert isinstance(m_dn, DN)
-                    if not m_dn:
-                        continue
-                    try:
-                        ldap.add_entry_to_group(m_dn, dn, attr, allow_same=self.allow_same)
-                    except errors.PublicError as e:
+                    if m_dn:
+                        m_dns.append(m_dn)
+                results = ldap.add_entries_to_group(
+                    m_dns, dn, attr, allow_same=self.allow_same)
+                for m_dn, e in zip(m_dns, results):
+                    if e is not None:
                         ldap_obj = self.api.Object[ldap_obj_name]
                         failed[attr][ldap_obj_name].append((
                             ldap_obj.get_primary_key_from_dn(m_dn),
@@ -1802,14 +2112,15 @@ class LDAPRemoveMember(LDAPModMember):
 
         completed = 0
         for (attr, objs) in member_dns.items():
-            for ldap_obj_name, m_dns in objs.items():
-                for m_dn in m_dns:
+            for ldap_obj_name in objs:
+                m_dns = []
+                for m_dn in member_dns[attr][ldap_obj_name]:
                     assert isinstance(m_dn, DN)
-                    if not m_dn:
-                        continue
-                    try:
-                        ldap.remove_entry_from_group(m_dn, dn, attr)
-                    except errors.PublicError as e:
+                    if m_dn:
+                        m_dns.append(m_dn)
+                results = ldap.remove_entries_from_group(m_dns, dn, attr)
+                for m_dn, e in zip(m_dns, results):
+                    if e is not None:
                         ldap_obj = self.api.Object[ldap_obj_name]
                         failed[attr][ldap_obj_name].append((
                             ldap_obj.get_primary_key_from_dn(m_dn),
@@ -1887,6 +2198,11 @@ class LDAPSearch(BaseLDAPCommand, crud.Search):
     # Set the following attribute to False to turn sorting off
     sort_result_entries = True
 
+    # When more entries than this are found, indirect members and
+    # memberships are resolved from the membership graph of the found
+    # entries rather than with two subtree searches for every entry
+    indirect_members_graph_threshold = 10
+
     takes_options = (
         Int('timelimit?',
             label=_('Time Limit'),
@@ -2092,12 +2408,20 @@ class LDAPSearch(BaseLDAPCommand, crud.Search):
                         x[self.obj.primary_key.name][0])
                 entries.sort(key=sort_key)
 
-        if not options.get('raw', False):
-            for entry in entries:
-                self.obj.get_indirect_members(entry, attrs_list)
-                self.obj.convert_attribute_members(entry, *args, **options)
+        membership = None
+        if (len(entries) > self.indirect_members_graph_threshold and
+                ('memberindirect' in attrs_list or
+                 'memberofindirect' in attrs_list)):
+            membership = IndirectMembership(
+                ldap, self.api.env.basedn, entries)
 
+        # resolve indirect members and convert each entry in a single pass,
+        # so the LDAPEntry objects are released as soon as they are
+        # converted; indirect member lookups stream their paged results
         for (i, e) in enumerate(entries):
+            if not options.get('raw', False):
+                self.obj.get_indirect_members(e, attrs_list, membership)
+                self.obj.convert_attribute_members(e, *args, **options)
             entries[i] = entry_to_dict(e, **options)
             entries[i]['dn'] = e.dn
 
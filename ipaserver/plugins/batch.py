@@ -18,17 +18,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 import logging
+import os
 
 import six
 
-from ipalib import api, errors
+from ipalib import api, crud, errors
 from ipalib import Command
 from ipalib.frontend import Local
 from ipalib.parameters import Str, Dict
 from ipalib.output import Output
 from ipalib.text import _
-from ipalib.request import context
+from ipalib.request import context, destroy_context
 from ipalib.plugable import Registry
 from ipapython.version import API_VERSION
 
@@ -66,6 +68,24 @@ logger = logging.getLogger(__name__)
 
 register = Registry()
 
+# Commands which only read data in addition to the crud.Retrieve and
+# crud.Search subclasses
+READ_ONLY_COMMANDS = frozenset((
+    'env',
+    'ping',
+    'plugins',
+    'whoami',
+))
+
+# Request context attributes copied to worker threads of a parallel batch
+INHERITED_CONTEXT = (
+    'ccache_name',
+    'client_ip',
+    'languages',
+    'principal',
+)
+
+
 @register()
 class batch(Command):
     __doc__ = _('Make multiple ipa calls via one remote procedure call')
@@ -157,53 +177,143 @@ class batch(Command):
             logger.debug('batch: %s',
                          ', '.join(super(batch, self)._repr_iter(**params)))
 
-    def execute(self, methods=None, **options):
-        results = []
-        for arg in (methods or []):
-            params = dict()
-            name = None
-            try:
-                self._validate_request(arg)
-                name = arg['method']
-                a, kw = arg['params']
-                newkw = dict((str(k), v) for k, v in kw.items())
-                params = api.Command[name].args_options_2_params(
-                    *a, **newkw)
-                newkw.setdefault('version', options['version'])
-
-                result = api.Command[name](*a, **newkw)
+    def _is_read_only(self, request):
+        """
+        Check whether a request in a batch only reads data and can be run
+        concurrently with other read-only requests.
+
+        Malformed requests are not considered read-only so they are
+        reported exactly as in sequential execution.
+        """
+        try:
+            self._validate_request(request)
+        except Exception:
+            return False
+        cmd = self.api.Command[request['method']]
+        if cmd.name in READ_ONLY_COMMANDS:
+            return True
+        return isinstance(cmd, (crud.Retrieve, crud.Search))
+
+    def _execute_request(self, arg, version):
+        """
+        Execute a single request of a batch and return its result.
+
+        Errors are reported in the result rather than raised.
+        """
+        params = dict()
+        name = None
+        try:
+            self._validate_request(arg)
+            name = arg['method']
+            a, kw = arg['params']
+            newkw = dict((str(k), v) for k, v in kw.items())
+            params = api.Command[name].args_options_2_params(
+                *a, **newkw)
+            newkw.setdefault('version', version)
+
+            result = api.Command[name](*a, **newkw)
+            logger.info(
+                '%s: batch: %s(%s): SUCCESS',
+                getattr(context, 'principal', 'UNKNOWN'),
+                name,
+                ', '.join(api.Command[name]._repr_iter(**params))
+            )
+            result['error']=None
+        except Exception as e:
+            if (isinstance(e, errors.RequirementError) or
+                    isinstance(e, errors.CommandError) or
+                    isinstance(e, errors.ConversionError)):
                 logger.info(
-                    '%s: batch: %s(%s): SUCCESS',
-                    getattr(context, 'principal', 'UNKNOWN'),
-                    name,
-                    ', '.join(api.Command[name]._repr_iter(**params))
+                    '%s: batch: %s',
+                    context.principal,  # pylint: disable=no-member
+                    e.__class__.__name__
                 )
-                result['error']=None
-            except Exception as e:
-                if (isinstance(e, errors.RequirementError) or
-                        isinstance(e, errors.CommandError) or
-                        isinstance(e, errors.ConversionError)):
-                    logger.info(
-                        '%s: batch: %s',
-                        context.principal,  # pylint: disable=no-member
-                        e.__class__.__name__
-                    )
-                else:
-                    logger.info(
-                        '%s: batch: %s(%s): %s',
-                        context.principal, name,  # pylint: disable=no-member
-                        ', '.join(api.Command[name]._repr_iter(**params)),
-                        e.__class__.__name__
-                    )
-                if isinstance(e, errors.PublicError):
-                    reported_error = e
-                else:
-                    reported_error = errors.InternalError()
-                result = dict(
-                    error=reported_error.strerror,
-                    error_code=reported_error.errno,
-                    error_name=unicode(type(reported_error).__name__),
-                    error_kw=reported_error.kw,
+            else:
+                logger.info(
+                    '%s: batch: %s(%s): %s',
+                    context.principal, name,  # pylint: disable=no-member
+                    ', '.join(api.Command[name]._repr_iter(**params)),
+                    e.__class__.__name__
                 )
-            results.append(result)
+            if isinstance(e, errors.PublicError):
+                reported_error = e
+            else:
+                reported_error = errors.InternalError()
+            result = dict(
+                error=reported_error.strerror,
+                error_code=reported_error.errno,
+                error_name=unicode(type(reported_error).__name__),
+                error_kw=reported_error.kw,
+            )
+        return result
+
+    def _execute_parallel(self, methods, indices, results, version):
+        """
+        Execute the requests at the given indices concurrently.
+
+        Every worker thread binds its own LDAP connection with the
+        credentials of the current request. Requests which were not run
+        because a worker could not connect are run sequentially on the
+        connection of the current thread afterwards.
+        """
+        ldap = self.api.Backend.ldap2
+        ccache = getattr(context, 'ccache_name',
+                         os.environ.get('KRB5CCNAME'))
+        inherited = {
+            key: getattr(context, key)
+            for key in INHERITED_CONTEXT
+            if hasattr(context, key)
+        }
+
+        def worker(chunk):
+            try:
+                for key, value in inherited.items():
+                    setattr(context, key, value)
+                try:
+                    ldap.connect(ccache=ccache)
+                except Exception as e:
+                    logger.debug(
+                        'batch: worker failed to connect: %s: %s',
+                        e.__class__.__name__, e)
+                    return
+                for i in chunk:
+                    results[i] = self._execute_request(methods[i], version)
+            finally:
+                destroy_context()
+
+        num_workers = min(self.api.env.batch_parallel_workers, len(indices))
+        if num_workers > 1:
+            # every worker runs its share of the requests on one connection
+            chunks = [indices[w::num_workers] for w in range(num_workers)]
+            with concurrent.futures.ThreadPoolExecutor(
+                    num_workers) as executor:
+                list(executor.map(worker, chunks))
+
+        for i in indices:
+            if results[i] is None:
+                results[i] = self._execute_request(methods[i], version)
+
+    def execute(self, methods=None, **options):
+        methods = methods or []
+        results = [None] * len(methods)
+
+        parallel = (self.api.env.in_server and
+                    self.api.env.batch_parallel_workers > 1 and
+                    self.api.Backend.ldap2.isconnected())
+        read_only = []
+        for i, arg in enumerate(methods):
+            if parallel and self._is_read_only(arg):
+                read_only.append(i)
+                continue
+            # requests that modify data act as a barrier, all previous
+            # read-only requests must finish before they run
+            if read_only:
+                self._execute_parallel(
+                    methods, read_only, results, options['version'])
+                read_only = []
+            results[i] = self._execute_request(arg, options['version'])
+        if read_only:
+            self._execute_parallel(
+                methods, read_only, results, options['version'])
+
         return dict(count=len(results) , results=results)
@@ -25,6 +25,7 @@ import datetime
 import itertools
 import logging
 from operator import attrgetter
+import threading
 
 import cryptography.x509
 from cryptography.hazmat.primitives import hashes, serialization
@@ -250,6 +251,14 @@ def acl_evaluate(principal, ca_id, profile_id):
     return req.evaluate(rules) == pyhbac.HBAC_EVAL_ALLOW
 
 
+# Number of certificates whose extracted data is cached by
+# BaseCertObject._parse()
+CERT_PARSE_CACHE_SIZE = 4096
+
+_parse_cache = collections.OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+
 def normalize_pkidate(value):
     return datetime.datetime.strptime(value, PKIDATE_FORMAT)
 
@@ -460,7 +469,7 @@ class BaseCertObject(Object):
         ),
     )
 
-    def _parse(self, obj, full=True):
+    def _parse(self, obj, full=True, cache_key=None):
         """Extract certificate-specific data into a result object.
 
         ``obj``
@@ -472,6 +481,10 @@ class BaseCertObject(Object):
             recognised otherNames to the generic ``san_other``
             attribute when ``True`` in addition to the specialised
             attribute.
+        ``cache_key``
+            ``(issuer, serial_number)`` of the certificate.  If given,
+            the extracted data is cached under this key and reused for
+            the same certificate.
 
         Raise ``ValueError`` if the certificate is malformed.
         (Note: only the main certificate structure and Subject Alt
@@ -479,37 +492,65 @@ class BaseCertObject(Object):
 
         """
         if 'certificate' in obj:
-            cert = x509.load_der_x509_certificate(
-                base64.b64decode(obj['certificate']))
-            obj['subject'] = DN(cert.subject)
-            obj['issuer'] = DN(cert.issuer)
-            obj['serial_number'] = cert.serial_number
-            obj['valid_not_before'] = x509.format_datetime(
-                    cert.not_valid_before)
-            obj['valid_not_after'] = x509.format_datetime(
-                    cert.not_valid_after)
-            if full:
-                obj['sha1_fingerprint'] = x509.to_hex_with_colons(
-                    cert.fingerprint(hashes.SHA1()))
-                obj['sha256_fingerprint'] = x509.to_hex_with_colons(
-                    cert.fingerprint(hashes.SHA256()))
-
-            general_names = x509.process_othernames(
-                    cert.san_general_names)
-
-            for gn in general_names:
-                try:
-                    self._add_san_attribute(obj, full, gn)
-                except Exception:
-                    # Invalid GeneralName (i.e. not a valid X.509 cert);
-                    # don't fail but log something about it
-                    logger.warning(
-                        "Encountered bad GeneralName; skipping", exc_info=True)
+            certificate = obj['certificate']
+            data = None
+            if cache_key is not None:
+                cache_key = tuple(cache_key) + (full,)
+                with _parse_cache_lock:
+                    cached = _parse_cache.get(cache_key)
+                    if cached is not None and cached[0] == certificate:
+                        _parse_cache.move_to_end(cache_key)
+                        data = cached[1]
+
+            if data is None:
+                data = self._parse_certificate(certificate, full)
+                if cache_key is not None:
+                    with _parse_cache_lock:
+                        _parse_cache[cache_key] = (certificate, data)
+                        if len(_parse_cache) > CERT_PARSE_CACHE_SIZE:
+                            _parse_cache.popitem(last=False)
+
+            for name, value in data.items():
+                if isinstance(value, list):
+                    obj.setdefault(name, []).extend(value)
+                else:
+                    obj[name] = value
 
         serial_number = obj.get('serial_number')
         if serial_number is not None:
             obj['serial_number_hex'] = u'0x%X' % serial_number
 
+    def _parse_certificate(self, certificate, full):
+        """Extract data of a base64 encoded certificate into a new dict."""
+        data = {}
+        cert = x509.load_der_x509_certificate(base64.b64decode(certificate))
+        data['subject'] = DN(cert.subject)
+        data['issuer'] = DN(cert.issuer)
+        data['serial_number'] = cert.serial_number
+        data['valid_not_before'] = x509.format_datetime(
+                cert.not_valid_before)
+        data['valid_not_after'] = x509.format_datetime(
+                cert.not_valid_after)
+        if full:
+            data['sha1_fingerprint'] = x509.to_hex_with_colons(
+                cert.fingerprint(hashes.SHA1()))
+            data['sha256_fingerprint'] = x509.to_hex_with_colons(
+                cert.fingerprint(hashes.SHA256()))
+
+        general_names = x509.process_othernames(
+                cert.san_general_names)
+
+        for gn in general_names:
+            try:
+                self._add_san_attribute(data, full, gn)
+            except Exception:
+                # Invalid GeneralName (i.e. not a valid X.509 cert);
+                # don't fail but log something about it
+                logger.warning(
+                    "Encountered bad GeneralName; skipping", exc_info=True)
+
+        return data
+
     def _add_san_attribute(self, obj, full, gn):
         name_type_map = {
             cryptography.x509.RFC822Name:
@@ -1874,14 +1915,26 @@ class cert_find(Search, CertMethod):
             truncated = truncated or sub_truncated
             complete = complete or sub_complete
 
+        result = list(six.iteritems(result))
+        if (len(result) > sizelimit > 0):
+            if not truncated:
+                self.add_message(messages.SearchResultTruncated(
+                        reason=errors.SizeLimitExceeded()))
+            result = result[:sizelimit]
+            truncated = True
+
         if not pkey_only:
             ca_objs = {}
-            if ca_enabled:
-                ra = self.api.Backend.ra
-
-            for key, obj in six.iteritems(result):
-                if all and 'cacn' in obj:
-                    _issuer, serial_number = key
+            certs = {}
+            if ca_enabled and all:
+                # retrieve the certificates concurrently in one go rather
+                # than one request after another
+                keys = [key for key, obj in result if 'cacn' in obj]
+                certs = dict(zip(keys, self.api.Backend.ra.get_certificates(
+                    str(serial_number) for _issuer, serial_number in keys)))
+
+            for key, obj in result:
+                if key in certs:
                     cacn = obj['cacn']
 
                     try:
@@ -1890,7 +1943,7 @@ class cert_find(Search, CertMethod):
                         ca_obj = ca_objs[cacn] = (
                             self.api.Command.ca_show(cacn, all=True)['result'])
 
-                    obj.update(ra.get_certificate(str(serial_number)))
+                    obj.update(certs[key])
                     if not raw:
                         obj['certificate'] = (
                             obj['certificate'].replace('\r\n', ''))
@@ -1901,7 +1954,7 @@ class cert_find(Search, CertMethod):
                             [cert_der] + ca_obj['certificate_chain'])
 
                 if not raw:
-                    self.obj._parse(obj, all)
+                    self.obj._parse(obj, all, cache_key=key)
                     if not ca_enabled and not all:
                         # For the case of CA-less don't display the full
                         # certificate unless requested. It is kept in the
@@ -1910,13 +1963,7 @@ class cert_find(Search, CertMethod):
                         obj.pop('certificate', None)
                     self.obj._fill_owners(obj)
 
-        result = list(six.itervalues(result))
-        if (len(result) > sizelimit > 0):
-            if not truncated:
-                self.add_message(messages.SearchResultTruncated(
-                        reason=errors.SizeLimitExceeded()))
-            result = result[:sizelimit]
-            truncated = True
+        result = [obj for _key, obj in result]
 
         ret = dict(
             result=result
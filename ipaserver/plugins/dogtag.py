@@ -241,6 +241,7 @@ digits and nothing else follows.
 
 from __future__ import absolute_import
 
+import concurrent.futures
 import json
 import logging
 
@@ -1163,8 +1164,17 @@ class RestClient(Backend):
     def ca_host(self):
         """
         :returns: FQDN of a host hopefully providing a CA service
+        """
+        return self._select_ca_host()
 
+    def _select_ca_host(self):
+        """
         Select our CA host, cache it for the first time.
+
+        The CA host is looked up with the LDAP connection of the current
+        thread.
+
+        :returns: FQDN of a host hopefully providing a CA service
         """
         if self._ca_host is not None:
             return self._ca_host
@@ -1297,6 +1307,38 @@ class ra(rabase.rabase, RestClient):
         logger.error('%s.%s(): %s', type(self).__name__, func_name, err_msg)
         raise errors.CertificateOperationError(error=err_msg)
 
+    def get_certificates(self, serial_numbers):
+        """
+        Retrieve existing certificates concurrently.
+
+        Up to ``dogtag.HTTPS_POOL_SIZE`` worker threads retrieve the
+        certificates with ``get_certificate()``, so that every worker
+        keeps reusing one pooled keep-alive connection.
+
+        :param serial_numbers: iterable of certificate serial numbers
+        :return: list of ``get_certificate()`` results in the order of
+                 ``serial_numbers``
+        """
+        serial_numbers = list(serial_numbers)
+        num_workers = min(dogtag.HTTPS_POOL_SIZE, len(serial_numbers))
+        if num_workers < 2:
+            return super(ra, self).get_certificates(serial_numbers)
+
+        # The workers have no LDAP connection to look up the CA host with.
+        # Select it in this thread, so they use the cached host.
+        self._select_ca_host()
+
+        with concurrent.futures.ThreadPoolExecutor(num_workers) as executor:
+            futures = [executor.submit(self.get_certificate, serial_number)
+                       for serial_number in serial_numbers]
+            try:
+                return [future.result() for future in futures]
+            except Exception:
+                # do not start retrieving any more certificates
+                for future in futures:
+                    future.cancel()
+                raise
+
     def _request(self, url, port, **kw):
         """
         :param url: The URL to post to.
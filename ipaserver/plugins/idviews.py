@@ -17,6 +17,7 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import logging
 import re
 
 import six
@@ -26,7 +27,6 @@ from .baseldap import (LDAPQuery, LDAPObject, LDAPCreate,
                        LDAPAddAttributeViaOption,
                        LDAPRemoveAttributeViaOption,
                        LDAPRetrieve, global_output_params,
-                       host_is_master,
                        add_missing_object_class)
 from .hostgroup import get_complete_hostgroup_member_list
 from ipalib import (
@@ -43,10 +43,16 @@ from ipalib.util import (normalize_sshpubkey, validate_sshpubkey,
     convert_sshpubkey_post)
 
 from ipapython.dn import DN
+from ipaserver.masters import get_masters
 
 if six.PY3:
     unicode = str
 
+logger = logging.getLogger(__name__)
+
+# Number of hosts idview_apply and idview_unapply look up and modify at once
+IDVIEW_APPLY_BATCH_SIZE = 500
+
 _dcerpc_bindings_installed = False
 
 if api.env.in_server:
@@ -336,6 +342,49 @@ class baseidview_apply(LDAPQuery):
 
     has_output_params = global_output_params
 
+    def _get_host_entries(self, ldap, hosts):
+        """
+        Retrieve the host entries of hosts with their assigned ID view.
+
+        Hosts are found by their fully qualified or, like host.get_dn(),
+        their short name. Returns a dict mapping the lower-cased names of
+        the hosts found to their entries, or to a SingleMatchExpected error
+        if a short name matches more than one host.
+        """
+        if not hosts:
+            return {}
+
+        host_obj = self.api.Object['host']
+        filters = [ldap.make_filter_from_attr(attr, hosts)
+                   for attr in ('fqdn', 'serverhostname')]
+        try:
+            entries = ldap.get_entries(
+                DN(host_obj.container_dn, api.env.basedn),
+                ldap.SCOPE_ONELEVEL,
+                ldap.combine_filters(filters, ldap.MATCH_ANY),
+                ['fqdn', 'serverhostname', 'ipaassignedidview'],
+                size_limit=0)
+        except errors.NotFound:
+            return {}
+
+        short_names = {}
+        for entry in entries:
+            for name in entry.get('serverhostname', []):
+                short_names.setdefault(name.lower(), []).append(entry)
+
+        host_entries = {}
+        for name, matches in short_names.items():
+            if len(matches) > 1:
+                host_entries[name] = errors.SingleMatchExpected(
+                    found=len(matches))
+            else:
+                host_entries[name] = matches[0]
+        # fully qualified names take precedence over short names
+        for entry in entries:
+            for name in entry.get('fqdn', []):
+                host_entries[name.lower()] = entry
+        return host_entries
+
     def execute(self, *keys, **options):
         view = keys[-1] if keys else None
         ldap = self.obj.backend
@@ -382,37 +431,64 @@ class baseidview_apply(LDAPQuery):
                 failed['hostgroup'].append((hostgroup, "%s : %s" % (
                                             e.__class__.__name__, str(e))))
 
-        for host in hosts_to_apply:
-            try:
-                # Check that the host is not a master
-                # IDView must not be applied to masters
-                try:
-                    host_is_master(ldap, host)
-                except errors.ValidationError:
-                    failed['host'].append(
-                        (host,
-                         unicode(_("ID View cannot be applied to IPA master")))
-                    )
+        # IDView must not be applied to masters
+        masters = {master.lower() for master in get_masters(ldap)}
+
+        # The hosts are processed in batches. The current views of a batch
+        # are retrieved by one search and only the hosts whose view changes
+        # are modified, with pipelined requests.
+        total = len(hosts_to_apply)
+        for start in range(0, total, IDVIEW_APPLY_BATCH_SIZE):
+            batch = hosts_to_apply[start:start + IDVIEW_APPLY_BATCH_SIZE]
+            host_entries = self._get_host_entries(
+                ldap, [host for host in batch if host.lower() not in masters])
+
+            # the outcome of every host of the batch in the order given,
+            # None if its view was changed
+            outcomes = [None] * len(batch)
+            to_update = []
+            seen = set()
+            for i, host in enumerate(batch):
+                if host.lower() in masters:
+                    outcomes[i] = unicode(
+                        _("ID View cannot be applied to IPA master"))
                     continue
-                host_dn = api.Object['host'].get_dn_if_exists(host)
-
-                host_entry = ldap.get_entry(host_dn,
-                                            attrs_list=['ipaassignedidview'])
+                host_entry = host_entries.get(host.lower())
+                if host_entry is None:
+                    outcomes[i] = unicode(_("not found"))
+                    continue
+                if isinstance(host_entry, errors.PublicError):
+                    outcomes[i] = str(host_entry)
+                    continue
+                if host_entry.dn in seen:
+                    # the host was given more than once
+                    outcomes[i] = unicode(_("ID View already applied"))
+                    continue
+                seen.add(host_entry.dn)
                 host_entry['ipaassignedidview'] = view_dn
-
-                ldap.update_entry(host_entry)
-
-                # If no exception was raised, view assignment went well
-                completed = completed + 1
-                succeeded['host'].append(host)
-            except errors.EmptyModlist:
-                # If view was already applied, complain about it
-                failed['host'].append((host,
-                                       unicode(_("ID View already applied"))))
-            except errors.NotFound:
-                failed['host'].append((host, unicode(_("not found"))))
-            except errors.PublicError as e:
-                failed['host'].append((host, str(e)))
+                to_update.append((i, host_entry))
+
+            results = ldap.update_entries(
+                host_entry for _i, host_entry in to_update)
+            for (i, _host_entry), e in zip(to_update, results):
+                if isinstance(e, errors.EmptyModlist):
+                    # If view was already applied, complain about it
+                    outcomes[i] = unicode(_("ID View already applied"))
+                elif isinstance(e, errors.NotFound):
+                    outcomes[i] = unicode(_("not found"))
+                elif e is not None:
+                    outcomes[i] = str(e)
+
+            for host, error in zip(batch, outcomes):
+                if error is None:
+                    # If no exception was raised, view assignment went well
+                    completed = completed + 1
+                    succeeded['host'].append(host)
+                else:
+                    failed['host'].append((host, error))
+
+            logger.info("%s: processed %d of %d hosts",
+                        self.name, min(start + len(batch), total), total)
 
         # Wrap dictionary containing failures in another dictionary under key
         # 'memberhost', since that is output parameter in global_output_params
@@ -29,8 +29,12 @@ Backend plugin for LDAP.
 
 from __future__ import absolute_import
 
+import collections
+import contextlib
 import logging
 import os
+import threading
+import time
 
 import ldap as _ldap
 
@@ -46,10 +50,111 @@ from ipalib.request import context
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of members added to or removed from a group by one modify
+# operation, and of member entries looked up by one search
+MEMBER_BATCH_SIZE = 500
+
 register = Registry()
 
 _missing = object()
 
+# Errors reported by libldap rather than by the server. After them, an
+# operation may still be in progress on the connection.
+_CLIENT_ERRORS = (
+    _ldap.SERVER_DOWN,
+    _ldap.TIMEOUT,
+    _ldap.CONNECT_ERROR,
+    _ldap.LOCAL_ERROR,
+    _ldap.ENCODING_ERROR,
+    _ldap.DECODING_ERROR,
+    _ldap.USER_CANCELLED,
+    _ldap.NO_MEMORY,
+)
+
+
+def _unbind_quietly(conn):
+    try:
+        conn.unbind_s()
+    except _ldap.LDAPError:
+        pass
+
+
+class LDAPConnectionPool:
+    """
+    Pool of idle GSSAPI-bound LDAP connections shared by all threads.
+
+    Connections are grouped by LDAP URI and the principal they are bound
+    as. Every connection carries the time after which it must not be used
+    anymore; at most maxsize idle connections are kept per key. Connections
+    which are dropped from the pool are closed with unbind.
+    """
+
+    def __init__(self, maxsize, ttl, unbind=_unbind_quietly):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._unbind = unbind
+        self._lock = threading.Lock()
+        self._idle = collections.defaultdict(collections.deque)
+
+    def get(self, key):
+        """
+        Get the most recently used idle connection for key.
+
+        Returns a (connection, expires) tuple, or (None, None) if there
+        is no connection to reuse.
+        """
+        expired = []
+        result = (None, None)
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                expires, conn = idle.pop()
+                if expires > now:
+                    result = (conn, expires)
+                    break
+                expired.append(conn)
+        for conn in expired:
+            self._unbind(conn)
+        return result
+
+    def put(self, key, conn, expires):
+        """
+        Return a connection with no outstanding operation to the pool.
+
+        Expired connections of all keys are unbound on the way.
+        """
+        expired = []
+        now = time.monotonic()
+        with self._lock:
+            for idle_key in list(self._idle):
+                idle = self._idle[idle_key]
+                valid = [item for item in idle if item[0] > now]
+                expired.extend(item[1] for item in idle if item[0] <= now)
+                if valid:
+                    idle.clear()
+                    idle.extend(valid)
+                else:
+                    del self._idle[idle_key]
+            idle = self._idle[key]
+            if expires > now and len(idle) < self.maxsize:
+                idle.append((expires, conn))
+            else:
+                expired.append(conn)
+        for idle_conn in expired:
+            self._unbind(idle_conn)
+
+    def clear(self):
+        """
+        Unbind all idle connections.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, collections.defaultdict(
+                collections.deque)
+        for connections in idle.values():
+            for _expires, conn in connections:
+                self._unbind(conn)
+
 
 @register()
 class ldap2(CrudBackend, LDAPClient):
@@ -67,43 +172,68 @@ class ldap2(CrudBackend, LDAPClient):
         self._time_limit = float(LDAPClient.time_limit)
         self._size_limit = int(LDAPClient.size_limit)
 
+        # only the server handles many short requests of the same principals
+        if api.env.context == 'server' and api.env.ldap_pool_size > 0:
+            self._pool = LDAPConnectionPool(api.env.ldap_pool_size,
+                                            api.env.ldap_pool_ttl)
+        else:
+            self._pool = None
+
     @property
     def ldap_uri(self):
         return self.api.env.ldap_uri
 
+    # The limits given to connect() apply to the connection of the current
+    # thread, so they are kept in the thread-local request context like the
+    # connection itself. Outside of a connection the defaults set in
+    # __init__() apply.
+
+    @property
+    def _limits_attr(self):
+        return '%s_limits' % self.id
+
+    def _get_limits(self):
+        limits = getattr(context, self._limits_attr, None)
+        if limits is None:
+            limits = {}
+            setattr(context, self._limits_attr, limits)
+        return limits
+
     @property
     def time_limit(self):
-        if self._time_limit is None:
+        time_limit = self._get_limits().get('time_limit', self._time_limit)
+        if time_limit is None:
             return float(self.get_ipa_config().single_value.get(
                 'ipasearchtimelimit', 2))
-        return self._time_limit
+        return time_limit
 
     @time_limit.setter
     def time_limit(self, val):
         if val is not None:
             val = float(val)
-        object.__setattr__(self, '_time_limit', val)
+        self._get_limits()['time_limit'] = val
 
     @time_limit.deleter
     def time_limit(self):
-        object.__setattr__(self, '_time_limit', int(LDAPClient.size_limit))
+        self._get_limits().pop('time_limit', None)
 
     @property
     def size_limit(self):
-        if self._size_limit is None:
+        size_limit = self._get_limits().get('size_limit', self._size_limit)
+        if size_limit is None:
             return int(self.get_ipa_config().single_value.get(
                 'ipasearchrecordslimit', 0))
-        return self._size_limit
+        return size_limit
 
     @size_limit.setter
     def size_limit(self, val):
         if val is not None:
             val = int(val)
-        object.__setattr__(self, '_size_limit', val)
+        self._get_limits()['size_limit'] = val
 
     @size_limit.deleter
     def size_limit(self):
-        object.__setattr__(self, '_size_limit', float(LDAPClient.time_limit))
+        self._get_limits().pop('size_limit', None)
 
     def _connect(self):
         # Connectible.conn is a proxy to thread-local storage;
@@ -113,6 +243,8 @@ class ldap2(CrudBackend, LDAPClient):
     def close(self):
         if self.isconnected():
             self.disconnect()
+        if self._pool is not None:
+            self._pool.clear()
 
     def __str__(self):
         return self.ldap_uri
@@ -153,6 +285,26 @@ class ldap2(CrudBackend, LDAPClient):
         if size_limit is not _missing:
             object.__setattr__(self, 'size_limit', size_limit)
 
+        ldapi = self.ldap_uri.startswith('ldapi://')
+        gssapi_bind = not bind_pw and not (
+            autobind != AUTOBIND_DISABLED and os.getegid() == 0 and ldapi)
+
+        pooled = None
+        if gssapi_bind:
+            if ccache is None:
+                os.environ.pop('KRB5CCNAME', None)
+            else:
+                os.environ['KRB5CCNAME'] = ccache
+
+            principal = krb_utils.get_principal(ccache_name=ccache)
+
+            conn, pooled = self._get_pooled_connection(
+                ccache, principal, serverctrls, clientctrls)
+            if conn is not None:
+                setattr(context, self._pool_attr, pooled)
+                setattr(context, 'principal', principal)
+                return conn
+
         client = LDAPClient(self.ldap_uri,
                             force_schema_updates=self._force_schema_updates,
                             cacert=cacert)
@@ -169,13 +321,11 @@ class ldap2(CrudBackend, LDAPClient):
                 if maxssf < minssf:
                     conn.set_option(_ldap.OPT_X_SASL_SSF_MAX, minssf)
 
-        ldapi = self.ldap_uri.startswith('ldapi://')
-
         if bind_pw:
             client.simple_bind(bind_dn, bind_pw,
                                server_controls=serverctrls,
                                client_controls=clientctrls)
-        elif autobind != AUTOBIND_DISABLED and os.getegid() == 0 and ldapi:
+        elif not gssapi_bind:
             try:
                 client.external_bind(server_controls=serverctrls,
                                      client_controls=clientctrls)
@@ -188,24 +338,116 @@ class ldap2(CrudBackend, LDAPClient):
             if ldapi:
                 with client.error_handler():
                     conn.set_option(_ldap.OPT_HOST_NAME, self.api.env.host)
-            if ccache is None:
-                os.environ.pop('KRB5CCNAME', None)
-            else:
-                os.environ['KRB5CCNAME'] = ccache
-
-            principal = krb_utils.get_principal(ccache_name=ccache)
 
             client.gssapi_bind(server_controls=serverctrls,
                                client_controls=clientctrls)
             setattr(context, 'principal', principal)
+            if pooled is not None:
+                setattr(context, self._pool_attr, pooled)
 
         return conn
 
+    @property
+    def _pool_attr(self):
+        return '%s_pool' % self.id
+
+    def _get_pooled_connection(self, ccache, principal, serverctrls,
+                               clientctrls):
+        """
+        Get a connection bound as principal from the pool.
+
+        Returns a (connection, pooled) tuple. connection is None if there
+        is no idle connection to reuse. pooled is the (key, expires) tuple
+        the connection is returned to the pool with when the request is
+        done, or None if it must not be pooled.
+        """
+        if self._pool is None or serverctrls or clientctrls:
+            return None, None
+
+        # the credentials of the request must be valid, otherwise an
+        # expired session would get access through a pooled connection
+        creds = krb_utils.get_credentials_if_valid(ccache_name=ccache)
+        if creds is None:
+            return None, None
+
+        key = (self.ldap_uri, principal)
+        while True:
+            conn, expires = self._pool.get(key)
+            if conn is None:
+                break
+            try:
+                # make sure the server did not drop the connection
+                conn.whoami_s()
+            except _ldap.LDAPError:
+                _unbind_quietly(conn)
+                continue
+            return conn, (key, expires)
+
+        # a new connection is reused until the pool TTL or the credentials
+        # it is bound with expire, whichever comes first
+        expires = time.monotonic() + min(self._pool.ttl, creds.lifetime)
+        return None, (key, expires)
+
+    @property
+    def _pending_attr(self):
+        return '%s_pending' % self.id
+
+    def _start_operation(self):
+        """
+        Record the start of an operation whose results are read in steps.
+        """
+        setattr(context, self._pending_attr,
+                getattr(context, self._pending_attr, 0) + 1)
+
+    def _finish_operation(self):
+        """
+        Record that an operation started with _start_operation() completed.
+
+        A connection with an operation which did not complete, e.g. of a
+        generator which was not exhausted or failed, is not pooled.
+        """
+        setattr(context, self._pending_attr,
+                getattr(context, self._pending_attr) - 1)
+
+    def _discard_pooled_connection(self):
+        """
+        Do not return the connection of the current request to the pool.
+        """
+        if hasattr(context, self._pool_attr):
+            delattr(context, self._pool_attr)
+
+    @contextlib.contextmanager
+    def error_handler(self, arg_desc=None):
+        with super(ldap2, self).error_handler(arg_desc):
+            try:
+                yield
+            except _CLIENT_ERRORS:
+                self._discard_pooled_connection()
+                raise
+            except (_ldap.LDAPError, errors.PublicError, GeneratorExit):
+                # errors returned by the server complete the operation
+                raise
+            except BaseException:
+                self._discard_pooled_connection()
+                raise
+
     def destroy_connection(self):
         """Disconnect from LDAP server."""
+        pooled = getattr(context, self._pool_attr, None)
+        if pooled is not None:
+            delattr(context, self._pool_attr)
+        if getattr(context, self._pending_attr, 0):
+            # only connections which finished all operations are reused
+            pooled = None
+        if hasattr(context, self._pending_attr):
+            delattr(context, self._pending_attr)
         try:
             if self.conn is not None:
-                self.unbind()
+                if pooled is not None:
+                    key, expires = pooled
+                    self._pool.put(key, self.conn, expires)
+                else:
+                    self.unbind()
         except errors.PublicError:
             # ignore when trying to unbind multiple times
             pass
@@ -213,33 +455,115 @@ class ldap2(CrudBackend, LDAPClient):
         object.__delattr__(self, 'time_limit')
         object.__delattr__(self, 'size_limit')
 
+    @property
+    def _cache_attr(self):
+        return '%s_cache' % self.id
+
+    def _get_cache(self):
+        """
+        Get the dict of memoized results of the current request.
+
+        The cache belongs to the connection it was filled through, a new
+        connection, possibly bound as someone else, starts with an empty one.
+        """
+        cache = getattr(context, self._cache_attr, None)
+        if cache is None or cache[0] is not self.conn:
+            cache = (self.conn, {})
+            setattr(context, self._cache_attr, cache)
+        return cache[1]
+
+    def get_cached(self, key, func, *dns):
+        """
+        Get the result of func() memoized for the rest of the request.
+
+        The result is stored under key and reused until the request ends or
+        an entry at or below any of dns is written through this backend.
+        A batch request shares the cache between its commands.
+        """
+        cache = self._get_cache()
+        try:
+            return cache[key][0]
+        except KeyError:
+            pass
+        value = func()
+        cache[key] = (value, dns)
+        return value
+
+    def invalidate_cache(self, dn=None):
+        """
+        Drop memoized results which depend on the entry dn, or all of them
+        if dn is None.
+
+        Writes through this backend call this on their own, code writing
+        through the python-ldap connection directly must call it itself.
+        """
+        cache = getattr(context, self._cache_attr, None)
+        if cache is None:
+            return
+        cache = cache[1]
+        if dn is None:
+            cache.clear()
+            return
+        for key, (_value, dns) in list(cache.items()):
+            if any(dn.endswith(base) for base in dns):
+                del cache[key]
+
+    def add_entry(self, entry, post_read=None):
+        try:
+            return super(ldap2, self).add_entry(entry, post_read=post_read)
+        finally:
+            self.invalidate_cache(entry.dn)
+
+    def update_entry(self, entry, post_read=None):
+        try:
+            return super(ldap2, self).update_entry(entry, post_read=post_read)
+        finally:
+            self.invalidate_cache(entry.dn)
+
+    def delete_entry(self, entry_or_dn):
+        if isinstance(entry_or_dn, DN):
+            dn = entry_or_dn
+        else:
+            dn = entry_or_dn.dn
+        try:
+            super(ldap2, self).delete_entry(entry_or_dn)
+        finally:
+            self.invalidate_cache(dn)
+
+    def move_entry(self, dn, new_dn, del_old=True):
+        try:
+            super(ldap2, self).move_entry(dn, new_dn, del_old=del_old)
+        finally:
+            self.invalidate_cache(dn)
+            self.invalidate_cache(new_dn)
+
+    def modify_s(self, dn, modlist):
+        try:
+            return super(ldap2, self).modify_s(dn, modlist)
+        finally:
+            self.invalidate_cache(dn)
+
     def get_ipa_config(self, attrs_list=None):
         """Returns the IPA configuration entry (dn, entry_attrs)."""
 
         dn = self.api.Object.config.get_dn()
         assert isinstance(dn, DN)
 
-        try:
-            config_entry = getattr(context, 'config_entry')
-            if config_entry.conn.conn is self.conn:
-                return config_entry
-        except AttributeError:
-            # Not in our context yet
-            pass
-        try:
-            # use find_entries here lest we hit an infinite recursion when
-            # ldap2.get_entries tries to determine default time/size limits
-            (entries, truncated) = self.find_entries(
-                None, attrs_list, base_dn=dn, scope=self.SCOPE_BASE,
-                time_limit=2, size_limit=10
-            )
-            self.handle_truncated_result(truncated)
-            config_entry = entries[0]
-        except errors.NotFound:
-            config_entry = self.make_entry(dn)
+        def get_config_entry():
+            try:
+                # use find_entries here lest we hit an infinite recursion
+                # when ldap2.get_entries tries to determine default
+                # time/size limits
+                (entries, truncated) = self.find_entries(
+                    None, attrs_list, base_dn=dn, scope=self.SCOPE_BASE,
+                    time_limit=2, size_limit=10
+                )
+                self.handle_truncated_result(truncated)
+                return entries[0]
+            except errors.NotFound:
+                return self.make_entry(dn)
 
-        context.config_entry = config_entry
-        return config_entry
+        return self.get_cached('config_entry', get_config_entry, dn)
 
     def has_upg(self):
         """Returns True/False whether User-Private Groups are enabled.
@@ -250,30 +574,26 @@ class ldap2(CrudBackend, LDAPClient):
         If the UPG Definition or its originfilter is not readable,
         an ACI error is raised.
         """
-        try:
-            return context.has_upg
-        except AttributeError:
-            pass
-
         upg_dn = DN(('cn', 'UPG Definition'), ('cn', 'Definitions'), ('cn', 'Managed Entries'),
                     ('cn', 'etc'), self.api.env.basedn)
 
-        try:
-            with self.error_handler():
-                upg_entries = self.conn.search_s(str(upg_dn), _ldap.SCOPE_BASE,
-                                                 attrlist=['*'])
-                upg_entries = self._convert_result(upg_entries)
-        except errors.NotFound:
-            upg_entries = None
-        if not upg_entries or 'originfilter' not in upg_entries[0]:
-            raise errors.ACIError(info=_(
-                'Could not read UPG Definition originfilter. '
-                'Check your permissions.'))
-        org_filter = upg_entries[0].single_value['originfilter']
+        def get_has_upg():
+            try:
+                with self.error_handler():
+                    upg_entries = self.conn.search_s(
+                        str(upg_dn), _ldap.SCOPE_BASE, attrlist=['*'])
+                    upg_entries = self._convert_result(upg_entries)
+            except errors.NotFound:
+                upg_entries = None
+            if not upg_entries or 'originfilter' not in upg_entries[0]:
+                raise errors.ACIError(info=_(
+                    'Could not read UPG Definition originfilter. '
+                    'Check your permissions.'))
+            org_filter = upg_entries[0].single_value['originfilter']
 
-        has_upg = '(objectclass=disable)' not in org_filter
-        context.has_upg = has_upg
-        return has_upg
+            return '(objectclass=disable)' not in org_filter
+
+        return self.get_cached('has_upg', get_has_upg, upg_dn)
 
     def get_effective_rights(self, dn, attrs_list):
         """Returns the rights the currently bound user has for the given DN.
@@ -421,6 +741,7 @@ class ldap2(CrudBackend, LDAPClient):
         modlist = [(_ldap.MOD_ADD, member_attr, [dn])]
 
         # update group entry
+        self.invalidate_cache(group_dn)
         try:
             with self.error_handler():
                 modlist = [(a, b, self.encode(c))
@@ -430,6 +751,182 @@ class ldap2(CrudBackend, LDAPClient):
             # TYPE_OR_VALUE_EXISTS
             raise errors.AlreadyGroupMember()
 
+    def _get_existing_dns(self, dns):
+        """
+        Look up which of the entries designated by dns exist.
+
+        The children of each container are searched for with one-level
+        searches combining their RDNs in OR filters. Entries with a
+        multi-valued RDN are not looked up.
+
+        Returns a dict mapping each DN found to the DN stored in LDAP.
+        """
+        by_parent = collections.OrderedDict()
+        for dn in dns:
+            if len(dn) > 1 and len(dn[0]) == 1:
+                by_parent.setdefault(dn[1:], []).append(dn[0])
+
+        existing = {}
+        for parent, rdns in by_parent.items():
+            for start in range(0, len(rdns), MEMBER_BATCH_SIZE):
+                filter = self.combine_filters(
+                    [self.make_filter_from_attr(rdn.attr, rdn.value)
+                     for rdn in rdns[start:start + MEMBER_BATCH_SIZE]],
+                    self.MATCH_ANY)
+                try:
+                    entries = self.get_entries(
+                        parent, self.SCOPE_ONELEVEL, filter, [''],
+                        size_limit=0)
+                except errors.NotFound:
+                    continue
+                except errors.PublicError as e:
+                    # the entries are then checked one by one
+                    logger.debug("Cannot look up members in %s: %s",
+                                 parent, e)
+                    continue
+                for entry in entries:
+                    existing[entry.dn] = entry.dn
+
+        return existing
+
+    def _modify_group_members(self, op, dns, group_dn, member_attr,
+                              modify_one):
+        """
+        Apply op to the member_attr values dns of group group_dn in
+        multi-valued modify operations of up to MEMBER_BATCH_SIZE values.
+
+        A modify operation fails as a whole, so the values of a failed
+        operation are then modified one by one with modify_one(index) to
+        find out which of them failed and why.
+
+        Returns a dict mapping the index of each value which could not be
+        modified to the error raised by modify_one.
+        """
+        self.invalidate_cache(group_dn)
+        single = []
+        for start in range(0, len(dns), MEMBER_BATCH_SIZE):
+            batch = dns[start:start + MEMBER_BATCH_SIZE]
+            try:
+                with self.error_handler():
+                    modlist = [(op, member_attr,
+                                self.encode([dn for _i, dn in batch]))]
+                    self.conn.modify_s(str(group_dn), modlist)
+            except errors.PublicError as e:
+                logger.debug(
+                    "Modifying %d values of %s of %s at once failed (%s), "
+                    "modifying them one by one",
+                    len(batch), member_attr, group_dn, e)
+                single.extend(i for i, _dn in batch)
+
+        failed = {}
+        for i in sorted(single):
+            try:
+                modify_one(i)
+            except errors.PublicError as e:
+                failed[i] = e
+        return failed
+
+    def add_entries_to_group(self, dns, group_dn, member_attr='member',
+                             allow_same=False):
+        """
+        Add the entries designated by dns to group group_dn in the member
+        attribute member_attr.
+
+        This is the bulk variant of add_entry_to_group(). The existence of
+        the entries is checked with a few searches and they are added in
+        large modify operations. Whenever that fails, the entries are added
+        one by one with add_entry_to_group(), so the errors are the same.
+
+        Returns a list with, for each entry of dns, None if it was added or
+        the error raised if it was not.
+        """
+        assert isinstance(group_dn, DN)
+        dns = list(dns)
+
+        logger.debug(
+            "add_entries_to_group: %d entries group_dn=%s member_attr=%s",
+            len(dns), group_dn, member_attr)
+
+        existing = self._get_existing_dns(dns)
+        batch = []
+        single = []
+        for i, dn in enumerate(dns):
+            assert isinstance(dn, DN)
+            stored_dn = existing.get(dn)
+            if stored_dn is None or (stored_dn == group_dn and
+                                     not allow_same):
+                # let add_entry_to_group() report the error
+                single.append(i)
+            else:
+                batch.append((i, stored_dn))
+
+        def add_one(i):
+            self.add_entry_to_group(
+                dns[i], group_dn, member_attr, allow_same=allow_same)
+
+        failed = self._modify_group_members(
+            _ldap.MOD_ADD, batch, group_dn, member_attr, add_one)
+        for i in single:
+            try:
+                add_one(i)
+            except errors.PublicError as e:
+                failed[i] = e
+
+        return [failed.get(i) for i in range(len(dns))]
+
+    def remove_entries_from_group(self, dns, group_dn, member_attr='member'):
+        """
+        Remove the entries designated by dns from group group_dn.
+
+        This is the bulk variant of remove_entry_from_group(), the entries
+        are removed in large modify operations. Whenever that fails, the
+        entries are removed one by one with remove_entry_from_group(), so
+        the errors are the same.
+
+        Returns a list with, for each entry of dns, None if it was removed
+        or the error raised if it was not.
+        """
+        assert isinstance(group_dn, DN)
+        dns = list(dns)
+
+        logger.debug(
+            "remove_entries_from_group: %d entries group_dn=%s "
+            "member_attr=%s", len(dns), group_dn, member_attr)
+
+        def remove_one(i):
+            self.remove_entry_from_group(dns[i], group_dn, member_attr)
+
+        failed = self._modify_group_members(
+            _ldap.MOD_DELETE, list(enumerate(dns)), group_dn, member_attr,
+            remove_one)
+
+        return [failed.get(i) for i in range(len(dns))]
+
+    def iter_entries(self, *args, **kwargs):
+        # the search of a generator which is not exhausted or fails
+        # unexpectedly may still be in progress when the request ends
+        self._start_operation()
+        try:
+            truncated = yield from super(ldap2, self).iter_entries(
+                *args, **kwargs)
+        except errors.PublicError:
+            # the server completed the search with an error
+            self._finish_operation()
+            raise
+        self._finish_operation()
+        return truncated
+
+    def update_entries(self, entries):
+        entries = list(entries)
+        self._start_operation()
+        try:
+            results = super(ldap2, self).update_entries(entries)
+        finally:
+            for entry in entries:
+                self.invalidate_cache(entry.dn)
+        self._finish_operation()
+        return results
+
     def remove_entry_from_group(self, dn, group_dn, member_attr='member'):
         """Remove entry from group."""
 
@@ -444,6 +941,7 @@ class ldap2(CrudBackend, LDAPClient):
         modlist = [(_ldap.MOD_DELETE, member_attr, [dn])]
 
         # update group entry
+        self.invalidate_cache(group_dn)
         try:
             with self.error_handler():
                 modlist = [(a, b, self.encode(c))
@@ -501,6 +999,7 @@ class ldap2(CrudBackend, LDAPClient):
         mod = [(_ldap.MOD_REPLACE, 'krbprincipalkey', None),
                (_ldap.MOD_REPLACE, 'krblastpwdchange', None)]
 
+        self.invalidate_cache(dn)
         with self.error_handler():
             self.conn.modify_s(str(dn), mod)
 
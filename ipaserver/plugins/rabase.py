@@ -69,6 +69,17 @@ class rabase(Backend):
         """
         raise errors.NotImplementedError(name='%s.get_certificate' % self.name)
 
+    def get_certificates(self, serial_numbers):
+        """
+        Retrieve existing certificates.
+
+        :param serial_numbers: iterable of certificate serial numbers
+        :return: list of ``get_certificate()`` results in the order of
+                 ``serial_numbers``
+        """
+        return [self.get_certificate(serial_number)
+                for serial_number in serial_numbers]
+
     def request_certificate(
             self, csr, profile_id, ca_id, request_type='pkcs10'):
         """
@@ -4,7 +4,12 @@
 
 import importlib
 import itertools
+import json
+import logging
+import os
+import re
 import sys
+import tempfile
 
 import six
 import hashlib
@@ -17,8 +22,10 @@ from ipalib.output import Entry, ListOfEntries, ListOfPrimaryKeys, PrimaryKey
 from ipalib.parameters import Bool, Dict, Flag, Str
 from ipalib.plugable import Registry
 from ipalib.request import context
+from ipalib.rpc import EncodedJSONDict, json_encode_binary
 from ipalib.text import _
-from ipapython.version import API_VERSION
+from ipaplatform.paths import paths
+from ipapython.version import API_VERSION, VERSION
 
 # Schema TTL sent to clients in response to schema call.
 # Number of seconds before client should check for schema update.
@@ -44,6 +51,8 @@ EXAMPLES:
 if six.PY3:
     unicode = str
 
+logger = logging.getLogger(__name__)
+
 register = Registry()
 
 
@@ -835,6 +844,80 @@ class schema(Command):
 
         return schema
 
+    def _get_cache_filename(self, langs):
+        """
+        Returns the name of the file the schema for langs is stored in
+
+        The schema is shared by all server processes. The file name changes
+        with the IPA version and whenever a plugin module is modified, so a
+        stale schema is never used. Returns None if langs is unsuitable for
+        a file name.
+        """
+        # langs comes from the Accept-Language header of the request
+        if not re.match(r'^[a-zA-Z]{0,8}$', langs):
+            return None
+
+        modules = set(
+            type(plugin).__module__
+            for plugin in itertools.chain(self.api.Command(),
+                                          self.api.Object())
+        )
+        digest = hashlib.sha256()
+        digest.update(
+            '{}\0{}\0{}\0'.format(VERSION, API_VERSION, langs).encode())
+        for name in sorted(modules):
+            filename = getattr(sys.modules.get(name), '__file__', None)
+            try:
+                mtime = os.stat(filename).st_mtime_ns if filename else 0
+            except OSError:
+                mtime = 0
+            digest.update('{}\0{}\0'.format(name, mtime).encode())
+
+        return os.path.join(paths.IPA_SCHEMA_CACHE,
+                            'schema-{}.json'.format(digest.hexdigest()))
+
+    @staticmethod
+    def _load_schema(filename):
+        if filename is None:
+            return None
+        try:
+            with open(filename, 'rb') as f:
+                encoded = f.read()
+            with open(filename + '.deflate', 'rb') as f:
+                deflated = f.read()
+        except OSError:
+            return None
+        try:
+            schema = EncodedJSONDict(json.loads(encoded.decode('utf-8')),
+                                     encoded)
+        except ValueError:
+            logger.debug("Ignoring invalid schema file %s", filename)
+            return None
+        schema.set_deflated(deflated)
+        return schema
+
+    @staticmethod
+    def _store_schema(filename, schema):
+        if filename is None or not os.path.isdir(os.path.dirname(filename)):
+            return
+        # the compressed form is written first, the JSON file marks the
+        # schema as complete
+        for name, data in ((filename + '.deflate', schema.get_deflated()),
+                           (filename, schema.encoded)):
+            try:
+                fd, tmpname = tempfile.mkstemp(
+                    dir=os.path.dirname(filename), prefix='.schema')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmpname, name)
+                except BaseException:
+                    os.unlink(tmpname)
+                    raise
+            except OSError as e:
+                logger.debug("Failed to store schema in %s: %s", name, e)
+                return
+
     def execute(self, *args, **kwargs):
         langs = "".join(getattr(context, "languages", []))
 
@@ -843,11 +926,18 @@ class schema(Command):
 
         schema = self.api._schema.get(langs)
         if schema is None:
-            schema = self._generate_schema(**kwargs)
+            filename = self._get_cache_filename(langs)
+            schema = self._load_schema(filename)
+            if schema is None:
+                schema = self._generate_schema(**kwargs)
+                schema['ttl'] = SCHEMA_TTL
+                # the schema is sent as it is encoded here to all clients
+                schema = EncodedJSONDict(
+                    schema,
+                    json_encode_binary(schema, API_VERSION).encode('utf-8'))
+                self._store_schema(filename, schema)
             self.api._schema[langs] = schema
 
-        schema['ttl'] = SCHEMA_TTL
-
         if schema['fingerprint'] in kwargs.get('known_fingerprints', []):
             raise errors.SchemaUpToDate(
                 fingerprint=schema['fingerprint'],
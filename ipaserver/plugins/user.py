@@ -20,15 +20,19 @@
 
 from __future__ import absolute_import
 
+import concurrent.futures
 import logging
+import threading
 import time
 from time import gmtime, strftime
 import posixpath
 
+import ldap as _ldap
 import six
 
 from ipalib import api
 from ipalib import errors
+from ipalib import krb_utils
 from ipalib import Bool, Flag, Str
 from .baseuser import (
     baseuser,
@@ -71,6 +75,7 @@ from ipapython.ipaldap import LDAPClient
 from ipapython.ipautil import ipa_generate_password, TMP_PWD_ENTROPY_BITS
 from ipalib.capabilities import client_has_capability
 from ipaserver.masters import get_masters
+from ipaserver.plugins.ldap2 import LDAPConnectionPool
 
 if six.PY3:
     unicode = str
@@ -131,6 +136,21 @@ MEMBEROF_ADMINS = "(memberOf={})".format(
 
 NOT_MEMBEROF_ADMINS = '(!{})'.format(MEMBEROF_ADMINS)
 
+# Maximum number of masters user_status queries at once, the number of
+# seconds after which a single LDAP operation on a master times out and the
+# number of seconds after which a master is reported as failed altogether
+USER_STATUS_WORKERS = 10
+USER_STATUS_TIMEOUT = 10
+USER_STATUS_DEADLINE = 3 * USER_STATUS_TIMEOUT
+
+
+def _close_replica(client):
+    try:
+        client.unbind()
+    except errors.PublicError:
+        pass
+    client.close()
+
 
 def check_protected_member(user, protected_group_name=u'admins'):
     '''
@@ -1189,6 +1209,115 @@ class user_status(LDAPQuery):
                 arg = arg.clone(cli_name='login')
             yield arg
 
+    def __init__(self, api):
+        super(user_status, self).__init__(api)
+        # connections to the other masters are kept for the next requests
+        # of the same principal, like ldap2 keeps its own connections
+        if api.env.context == 'server' and api.env.ldap_pool_size > 0:
+            self._pool = LDAPConnectionPool(
+                api.env.ldap_pool_size, api.env.ldap_pool_ttl,
+                unbind=_close_replica)
+        else:
+            self._pool = None
+
+    def _connect_replica(self, host, key, expires):
+        """
+        Get a connection to master host bound with the credentials of the
+        request.
+
+        An idle connection of the pool is reused if key is not None.
+        Returns a (connection, expires) tuple.
+        """
+        if key is not None:
+            while True:
+                client, pooled_expires = self._pool.get(key)
+                if client is None:
+                    break
+                try:
+                    # make sure the server did not drop the connection
+                    client.conn.whoami_s()
+                except _ldap.LDAPError:
+                    _close_replica(client)
+                    continue
+                return client, pooled_expires
+
+        client = LDAPClient(ldap_uri='ldap://%s' % host)
+        with client.error_handler():
+            client.conn.set_option(_ldap.OPT_NETWORK_TIMEOUT,
+                                   USER_STATUS_TIMEOUT)
+            client.conn.set_option(_ldap.OPT_TIMEOUT, USER_STATUS_TIMEOUT)
+        client.gssapi_bind()
+        return client, expires
+
+    def _get_replica_entries(self, hosts, dn, attr_list):
+        """
+        Retrieve entry dn from all masters in hosts concurrently.
+
+        Returns a list with a (stage, result) tuple for each host of hosts.
+        stage is None and result the entry if the entry was retrieved,
+        otherwise stage is 'connect' or 'read' and result the exception
+        raised.
+        """
+        key = expires = None
+        principal = getattr(context, 'principal', None)
+        if self._pool is not None and principal is not None:
+            # the credentials of the request must be valid, otherwise an
+            # expired session would get access through a pooled connection
+            creds = krb_utils.get_credentials_if_valid()
+            if creds is not None:
+                key = principal
+                expires = time.monotonic() + min(self._pool.ttl,
+                                                 creds.lifetime)
+
+        # masters which were reported as failed because they did not respond
+        # in time, their connections must not be pooled afterwards
+        lock = threading.Lock()
+        timed_out = set()
+
+        def get_entry(host):
+            host_key = None if key is None else (host, key)
+            try:
+                client, host_expires = self._connect_replica(
+                    host, host_key, expires)
+            except Exception as e:
+                return ('connect', e)
+            try:
+                entry = client.get_entry(dn, attr_list)
+            except Exception as e:
+                _close_replica(client)
+                return ('read', e)
+            with lock:
+                pooled = host_key is not None and host not in timed_out
+                if pooled:
+                    self._pool.put(host_key, client, host_expires)
+            if not pooled:
+                _close_replica(client)
+            return (None, entry)
+
+        if not hosts:
+            return []
+
+        executor = concurrent.futures.ThreadPoolExecutor(
+            min(USER_STATUS_WORKERS, len(hosts)))
+        try:
+            futures = [executor.submit(get_entry, host) for host in hosts]
+            results = []
+            for host, future in zip(hosts, futures):
+                try:
+                    results.append(
+                        future.result(timeout=USER_STATUS_DEADLINE))
+                except concurrent.futures.TimeoutError:
+                    with lock:
+                        timed_out.add(host)
+                    future.cancel()
+                    results.append(('connect', errors.NetworkError(
+                        uri='ldap://%s' % host, error=_('timed out'))))
+        finally:
+            # do not wait for masters which did not respond in time
+            executor.shutdown(wait=False)
+
+        return results
+
     def execute(self, *keys, **options):
         ldap = self.obj.backend
         dn = self.api.Object.user.get_either_dn(*keys, **options)
@@ -1197,25 +1326,43 @@ class user_status(LDAPQuery):
         disabled = False
         masters = get_masters(ldap)
 
+        # the other masters are queried at once, the local one through the
+        # connection of the request
+        replicas = [host for host in masters if host != api.env.host]
+        replica_results = dict(zip(
+            replicas, self._get_replica_entries(replicas, dn, attr_list)))
+
         entries = []
         count = 0
         for host in masters:
             if host == api.env.host:
-                other_ldap = self.obj.backend
-            else:
                 try:
-                    other_ldap = LDAPClient(ldap_uri='ldap://%s' % host)
-                    other_ldap.gssapi_bind()
+                    result = (None, ldap.get_entry(dn, attr_list))
                 except Exception as e:
-                    logger.error("user_status: Connecting to %s failed with "
-                                 "%s", host, str(e))
-                    newresult = {'dn': dn}
-                    newresult['server'] = _("%(host)s failed: %(error)s") % dict(host=host, error=str(e))
-                    entries.append(newresult)
-                    count += 1
-                    continue
-            try:
-                entry = other_ldap.get_entry(dn, attr_list)
+                    result = ('read', e)
+            else:
+                result = replica_results[host]
+            stage, entry = result
+
+            if stage == 'connect':
+                e = entry
+                logger.error("user_status: Connecting to %s failed with "
+                             "%s", host, str(e))
+                newresult = {'dn': dn}
+                newresult['server'] = _("%(host)s failed: %(error)s") % dict(host=host, error=str(e))
+                entries.append(newresult)
+                count += 1
+            elif stage == 'read':
+                e = entry
+                if isinstance(e, errors.NotFound):
+                    raise self.api.Object.user.handle_not_found(*keys)
+                logger.error("user_status: Retrieving status for %s failed "
+                             "with %s", dn, str(e))
+                newresult = {'dn': dn}
+                newresult['server'] = _("%(host)s failed") % dict(host=host)
+                entries.append(newresult)
+                count += 1
+            else:
                 newresult = {'dn': dn}
                 for attr in ['krblastsuccessfulauth', 'krblastfailedauth']:
                     newresult[attr] = entry.get(attr, [u'N/A'])
@@ -1242,18 +1389,6 @@ class user_status(LDAPQuery):
                 self.api.Object.user.get_preserved_attribute(entry, options)
                 entries.append(newresult)
                 count += 1
-            except errors.NotFound:
-                raise self.api.Object.user.handle_not_found(*keys)
-            except Exception as e:
-                logger.error("user_status: Retrieving status for %s failed "
-                             "with %s", dn, str(e))
-                newresult = {'dn': dn}
-                newresult['server'] = _("%(host)s failed") % dict(host=host)
-                entries.append(newresult)
-                count += 1
-
-            if host != api.env.host:
-                other_ldap.close()
 
         return dict(result=entries,
                     count=count,
@@ -28,7 +28,9 @@ from __future__ import absolute_import
 import logging
 from xml.sax.saxutils import escape
 import os
+import struct
 import traceback
+import zlib
 from io import BytesIO
 from urllib.parse import parse_qs
 from xmlrpc.client import Fault
@@ -51,7 +53,7 @@ from ipalib.errors import (PublicError, InternalError, JSONError,
     ExecutionError, PasswordExpired, KrbPrincipalExpired, UserLocked)
 from ipalib.request import context, destroy_context
 from ipalib.rpc import (xml_dumps, xml_loads,
-    json_encode_binary, json_decode_binary)
+    json_encode_parts, json_decode_binary, EncodedJSONDict)
 from ipapython.dn import DN
 from ipaserver.plugins.ldap2 import ldap2
 from ipalib.backend import Backend
@@ -75,6 +77,9 @@ HTTP_STATUS_SUCCESS = '200 Success'
 HTTP_STATUS_SERVER_ERROR = '500 Internal Server Error'
 HTTP_STATUS_SERVICE_UNAVAILABLE = "503 Service Unavailable"
 
+# gzip member header: magic, deflate, no flags, no mtime, no extra flags, Unix
+_GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\x03'
+
 _not_found_template = """<html>
 <head>
 <title>404 Not Found</title>
@@ -326,6 +331,47 @@ class wsgi_dispatch(Executioner, HTTP_Status):
 
 
 
+def _accepts_gzip(environ):
+    """Check whether the client accepts a gzip encoded response"""
+    for coding in environ.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _sep, params = coding.partition(';')
+        if name.strip().lower() in ('gzip', 'x-gzip'):
+            qvalue = params.replace(' ', '').partition('q=')[2]
+            try:
+                return float(qvalue or 1) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def _gzip_json_parts(parts):
+    """Compress the output of json_encode_parts() into one gzip member
+
+    The pre-compressed deflate stream of every EncodedJSONDict is copied
+    as it is, only the text around them is compressed for each response.
+    """
+    crc = 0
+    size = 0
+    chunks = [_GZIP_HEADER]
+    for part in parts:
+        if isinstance(part, EncodedJSONDict):
+            data = part.encoded
+            chunks.append(part.get_deflated())
+        else:
+            data = part.encode('utf-8')
+            compressor = zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+            chunks.append(compressor.compress(data))
+            chunks.append(compressor.flush(zlib.Z_FULL_FLUSH))
+        crc = zlib.crc32(data, crc)
+        size += len(data)
+    # terminate the deflate stream with an empty final block
+    chunks.append(zlib.compressobj(
+        zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS).flush())
+    chunks.append(struct.pack('<II', crc & 0xffffffff, size & 0xffffffff))
+    return b''.join(chunks)
+
+
 class WSGIExecutioner(Executioner):
     """
     Base class for execution backends with a WSGI application interface.
@@ -452,12 +498,16 @@ class WSGIExecutioner(Executioner):
         logger.debug('WSGI WSGIExecutioner.__call__:')
         try:
             status = HTTP_STATUS_SUCCESS
+            setattr(context, 'accept_gzip', _accepts_gzip(environ))
             response = self.wsgi_execute(environ)
             if self.headers:
                 headers = self.headers
             else:
                 headers = [('Content-Type',
                             self.content_type + '; charset=utf-8')]
+            content_encoding = getattr(context, 'content_encoding', None)
+            if content_encoding is not None:
+                headers = headers + [('Content-Encoding', content_encoding)]
         except Exception:
             logger.exception('WSGI %s.__call__():', self.name)
             status = HTTP_STATUS_SERVER_ERROR
@@ -517,10 +567,21 @@ class jsonserver(WSGIExecutioner, HTTP_Status):
             principal=unicode(principal),
             version=unicode(VERSION),
         )
-        dump = json_encode_binary(
+        parts = json_encode_parts(
             response, version, pretty_print=self.api.env.debug
         )
-        return dump.encode('utf-8')
+        if len(parts) == 1 and isinstance(parts[0], str):
+            return parts[0].encode('utf-8')
+        if getattr(context, 'accept_gzip', False):
+            # large pre-encoded results are sent compressed; mod_deflate
+            # leaves responses with a Content-Encoding alone
+            setattr(context, 'content_encoding', 'gzip')
+            return _gzip_json_parts(parts)
+        return b''.join(
+            part.encoded if isinstance(part, EncodedJSONDict)
+            else part.encode('utf-8')
+            for part in parts
+        )
 
     def unmarshal(self, data):
         try:
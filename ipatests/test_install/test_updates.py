@@ -28,6 +28,7 @@ import pytest
 
 from ipalib import api
 from ipalib import errors
+from ipaserver.install import ldapupdate
 from ipaserver.install.ldapupdate import LDAPUpdate, BadSyntax
 from ipaserver.install import installutils
 from ipapython import ipaldap
@@ -136,7 +137,6 @@ class TestUpdate:
         assert entry.single_value['uid'] == 'tuser'
         assert entry.single_value['cn'] == 'Test User'
 
-
     def test_2_update(self):
         """
         Test the updater when adding an attribute to an existing entry (test_2_update)
@@ -151,6 +151,14 @@ class TestUpdate:
         entry = entries[0]
         assert entry.single_value['gecos'] == 'Test User'
 
+    def test_2_update_unchanged(self):
+        """
+        Test that reapplying an update file changes nothing (test_2_update)
+        """
+        modified = self.updater.update([os.path.join(self.testdir,
+                                                     "2_update.update")])
+        assert not modified
+
     def test_3_update(self):
         """
         Test the updater forcing an attribute to a given value (test_3_update)
@@ -259,3 +267,239 @@ class TestUpdate:
         with pytest.raises(BadSyntax):
             self.updater.update(
                 [os.path.join(self.testdir, "9_badsyntax.update")])
+
+
+@pytest.mark.tier0
+class TestIncrementalUpdate:
+    """
+    Test recording of applied update files, no LDAP server is needed.
+    """
+
+    class FakeConnection(ipaldap.LDAPClient):
+        def __init__(self):
+            super(TestIncrementalUpdate.FakeConnection, self).__init__(
+                'ldap://test', no_schema=True)
+
+        def add_entry(self, entry):
+            raise errors.NotFound(reason='parent entry does not exist')
+
+    @pytest.fixture(autouse=True)
+    def updater_setup(self, monkeypatch, tmpdir):
+        self.state = {}
+
+        def get_upgrade_state(module, state):
+            return self.state.get((module, state))
+
+        def set_upgrade_state(module, state, value):
+            self.state[module, state] = value
+
+        monkeypatch.setattr(ldapupdate.sysupgrade, 'get_upgrade_state',
+                            get_upgrade_state)
+        monkeypatch.setattr(ldapupdate.sysupgrade, 'set_upgrade_state',
+                            set_upgrade_state)
+
+        # the constructor needs a configured server
+        updater = LDAPUpdate.__new__(LDAPUpdate)
+        updater.sub_dict = {'SUFFIX': 'dc=example,dc=test', 'TIME': 1}
+        updater.conn = self.FakeConnection()
+        updater.modified = False
+        updater.failed = False
+        updater.incomplete = False
+        monkeypatch.setattr(updater, 'create_connection', lambda: None)
+        monkeypatch.setattr(updater, 'close_connection', lambda: None)
+        monkeypatch.setattr(updater, '_get_entries',
+                            lambda dns: {dn: None for dn in dns})
+        self.updater = updater
+
+        self.applied = []
+        self.outcome = {}
+
+        def run_updates(all_updates):
+            self.applied.append(all_updates)
+            for name, value in self.outcome.items():
+                setattr(updater, name, value)
+
+        self.run_updates = run_updates
+
+        self.filename = str(tmpdir.join('50-test.update'))
+        with open(self.filename, 'w') as f:
+            f.write('dn: cn=test,$SUFFIX\n'
+                    'add: description: test\n'
+                    'plugin: update_test\n')
+
+    def update(self, monkeypatch, **kwargs):
+        monkeypatch.setattr(self.updater, '_run_updates', self.run_updates)
+        self.updater.update([self.filename], incremental=True, **kwargs)
+        return self.applied.pop()
+
+    def test_file_digest(self, monkeypatch):
+        data = ['dn: cn=test,$SUFFIX\n', 'add: description: test\n']
+        digest = self.updater._get_file_digest(data)
+        assert self.updater._get_file_digest(data) == digest
+
+        # TIME is different in every run
+        self.updater.sub_dict['TIME'] = 2
+        assert self.updater._get_file_digest(data) == digest
+
+        assert self.updater._get_file_digest(data[:1]) != digest
+
+        self.updater.sub_dict['SUFFIX'] = 'dc=example,dc=org'
+        assert self.updater._get_file_digest(data) != digest
+        self.updater.sub_dict['SUFFIX'] = 'dc=example,dc=test'
+
+        monkeypatch.setattr(ldapupdate, 'VERSION', '0.0.0')
+        assert self.updater._get_file_digest(data) != digest
+
+    def test_skip_applied(self, monkeypatch):
+        assert len(self.update(monkeypatch)) == 2
+        assert ('ldapupdate', '50-test.update') in self.state
+
+        # only the plugin is run for an unchanged file
+        assert self.update(monkeypatch) == [{'plugin': 'update_test'}]
+
+        assert len(self.update(monkeypatch, force=True)) == 2
+
+    def test_plugins_always_run(self):
+        executed = []
+
+        def update_test():
+            executed.append('update_test')
+            return False, []
+
+        self.updater.api = type('FakeAPI', (), {
+            'Updater': {'update_test': update_test}})()
+        digest = self.updater._get_file_digest(
+            self.updater.read_file(self.filename))
+        self.state['ldapupdate', '50-test.update'] = digest
+
+        self.updater.update([self.filename], incremental=True)
+        self.updater.update([self.filename], incremental=True)
+        assert executed == ['update_test', 'update_test']
+        assert self.state == {('ldapupdate', '50-test.update'): digest}
+
+    @pytest.mark.parametrize('outcome', ['failed', 'incomplete'])
+    def test_not_recorded(self, monkeypatch, outcome):
+        self.outcome[outcome] = True
+        self.update(monkeypatch)
+        assert ('ldapupdate', '50-test.update') not in self.state
+
+        self.outcome[outcome] = False
+        assert len(self.update(monkeypatch)) == 2
+        assert ('ldapupdate', '50-test.update') in self.state
+
+    @pytest.mark.parametrize('action', ['addifexist', 'onlyifexist',
+                                        'addifnew'])
+    def test_missing_entry(self, action):
+        self.updater._update_records([{
+            'dn': DN('cn=missing,dc=example,dc=test'),
+            'updates': [
+                {'action': action, 'attr': 'description', 'value': b'x'},
+            ],
+        }])
+        assert self.updater.incomplete
+        assert not self.updater.failed
+
+    def test_existing_entry(self):
+        entry = self.updater.conn.make_entry(
+            DN('cn=test,dc=example,dc=test'), objectclass=[b'top'])
+        self.updater._apply_update_disposition([
+            {'action': 'addifexist', 'attr': 'description', 'value': b'x'},
+            {'action': 'onlyifexist', 'attr': 'cn', 'value': b'test'},
+        ], entry)
+        assert entry.raw['description'] == [b'x']
+        assert not self.updater.incomplete
+
+    def test_missing_parent(self):
+        self.updater._update_records([{
+            'dn': DN('cn=test,cn=missing,dc=example,dc=test'),
+            'default': [{'attr': 'objectclass', 'value': b'top'}],
+        }])
+        assert self.updater.incomplete
+        assert not self.updater.failed
+
+
+@pytest.mark.tier0
+class TestBatchUpdate:
+    """
+    Test the batched application of updates, no LDAP server is needed.
+    """
+
+    @pytest.fixture(autouse=True)
+    def updater_setup(self):
+        updater = LDAPUpdate.__new__(LDAPUpdate)
+        updater.conn = ipaldap.LDAPClient('ldap://test', no_schema=True)
+        updater.failed = False
+        updater.incomplete = False
+        self.updater = updater
+
+    def test_get_entries_abandon(self):
+        import ldap
+
+        class FakeLDAP:
+            def __init__(self):
+                self.sent = []
+                self.abandoned = []
+
+            def search_ext(self, *args, **kwargs):
+                self.sent.append(args[0])
+                return len(self.sent)
+
+            def result3(self, msgid, all=1):
+                if msgid == 1:
+                    raise ldap.NO_SUCH_OBJECT({'desc': 'No such object'})
+                raise ldap.SERVER_DOWN({'desc': "Can't contact LDAP server"})
+
+            def abandon(self, msgid):
+                self.abandoned.append(msgid)
+
+        fake = self.updater.conn._conn = FakeLDAP()
+        dns = [DN(('cn', name), 'dc=example,dc=test')
+               for name in ('a', 'b', 'c')]
+        with pytest.raises(errors.NetworkError):
+            self.updater._get_entries(dns)
+        # the searches are sent at once, the incomplete ones are abandoned
+        assert fake.sent == [str(dn) for dn in dns]
+        assert fake.abandoned == [2, 3]
+
+    def test_write_order(self, monkeypatch):
+        events = []
+
+        class RecordingClient(ipaldap.LDAPClient):
+            def add_entry(self, entry):
+                events.append(('add', entry.dn))
+                entry.reset_modlist()
+
+            def update_entries(self, entries):
+                for entry in entries:
+                    events.append(('modify', entry.dn,
+                                   sorted(entry.raw['description'])))
+                    entry.reset_modlist()
+                return [None] * len(entries)
+
+        conn = RecordingClient('ldap://test', no_schema=True)
+        self.updater.conn = conn
+        self.updater.modified = False
+        a = DN('cn=a,dc=example,dc=test')
+        b = DN('cn=b,dc=example,dc=test')
+        existing = conn.make_entry(a, objectclass=[b'top'],
+                                   description=[b'old'])
+        existing.reset_modlist()
+        monkeypatch.setattr(self.updater, '_get_entries',
+                            lambda dns: {a: existing, b: None})
+
+        def add_description(value):
+            return [{'action': 'add', 'attr': 'description', 'value': value}]
+
+        # modify A, add B, modify A
+        self.updater._update_records([
+            {'dn': a, 'updates': add_description(b'one')},
+            {'dn': b, 'default': [{'attr': 'objectclass', 'value': b'top'}],
+             'updates': add_description(b'new')},
+            {'dn': a, 'updates': add_description(b'two')},
+        ])
+        assert events == [
+            ('modify', a, [b'old', b'one']),
+            ('add', b),
+            ('modify', a, [b'old', b'one', b'two']),
+        ]
+        assert self.updater.modified
@@ -630,6 +630,40 @@ class TestEPN(IntegrationTest):
         result = tasks.ipa_epn(self.master, raiseonerr=False)
         assert "smtp_delay cannot be less than zero" in result.stderr_text
 
+    def test_EPN_rate_config(self):
+        """Test the smtp_rate and smtp_connections configuration options
+        """
+        epn_conf = textwrap.dedent('''
+            [global]
+            smtp_rate=0
+        ''')
+        self.master.put_file_contents('/etc/ipa/epn.conf', epn_conf)
+        result = tasks.ipa_epn(self.master, raiseonerr=False)
+        assert "smtp_rate must be greater than zero" in result.stderr_text
+
+        epn_conf = textwrap.dedent('''
+            [global]
+            smtp_connections=0
+        ''')
+        self.master.put_file_contents('/etc/ipa/epn.conf', epn_conf)
+        result = tasks.ipa_epn(self.master, raiseonerr=False)
+        assert "smtp_connections must be at least 1" in result.stderr_text
+
+    def test_EPN_concurrent(self, cleanupmail):
+        """Send the notifications over several rate limited connections
+        """
+        epn_conf = textwrap.dedent('''
+            [global]
+            smtp_rate=50
+            smtp_connections=3
+        ''')
+        self.master.put_file_contents('/etc/ipa/epn.conf', epn_conf)
+
+        tasks.ipa_epn(self.master)
+        for i in self.notify_ttls:
+            validate_mail(self.master, i,
+                          "Hi test user,\nYour login entry user%d is going" % i)
+
     def test_EPN_admin(self):
         """The admin user is special and has no givenName by default
            It also doesn't by default have an e-mail address
@@ -0,0 +1,106 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+"""
+Test the DNS discovery of `ipaclient/discovery.py`.
+"""
+
+import threading
+
+import pytest
+from dns import rdata, rdataclass, rdatatype, resolver
+
+from ipaclient import discovery
+
+pytestmark = pytest.mark.tier0
+
+RECORDS = {
+    ('_ldap._tcp.example.com', rdatatype.SRV): [
+        '10 100 389 ipa2.example.com.',
+        '0 100 389 ipa1.example.com.',
+    ],
+    ('_kerberos.example.com', rdatatype.TXT): [
+        '"EXAMPLE.COM"',
+    ],
+    ('_kerberos._udp.example.com', rdatatype.SRV): [
+        '0 100 88 ipa1.example.com.',
+    ],
+}
+
+
+class FakeAnswer(list):
+    class rrset:
+        ttl = 3600
+
+
+class FakeResolver:
+    def __init__(self):
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def __call__(self, qname, rdtype):
+        with self.lock:
+            self.queries.append((qname, rdtype))
+        try:
+            texts = RECORDS[qname, rdtype]
+        except KeyError:
+            raise resolver.NXDOMAIN()
+        return FakeAnswer(rdata.from_text(rdataclass.IN, rdtype, text)
+                          for text in texts)
+
+
+@pytest.fixture
+def fake_dns(tmpdir, monkeypatch):
+    fake = FakeResolver()
+    monkeypatch.setattr(discovery, 'resolve', fake)
+    monkeypatch.setattr(discovery, 'dns_cache', discovery.DNSCache(
+        str(tmpdir.join('discovery_cache.json'))))
+    return fake
+
+
+def test_run_concurrently():
+    results = discovery.run_concurrently(
+        lambda a, b: a * b, [(i, 2) for i in range(20)], workers=4)
+    assert results == [i * 2 for i in range(20)]
+
+
+def test_dns_cache(fake_dns):
+    qname = '_kerberos.example.com'
+    first = discovery.dns_cache.resolve(qname, rdatatype.TXT)
+    second = discovery.dns_cache.resolve(qname, rdatatype.TXT)
+    assert [r.to_text() for r in first] == [r.to_text() for r in second]
+    assert fake_dns.queries == [(qname, rdatatype.TXT)]
+
+    # failed queries are remembered, too
+    qname = '_kerberos.example.net'
+    assert discovery.dns_cache.resolve(qname, rdatatype.TXT) == []
+    assert discovery.dns_cache.resolve(qname, rdatatype.TXT) == []
+    assert fake_dns.queries.count((qname, rdatatype.TXT)) == 1
+
+
+def test_search(fake_dns, monkeypatch):
+    checked = []
+
+    def ipacheckldap(self, thost, trealm, ca_cert_path=None):
+        checked.append(thost)
+        self.basedn = 'dc=example,dc=com'
+        return [discovery.SUCCESS, thost, trealm]
+
+    monkeypatch.setattr(discovery.IPADiscovery, 'ipacheckldap', ipacheckldap)
+
+    ds = discovery.IPADiscovery()
+    result = ds.search(hostname='client.example.com')
+
+    assert result == discovery.SUCCESS
+    assert ds.domain == 'example.com'
+    assert ds.realm == 'EXAMPLE.COM'
+    assert ds.kdc == 'ipa1.example.com'
+    assert ds.basedn == 'dc=example,dc=com'
+    # the first server in priority order is kept
+    assert ds.servers == ['ipa1.example.com']
+    assert ds.server == 'ipa1.example.com'
+    assert 'ipa1.example.com' in checked
+
+    # all records were looked up once
+    assert len(fake_dns.queries) == len(set(fake_dns.queries))
+    assert set(RECORDS) <= set(fake_dns.queries)
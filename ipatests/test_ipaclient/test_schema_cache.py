@@ -0,0 +1,89 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+"""
+Test the on-disk schema cache of `ipaclient/remote_plugins/schema.py`.
+"""
+
+import pytest
+
+from ipaclient.remote_plugins import schema as schema_mod
+
+pytestmark = pytest.mark.tier0
+
+FINGERPRINT = u'0123456789abcdef'
+
+
+def make_schema():
+    schema = schema_mod.Schema.__new__(schema_mod.Schema)
+    schema._namespaces = {}
+    schema._data = None
+    schema._data_offset = 0
+    schema._dict = {
+        'classes': {
+            u'user': {u'full_name': u'user', u'name': u'user',
+                      u'params': []},
+        },
+        'commands': {
+            u'user_show/1': {u'full_name': u'user_show/1',
+                             u'name': u'user_show',
+                             u'doc': u'Display information about a user.',
+                             u'topic_topic': u'user/1'},
+            u'ping/1': {u'full_name': u'ping/1', u'name': u'ping',
+                        u'doc': u'Ping a remote server.\n\nMore text.',
+                        u'exclude': [u'webui']},
+        },
+        'topics': {
+            u'user/1': {u'full_name': u'user/1', u'name': u'user',
+                        u'doc': u'Users\n\nManage user entries.'},
+        },
+    }
+    schema._help = schema._generate_help(schema._dict)
+    return schema
+
+
+def test_schema_cache_roundtrip(tmpdir, monkeypatch):
+    monkeypatch.setattr(schema_mod.Schema, '_DIR', str(tmpdir))
+    original = make_schema()
+    original._write_schema(FINGERPRINT)
+
+    schema = schema_mod.Schema(None, FINGERPRINT)
+    assert schema.fingerprint == FINGERPRINT
+    assert schema.ttl is None
+
+    # only the index is parsed until a member is requested
+    assert isinstance(schema._dict['commands'][u'ping/1'], tuple)
+    assert isinstance(schema._help, tuple)
+
+    commands = schema['commands']
+    assert sorted(commands) == [u'ping/1', u'user_show/1']
+    assert commands[u'ping/1'] == original._dict['commands'][u'ping/1']
+    assert isinstance(schema._dict['commands'][u'user_show/1'], tuple)
+    assert schema['classes'][u'user'][u'params'] == []
+
+    assert commands.get_help(u'ping/1') == {
+        u'name': u'ping',
+        u'summary': u'Ping a remote server.',
+        u'exclude': [u'webui'],
+    }
+    assert schema['topics'].get_help(u'user/1')[u'summary'] == u'Users'
+
+    with pytest.raises(KeyError):
+        commands[u'nonexistent/1']
+
+
+def test_schema_cache_unknown_format(tmpdir, monkeypatch):
+    monkeypatch.setattr(schema_mod.Schema, '_DIR', str(tmpdir))
+    tmpdir.join(FINGERPRINT).write_binary(b'PK\x03\x04')
+
+    schema = schema_mod.Schema.__new__(schema_mod.Schema)
+    schema._dict = {ns: {} for ns in schema.namespaces}
+    with pytest.raises(ValueError):
+        schema._read_schema(FINGERPRINT)
+
+
+def test_schema_topic_module_doc():
+    topics = {u'user/1': {u'name': u'user', u'doc': u'Users'}}
+    module = schema_mod._SchemaTopicModule('ipaclient.test$user')
+    module.set_topic_schema(topics, u'user/1')
+    assert module.__doc__ == u'Users'
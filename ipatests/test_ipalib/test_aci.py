@@ -174,3 +174,24 @@ def test_aci_parsing_10():
                       '(version 3.0;acl "Allow trust agents to retrieve '
                       'keytab keys for cross realm principals";allow (read) '
                       'userattr = "ipaAllowedToPerform;read_keys#GROUPDN";)')
+
+
+def test_aci_parse_cache():
+    source = ('(targetattr = "cn || sn")(version 3.0;acl "cached";'
+              'allow (write) userdn = "ldap:///self";)')
+    a = ACI(source)
+    a.set_target_attr(['title'])
+    a.permissions.append('read')
+    a.bindrule['expression'] = 'ldap:///anyone'
+
+    b = ACI(source)
+    assert b.target['targetattr']['expression'] == ['cn', 'sn']
+    assert b.permissions == ['write']
+    assert b.bindrule['expression'] == 'ldap:///self'
+    assert str(b) == source
+
+
+def test_aci_parsing_malformed_target():
+    with pytest.raises(SyntaxError):
+        ACI('(targetattr "cn")(version 3.0;acl "bad";'
+            'allow (write) userdn = "ldap:///self";)')
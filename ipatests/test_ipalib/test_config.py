@@ -516,7 +516,7 @@ class test_Env(ClassChecker):
             o.context = ctx
 
         # Check that calls cascade down the chain:
-        set_here = ('in_server', 'logdir', 'log')
+        set_here = ('in_server', 'plugins_on_demand', 'logdir', 'log')
         assert o._isdone('_bootstrap') is False
         assert o._isdone('_finalize_core') is False
         assert o._isdone('_finalize') is False
@@ -542,12 +542,14 @@ class test_Env(ClassChecker):
         # Test that correct defaults are generated:
         (o, home) = self.finalize_core(None)
         assert o.in_server is False
+        assert o.plugins_on_demand is False
         assert o.logdir == home.join('.ipa', 'log')
         assert o.log == home.join('.ipa', 'log', 'default.log')
 
         # Test with context='server'
         (o, home) = self.finalize_core('server')
         assert o.in_server is True
+        assert o.plugins_on_demand is True
         assert o.logdir == home.join('.ipa', 'log')
         assert o.log == home.join('.ipa', 'log', 'server.log')
 
@@ -24,11 +24,13 @@ Test the `ipalib.plugable` module.
 # FIXME: Pylint errors
 # pylint: disable=no-member
 
+import concurrent.futures
 import os
 import sys
 import textwrap
 
 from ipalib import plugable, errors, create_api
+from ipalib.base import islocked
 from ipatests.util import raises, read_only
 from ipatests.util import ClassChecker, create_test_api, TempHome
 
@@ -242,6 +244,90 @@ class test_API(ClassChecker):
         e = raises(Exception, api.finalize)
         assert str(e) == 'API.finalize() already called', str(e)
 
+    def test_startup_profile(self):
+        """
+        Test that `ipalib.plugable.API` records plugin initialization times.
+        """
+        class base0(plugable.Plugin):
+            pass
+
+        class API(plugable.API):
+            bases = (base0,)
+            modules = ()
+
+        class base0_plugin0(base0):
+            pass
+
+        api = API()
+        api.env.mode = 'unit_test'
+        api.env.in_tree = True
+        api.add_plugin(base0_plugin0)
+        api.finalize()
+        assert api.startup_profile is None
+
+        api = API()
+        api.env.mode = 'unit_test'
+        api.env.in_tree = True
+        api.env.startup_profile = True
+        api.add_plugin(base0_plugin0)
+        api.finalize()
+
+        profile = api.startup_profile
+        assert isinstance(profile, plugable.StartupProfile)
+        assert sorted(profile.timings['api']) == ['bootstrap', 'finalize']
+        for phase in ('instantiate', 'finalize'):
+            assert list(profile.timings[phase]) == [base0_plugin0.full_name]
+            assert profile.slowest(phase, 1) == [
+                (base0_plugin0.full_name, profile.total(phase))]
+        assert profile.total('api') >= profile.total('finalize') >= 0
+
+    def test_plugins_on_demand(self):
+        """
+        Test on-demand instantiation and finalization of plugins.
+        """
+        class base0(plugable.Plugin):
+            pass
+
+        class base1(plugable.Plugin):
+            pass
+
+        class API(plugable.API):
+            bases = (base0, base1)
+            eager_bases = (base1,)
+            modules = ()
+
+        class base0_plugin0(base0):
+            instances = 0
+
+            def __init__(self, api):
+                super(base0_plugin0, self).__init__(api)
+                type(self).instances += 1
+
+        class base1_plugin0(base1):
+            pass
+
+        api = API()
+        api.env.mode = 'unit_test'
+        api.env.in_tree = True
+        api.env.plugins_on_demand = True
+        api.add_plugin(base0_plugin0)
+        api.add_plugin(base1_plugin0)
+        api.finalize()
+
+        # plugins of eager bases are finalized with the API
+        assert islocked(api.base1.base1_plugin0)
+        assert base0_plugin0.instances == 0
+
+        # concurrent lookups share one instance
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(
+                lambda _i: api.base0.base0_plugin0, range(32)))
+        assert base0_plugin0.instances == 1
+        assert all(r is results[0] for r in results)
+
+        results[0].ensure_finalized()
+        assert islocked(results[0])
+
     def test_bootstrap(self):
         """
         Test the `ipalib.plugable.API.bootstrap` method.
@@ -23,7 +23,9 @@ Test the `ipalib.rpc` module.
 from __future__ import print_function
 
 from xmlrpc.client import Binary, Fault, dumps, loads
+import json
 import urllib
+import zlib
 
 import pytest
 import six
@@ -196,6 +198,29 @@ def test_xml_loads():
         assert type(e.faultString) is unicode
 
 
+def test_json_encode_parts():
+    """
+    Test the `ipalib.rpc.json_encode_parts` function.
+    """
+    schema = rpc.EncodedJSONDict({'name': u'user_add', 'ttl': 3600})
+    response = dict(result=schema, error=None, id=1, principal=u'\x00')
+
+    parts = rpc.json_encode_parts(response, API_VERSION)
+    assert parts.count(schema) == 1
+    assert all(isinstance(part, str)
+               for part in parts if part is not schema)
+
+    data = rpc.json_encode_binary(response, API_VERSION)
+    assert json.loads(data) == dict(
+        result=dict(schema), error=None, id=1, principal=u'\x00')
+
+    # deflated form is compressed once and can be embedded into a stream
+    deflated = schema.get_deflated()
+    assert schema.get_deflated() is deflated
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    assert decompressor.decompress(deflated) == schema.encoded
+
+
 class test_xmlclient(PluginTester):
     """
     Test the `ipalib.rpc.xmlclient` plugin.
@@ -1252,6 +1252,31 @@ class TestDN:
         for i in range(l):
             assert longdn_rev[i] == self.base_container_dn[l - 1 - i]
 
+    def test_parse_cache(self):
+        str_dn = str(self.base_container_dn)
+        dn1 = DN(str_dn)
+        dn2 = DN(str_dn.upper())
+        dn3 = DN(str_dn)
+
+        # DNs parsed from the same string share RDNs but not the list
+        assert dn1.rdns is not dn3.rdns
+        assert dn1.rdns == dn3.rdns
+        assert dn1 == dn2 == dn3 == self.base_container_dn
+        assert hash(dn1) == hash(dn2) == hash(self.base_container_dn)
+
+        # Derived DNs compare and hash like freshly constructed ones
+        assert dn1[1:] == self.base_container_dn[1:]
+        assert hash(dn1[1:]) == hash(DN(self.container_dn, self.base_dn))
+        assert dn1.endswith(self.base_dn)
+        assert DN(dn1) == dn1
+        assert DN(('cn', 'Alice'), dn1[1:]) != dn1
+        assert str(dn1 + self.rdn2) == str_dn + ',' + self.str_rdn2
+
+        # Errors are not cached
+        for _i in range(2):
+            with pytest.raises(ValueError):
+                DN('cn')
+
 
 class TestEscapes:
     @pytest.fixture(autouse=True)
@@ -0,0 +1,138 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+"""
+Test the keep-alive connection pool of `ipapython/dogtag.py`.
+"""
+
+import http.client
+
+import pytest
+
+from ipalib.errors import NetworkError
+from ipapython import dogtag
+
+pytestmark = pytest.mark.tier0
+
+
+class FakeResponse:
+    def __init__(self, will_close=False):
+        self.status = 200
+        self.msg = {}
+        self.will_close = will_close
+
+    def read(self):
+        return b'ok'
+
+    def getheader(self, name):
+        return None
+
+
+class FakeConnection:
+    def __init__(self, fail=False, will_close=False, fail_response=None):
+        self.fail = fail
+        self.will_close = will_close
+        self.fail_response = fail_response
+        self.requests = 0
+        self.closed = False
+
+    def request(self, method, path, body=None, headers=None):
+        self.requests += 1
+        if self.fail:
+            raise BrokenPipeError('closed')
+
+    def getresponse(self):
+        if self.fail_response is not None:
+            raise self.fail_response
+        return FakeResponse(self.will_close)
+
+    def close(self):
+        self.closed = True
+
+
+def request(pool, connections):
+    def factory(host, port):
+        conn = FakeConnection()
+        connections.append(conn)
+        return conn
+
+    return dogtag._httplib_request(
+        'https', 'ca.example', 8443, '/ca/rest/certs', factory, '',
+        method='GET', pool=pool, pool_key='ca.example')
+
+
+class TestConnectionPool:
+    def test_reuse(self):
+        pool = dogtag.ConnectionPool()
+        connections = []
+        for _i in range(3):
+            assert request(pool, connections)[2] == b'ok'
+        assert len(connections) == 1
+        assert connections[0].requests == 3
+        assert not connections[0].closed
+
+        pool.clear()
+        assert connections[0].closed
+
+    def test_maxsize(self):
+        pool = dogtag.ConnectionPool(maxsize=1)
+        conn1, conn2 = FakeConnection(), FakeConnection()
+        pool.put('key', conn1)
+        pool.put('key', conn2)
+        assert conn2.closed
+        assert pool.get('key') is conn1
+        assert pool.get('key') is None
+
+    def test_idle_timeout(self):
+        pool = dogtag.ConnectionPool(idle_timeout=0)
+        conn = FakeConnection()
+        pool.put('key', conn)
+        assert pool.get('key') is None
+        assert conn.closed
+
+    def test_reconnect(self):
+        pool = dogtag.ConnectionPool()
+        stale = FakeConnection(fail=True)
+        pool.put('ca.example', stale)
+        connections = []
+        assert request(pool, connections)[2] == b'ok'
+        assert stale.closed
+        assert len(connections) == 1
+        assert pool.get('ca.example') is connections[0]
+
+    def test_reconnect_no_response(self):
+        pool = dogtag.ConnectionPool()
+        stale = FakeConnection(
+            fail_response=http.client.RemoteDisconnected('closed'))
+        pool.put('ca.example', stale)
+        connections = []
+        assert request(pool, connections)[2] == b'ok'
+        assert stale.closed
+        assert len(connections) == 1
+
+    @pytest.mark.parametrize('error', [
+        ConnectionResetError('reset'),
+        http.client.IncompleteRead(b'partial'),
+        TimeoutError('timed out'),
+    ])
+    def test_no_retry(self, error):
+        # the request may have been processed, it must not be sent again
+        pool = dogtag.ConnectionPool()
+        conn = FakeConnection(fail_response=error)
+        pool.put('ca.example', conn)
+        connections = []
+        with pytest.raises(NetworkError):
+            request(pool, connections)
+        assert conn.closed
+        assert conn.requests == 1
+        assert not connections
+
+    def test_will_close(self):
+        pool = dogtag.ConnectionPool()
+        conn = FakeConnection(will_close=True)
+
+        dogtag._httplib_request(
+            'https', 'ca.example', 8443, '/', lambda host, port: conn, '',
+            method='GET', pool=pool, pool_key='key')
+        assert conn.closed
+        assert pool.get('key') is None
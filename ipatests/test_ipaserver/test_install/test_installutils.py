@@ -140,12 +140,122 @@ def test_gpg_asymmetric(tempdir, gpgkey):
     assert os.path.isfile(encrypted)
     assert not os.path.exists(src)
 
-    ipa_restore.decrypt_file(tempdir, encrypted)
+    # ipa-restore decrypts through a pipe
+    installutils.run_pipeline(
+        [paths.GPG2, '--batch', '--decrypt', encrypted],
+        ['dd', 'of=' + src, 'status=none'])
     assert os.path.isfile(src)
     with open(src) as f:
         assert f.read() == payload
 
 
+def test_run_pipeline(tempdir):
+    dest = os.path.join(tempdir, "pipeline.txt")
+
+    installutils.run_pipeline(
+        ['echo', 'payload'], ['dd', 'of=' + dest, 'status=none'])
+    with open(dest) as f:
+        assert f.read() == 'payload\n'
+
+    with pytest.raises(ScriptError):
+        installutils.run_pipeline(
+            ['false'], ['dd', 'of=' + dest, 'status=none'])
+
+    with pytest.raises(ScriptError):
+        installutils.run_pipeline(['echo', 'payload'], ['false'])
+
+
+def make_admintool(cls, argv=()):
+    cls.make_parser()
+    options, args = cls.option_parser.parse_args(list(argv))
+    return cls(options, args)
+
+
+def test_backup_restore_encrypted(tempdir, gpgkey, monkeypatch):
+    # the archive is piped from tar into gpg and back from gpg into tar
+    backup_dir = os.path.join(tempdir, "backup")
+    os.mkdir(backup_dir)
+    monkeypatch.setattr(paths, 'IPA_BACKUP_DIR', backup_dir)
+
+    backup = make_admintool(ipa_backup.Backup, ['--gpg'])
+    backup.dir = os.path.join(tempdir, "ipa")
+    os.mkdir(backup.dir)
+    with open(os.path.join(backup.dir, "files.tar"), 'w') as f:
+        f.write('payload\n')
+    backup.header = os.path.join(tempdir, "header")
+    with open(backup.header, 'w') as f:
+        f.write('[ipa]\n')
+
+    backup.finalize_backup(encrypt=True)
+    (name,) = os.listdir(backup_dir)
+    assert name.startswith('ipa-full-')
+    assert sorted(os.listdir(os.path.join(backup_dir, name))) == [
+        'header', 'ipa-full.tar.gpg']
+
+    class FakeUser:
+        uid = os.getuid()
+        pgid = os.getgid()
+
+        def chown(self, path):
+            pass
+
+    monkeypatch.setattr(ipa_restore.constants, 'DS_USER', FakeUser())
+    restore = make_admintool(ipa_restore.Restore)
+    restore.backup_type = 'FULL'
+    restore.backup_dir = os.path.join(backup_dir, name)
+    restore.top_dir = restore.dir = os.path.join(tempdir, "restore")
+    os.mkdir(restore.dir)
+
+    restore.extract_backup()
+    assert os.listdir(restore.dir) == ['files.tar']
+    with open(os.path.join(restore.dir, "files.tar")) as f:
+        assert f.read() == 'payload\n'
+
+
+@pytest.mark.parametrize('compression', ['gzip', 'zstd'])
+def test_backup_header_compression(tempdir, monkeypatch, compression):
+    class FakeEnv:
+        host = 'ipa.example.test'
+        container_masters = 'cn=masters,cn=ipa,cn=etc'
+        basedn = 'dc=example,dc=test'
+
+    class FakeAPI:
+        env = FakeEnv()
+
+    def get_connection():
+        raise ipa_backup.errors.NetworkError(uri='ldapi://', error='down')
+
+    monkeypatch.setattr(ipa_backup, 'api', FakeAPI())
+    backup = make_admintool(ipa_backup.Backup)
+    backup.header = os.path.join(tempdir, "header")
+    monkeypatch.setattr(backup, 'get_connection', get_connection)
+    backup.create_header(False, compression)
+
+    restore = make_admintool(ipa_restore.Restore)
+    restore.header = backup.header
+    restore.read_header()
+    assert restore.backup_type == 'FULL'
+    assert restore.backup_compression == compression
+
+
+def test_backup_header_no_compression(tempdir):
+    # backups made before the codec was selectable are gzip compressed
+    restore = make_admintool(ipa_restore.Restore)
+    restore.header = os.path.join(tempdir, "header")
+    with open(restore.header, 'w') as f:
+        f.write(textwrap.dedent("""
+            [ipa]
+            type = FULL
+            time = 2020-01-01T00:00:00
+            host = ipa.example.test
+            ipa_version = 4.8.0
+            version = 1
+            services = KDC
+        """))
+    restore.read_header()
+    assert restore.backup_compression == 'gzip'
+
+
 @pytest.mark.parametrize(
     "platform, expected",
     [
@@ -29,6 +29,7 @@ from __future__ import absolute_import
 
 import os
 import sys
+import time
 
 import pytest
 import six
@@ -140,6 +141,98 @@ class test_ldap:
         cert = entry_attrs.get('usercertificate')[0]
         assert cert.serial_number is not None
 
+    def test_iter_entries(self):
+        """
+        Test that iter_entries yields the same entries as get_entries
+        """
+        self.conn = ldap2(api)
+        self.conn.connect(autobind=AUTOBIND_DISABLED)
+        base_dn = DN(api.env.container_accounts, api.env.basedn)
+        expected = self.conn.get_entries(
+            base_dn, self.conn.SCOPE_ONELEVEL, attrs_list=['cn'])
+        entries = self.conn.iter_entries(
+            base_dn, self.conn.SCOPE_ONELEVEL, attrs_list=['cn'],
+            size_limit=-1, paged_search=True)
+        assert ([e.dn for e in entries] ==
+                [e.dn for e in expected])
+
+    def test_iter_entries_close(self):
+        """
+        Test that a partially consumed paged iter_entries can be closed
+        """
+        self.conn = ldap2(api)
+        self.conn.connect(autobind=AUTOBIND_DISABLED)
+        base_dn = DN(api.env.container_accounts, api.env.basedn)
+        entries = self.conn.iter_entries(
+            base_dn, self.conn.SCOPE_ONELEVEL, attrs_list=['cn'],
+            size_limit=-1, paged_search=True)
+        first = next(entries)
+        entries.close()
+        # the connection is still usable after the search was cancelled
+        entry = self.conn.get_entry(first.dn, ['cn'])
+        assert entry.dn == first.dn
+
+    def test_iter_entries_not_found(self):
+        """
+        Test that iter_entries raises NotFound for an empty result
+        """
+        self.conn = ldap2(api)
+        self.conn.connect(autobind=AUTOBIND_DISABLED)
+        with pytest.raises(errors.NotFound):
+            list(self.conn.iter_entries(
+                api.env.basedn, filter='(cn=doesnotexist-iter-entries)'))
+
+    def test_request_cache(self):
+        """
+        Test that get_cached memoizes until a dependency is written
+        """
+        self.conn = ldap2(api)
+        self.conn.connect(autobind=AUTOBIND_DISABLED)
+        dn = DN(api.env.container_masters, api.env.basedn)
+        calls = []
+
+        def func():
+            calls.append(None)
+            return len(calls)
+
+        assert self.conn.get_cached('test', func, dn) == 1
+        assert self.conn.get_cached('test', func, dn) == 1
+        # writes above the dependency do not matter
+        self.conn.invalidate_cache(api.env.basedn)
+        assert self.conn.get_cached('test', func, dn) == 1
+        self.conn.invalidate_cache(DN(('cn', api.env.host), dn))
+        assert self.conn.get_cached('test', func, dn) == 2
+        self.conn.invalidate_cache()
+        assert self.conn.get_cached('test', func, dn) == 3
+
+    def test_post_read(self):
+        """
+        Test that add_entry and update_entry return the written entry
+        """
+        self.conn = ldap2(api)
+        self.conn.connect(autobind=AUTOBIND_DISABLED)
+        dn = DN(('cn', 'test-post-read'), api.env.container_sudocmdgroup,
+                api.env.basedn)
+        entry = self.conn.make_entry(
+            dn, objectclass=['top', 'ipasudocmdgrp', 'ipaobject'],
+            cn=['test-post-read'], ipauniqueid=['autogenerate'])
+        created = self.conn.add_entry(
+            entry, post_read=['cn', 'description', 'ipauniqueid'])
+        try:
+            assert created.dn == dn
+            assert created['cn'] == ['test-post-read']
+            assert 'description' not in created
+            # the value generated by the server is returned
+            assert created.single_value['ipauniqueid'] != 'autogenerate'
+
+            entry['description'] = ['post read']
+            updated = self.conn.update_entry(
+                entry, post_read=['description'])
+            assert updated.dn == dn
+            assert updated['description'] == ['post read']
+        finally:
+            self.conn.delete_entry(dn)
+
 
 @pytest.mark.tier0
 @pytest.mark.needs_ipaapi
@@ -321,6 +414,23 @@ class test_LDAPEntry:
         e.raw['test'].append(b'second')
         assert e['test'] == ['not list', u'second']
 
+    def test_decode_raw(self):
+        e = self.entry
+
+        raw = [b'cn=a', b'cn=b', b'cn=a']
+        e.raw['member'] = raw
+        assert e['member'] == [DN('cn=a'), DN('cn=b')]
+        assert e.raw['member'] is raw
+        assert raw == [b'cn=a', b'cn=b', b'cn=a']
+
+        decoder = self.conn._get_attribute_decoder('member')
+        assert self.conn._get_attribute_decoder('member') is decoder
+        assert decoder(b'cn=c') == DN('cn=c')
+
+        e.raw['member'] = [b'invalid']
+        with pytest.raises(ValueError):
+            e.get('member')
+
     def test_modlist_with_varying_encodings(self):
         """
         Test modlist is correct when only encoding of new value differs
@@ -338,3 +448,246 @@ class test_LDAPEntry:
         assert entry.generate_modlist() == [
             (1, 'distinguishedName', [dn_389ds_encoded]),
             (0, 'distinguishedName', [dn_ipa_encoded])]
+
+
+@pytest.mark.tier0
+def test_schema_cache_on_disk(tmpdir, monkeypatch):
+    """Test that SchemaCache reuses a stored schema until it changes"""
+    from ipapython import ipaldap
+
+    class FakeConnection:
+        def __init__(self):
+            self.csn = b'5f3a1c2d000000000000'
+            self.searches = []
+
+        def search_s(self, base, scope, attrlist):
+            self.searches.append(attrlist)
+            attrs = {
+                'nsSchemaCSN': [self.csn],
+                'modifyTimestamp': [b'20200101000000Z'],
+            }
+            if 'attributetypes' in attrlist:
+                attrs['attributeTypes'] = [
+                    b"( 2.5.4.3 NAME ( 'cn' 'commonName' ) "
+                    b"SYNTAX 1.3.6.1.4.1.1466.115.121.1.15 )"
+                ]
+                attrs['objectClasses'] = [
+                    b"( 2.5.6.0 NAME 'top' ABSTRACT MUST objectClass )"
+                ]
+            return [('cn=schema', attrs)]
+
+    monkeypatch.setattr(ipaldap.SchemaCache, '_SERVER_DIR', str(tmpdir))
+    url = 'ldap://schema.test'
+    conn = FakeConnection()
+
+    schema = ipaldap.SchemaCache().get_schema(url, conn)
+    assert schema.get_obj(ipaldap.ldap.schema.AttributeType, 'cn')
+    assert len(conn.searches) == 1
+
+    # a new process validates the stored schema with a stamp search
+    conn.searches = []
+    schema = ipaldap.SchemaCache().get_schema(url, conn)
+    assert schema.get_obj(ipaldap.ldap.schema.AttributeType, 'commonName')
+    assert conn.searches == [ipaldap.SchemaCache._STAMP_ATTRS]
+
+    # changed schema is downloaded again
+    conn.searches = []
+    conn.csn = b'5f3a1c2e000000000000'
+    ipaldap.SchemaCache().get_schema(url, conn)
+    assert len(conn.searches) == 2
+    assert 'attributetypes' in conn.searches[1]
+
+    # force_update never uses the stored schema
+    conn.searches = []
+    ipaldap.SchemaCache().get_schema(url, conn, force_update=True)
+    assert len(conn.searches) == 1
+
+    # without the server directory the cache of the user is used
+    user_dir = tmpdir.join('user')
+    monkeypatch.setattr(ipaldap.SchemaCache, '_SERVER_DIR',
+                        str(tmpdir.join('missing')))
+    monkeypatch.setattr(ipaldap.SchemaCache, '_USER_DIR', str(user_dir))
+    ipaldap.SchemaCache().get_schema(url, conn)
+    assert len(user_dir.listdir()) == 1
+
+
+@pytest.mark.tier0
+def test_connection_pool():
+    """Test that LDAPConnectionPool only hands out unexpired connections"""
+    from ipaserver.plugins.ldap2 import LDAPConnectionPool
+
+    class FakeConnection:
+        unbound = False
+
+        def unbind_s(self):
+            self.unbound = True
+
+    pool = LDAPConnectionPool(maxsize=1, ttl=60)
+    key = ('ldapi://test', 'admin@EXAMPLE.TEST')
+    other = ('ldapi://test', 'user@EXAMPLE.TEST')
+    conn1, conn2 = FakeConnection(), FakeConnection()
+
+    pool.put(key, conn1, time.monotonic() + 60)
+    pool.put(key, conn2, time.monotonic() + 60)
+    assert conn2.unbound
+    assert pool.get(other) == (None, None)
+    assert pool.get(key)[0] is conn1
+    assert pool.get(key) == (None, None)
+
+    # expired connections are unbound instead of reused
+    pool.put(key, conn1, time.monotonic() - 1)
+    assert conn1.unbound
+    assert pool.get(key) == (None, None)
+
+    conn3 = FakeConnection()
+    pool.put(other, conn3, time.monotonic() + 60)
+    pool.clear()
+    assert conn3.unbound
+    assert pool.get(other) == (None, None)
+
+
+@pytest.mark.tier0
+def test_connection_pool_unbind():
+    """Test that LDAPConnectionPool closes connections with unbind"""
+    from ipaserver.plugins.ldap2 import LDAPConnectionPool
+
+    closed = []
+    pool = LDAPConnectionPool(maxsize=1, ttl=60, unbind=closed.append)
+    key = ('ldap://replica.example.test', 'admin@EXAMPLE.TEST')
+
+    pool.put(key, 'conn1', time.monotonic() + 60)
+    pool.put(key, 'conn2', time.monotonic() + 60)
+    assert closed == ['conn2']
+    pool.clear()
+    assert closed == ['conn2', 'conn1']
+
+
+@pytest.mark.tier0
+def test_ldap2_pools_clean_connections():
+    """Test that ldap2 only pools connections which completed cleanly"""
+    import ldap
+    from ipalib.request import context
+
+    key = ('ldapi://test', 'admin@EXAMPLE.TEST')
+
+    class FakeEnv:
+        context = 'server'
+        ldap_pool_size = 2
+        ldap_pool_ttl = 60
+        ldap_uri = 'ldapi://test'
+
+    class FakeAPI:
+        env = FakeEnv()
+
+    class FakeConnection:
+        def __init__(self):
+            self.results = []
+            self.unbound = False
+
+        def search_ext(self, *args, **kwargs):
+            return 1
+
+        def result3(self, msgid, all=1):
+            if self.results:
+                result = self.results.pop(0)
+                if isinstance(result, Exception):
+                    raise result
+                return result
+            return (ldap.RES_SEARCH_RESULT, [], msgid, [])
+
+        def abandon(self, msgid):
+            pass
+
+        def unbind_s(self):
+            self.unbound = True
+
+    class FakeLDAP2(ldap2):
+        def create_connection(self, *args, **kwargs):
+            conn = self._pool.get(key)[0] or FakeConnection()
+            setattr(context, self._pool_attr, (key, time.monotonic() + 60))
+            return conn
+
+        def _convert_result(self, result):
+            return result
+
+    entry = (ldap.RES_SEARCH_ENTRY, [('cn=a', {})], 1, [])
+    conn = FakeLDAP2(FakeAPI())
+
+    def request(results, func):
+        conn.connect()
+        ldap_conn = conn.conn
+        ldap_conn.results = list(results)
+        try:
+            func()
+        finally:
+            conn.disconnect()
+        return ldap_conn
+
+    def search():
+        return list(conn.iter_entries(DN('dc=test')))
+
+    # an exhausted search and an empty result complete the search
+    first = request([entry, entry], search)
+    assert not first.unbound
+    with pytest.raises(errors.EmptyResult):
+        request([], search)
+    assert conn._pool.get(key)[0] is first
+
+    # a search which was not read to the end
+    def partial_search():
+        entries = conn.iter_entries(DN('dc=test'))
+        next(entries)
+        entries.close()
+
+    assert request([entry, entry], partial_search).unbound
+
+    # an error reported by libldap rather than by the server
+    with pytest.raises(errors.DatabaseTimeout):
+        request([entry, ldap.TIMEOUT()], search)
+    assert conn._pool.get(key) == (None, None)
+
+
+@pytest.mark.tier0
+def test_update_entries(monkeypatch):
+    """Test that update_entries pipelines the modifications of entries"""
+    import ldap
+    from ipapython import ipaldap
+
+    events = []
+
+    class FakeConnection:
+        def modify_ext(self, dn, modlist):
+            events.append(('send', dn))
+            return len([e for e in events if e[0] == 'send'])
+
+        def result3(self, msgid, all=1):
+            events.append(('wait', msgid))
+            if msgid == 2:
+                raise ldap.INSUFFICIENT_ACCESS({'desc': 'denied'})
+            return (ldap.RES_MODIFY, [], msgid, [])
+
+    monkeypatch.setattr(ipaldap, 'MODIFY_PIPELINE_DEPTH', 2)
+    client = ipaldap.LDAPClient('ldap://test', no_schema=True)
+    client._conn = FakeConnection()
+
+    entries = []
+    for name in ('a', 'denied', 'unchanged', 'b'):
+        entry = client.make_entry(DN(('cn', name)), description=['old'])
+        entry.reset_modlist()
+        if name != 'unchanged':
+            entry['description'] = ['new']
+        entries.append(entry)
+
+    results = client.update_entries(entries)
+    assert results[0] is None
+    assert isinstance(results[1], errors.ACIError)
+    assert isinstance(results[2], errors.EmptyModlist)
+    assert results[3] is None
+    # the results are waited for after MODIFY_PIPELINE_DEPTH requests
+    assert events == [
+        ('send', 'cn=a'), ('send', 'cn=denied'), ('wait', 1), ('wait', 2),
+        ('send', 'cn=b'), ('wait', 3),
+    ]
+    # only the updated entries are reset
+    assert not entries[0].generate_modlist()
+    assert entries[1].generate_modlist()
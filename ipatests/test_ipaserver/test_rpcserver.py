@@ -22,12 +22,15 @@ Test the `ipaserver.rpc` module.
 """
 
 import json
+import zlib
+
 import pytest
 
 import six
 
 from ipatests.util import assert_equal, raises, PluginTester
-from ipalib import errors
+from ipalib import errors, rpc
+from ipapython.version import API_VERSION
 from ipaserver import rpcserver
 
 if six.PY3:
@@ -136,6 +139,27 @@ def test_params_2_args_options():
     assert f([args, options]) == (args, options)
 
 
+def test_gzip_json_parts():
+    """
+    Test the `ipaserver.rpcserver._gzip_json_parts` function.
+    """
+    schema = rpc.EncodedJSONDict({'commands': [u'user_add'] * 100})
+    response = dict(result=schema, error=None, id=1)
+    parts = rpc.json_encode_parts(response, API_VERSION)
+
+    data = rpcserver._gzip_json_parts(parts)
+    # a single gzip member that decodes to the complete response
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert json.loads(decompressor.decompress(data)) == dict(
+        result=dict(schema), error=None, id=1)
+    assert decompressor.eof
+    assert not decompressor.unused_data
+
+    assert rpcserver._accepts_gzip({'HTTP_ACCEPT_ENCODING': 'gzip, deflate'})
+    assert not rpcserver._accepts_gzip({'HTTP_ACCEPT_ENCODING': 'gzip;q=0'})
+    assert not rpcserver._accepts_gzip({})
+
+
 class test_session:
     klass = rpcserver.wsgi_dispatch
 
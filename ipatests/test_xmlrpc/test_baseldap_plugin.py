@@ -223,3 +223,182 @@ def test_entry_to_dict():
     assert_deepequal(
         baseldap.entry_to_dict(entry, all=True, raw=True),
         the_dict)
+
+
+class FakeMembershipClient(ipaldap.LDAPClient):
+    """LDAP client evaluating the filters of IndirectMembership on a tree"""
+    def __init__(self, tree):
+        super(FakeMembershipClient, self).__init__('ldap://test',
+                                                   no_schema=True)
+        self.tree = [self.make_entry(dn, attrs) for dn, attrs in tree]
+        self.filters = []
+        # number of attribute values returned by the searches
+        self.transferred = 0
+
+    def _parse(self, filter, pos=0):
+        assert filter[pos] == '('
+        op = filter[pos + 1]
+        if op in '&|':
+            children = []
+            pos += 2
+            while filter[pos] != ')':
+                child, pos = self._parse(filter, pos)
+                children.append(child)
+            return (op, children), pos + 1
+        end = filter.index(')', pos)
+        attr, value = filter[pos + 1:end].split('=', 1)
+        return (attr, value), end + 1
+
+    def _match(self, entry, node):
+        op, arg = node
+        if op == '&':
+            return all(self._match(entry, child) for child in arg)
+        if op == '|':
+            return any(self._match(entry, child) for child in arg)
+        values = [v.lower() for v in entry.raw.get(op, [])]
+        if arg == '*':
+            return bool(values)
+        return arg.lower().encode('utf-8') in values
+
+    def iter_entries(self, base_dn, scope=ldap.SCOPE_SUBTREE, filter=None,
+                     attrs_list=None, **kwargs):
+        self.filters.append(filter)
+        node = self._parse(filter)[0]
+        found = False
+        for entry in self.tree:
+            if scope == ldap.SCOPE_BASE and entry.dn != base_dn:
+                continue
+            if not self._match(entry, node):
+                continue
+            found = True
+            attrs = {a: entry.raw[a] for a in attrs_list if a in entry}
+            self.transferred += sum(len(v) for v in attrs.values())
+            yield self.make_entry(entry.dn, attrs)
+        if not found:
+            raise errors.NotFound(reason='no such entry')
+
+
+def raw(*dns):
+    return {str(dn).encode('utf-8') for dn in dns}
+
+
+@pytest.mark.tier0
+def test_indirect_membership():
+    """Test the IndirectMembership graph resolver"""
+    group1 = DN('cn=group1,cn=groups,dc=example')
+    group2 = DN('cn=group2,cn=groups,dc=example')
+    group3 = DN('cn=group3,cn=groups,dc=example')
+    rule = DN('ipauniqueid=1,cn=hbac,dc=example')
+    user1 = DN('uid=user1,cn=users,dc=example')
+    user2 = DN('uid=user2,cn=users,dc=example')
+    user3 = DN('uid=user3,cn=users,dc=example')
+
+    # group1 -> group2 -> group3, rule -> group1, user3 in group1 and group3
+    conn = FakeMembershipClient([
+        (group1, dict(member=[user1, user3, group2], memberof=[rule])),
+        (group2, dict(member=[group3], memberof=[group1, rule])),
+        (group3, dict(member=[user2, user3],
+                      memberof=[group1, group2, rule])),
+        (rule, dict(memberuser=[group1])),
+    ])
+    entries = [
+        conn.make_entry(group1, member=[user1, group2]),
+        conn.make_entry(group3, member=[user2]),
+        conn.make_entry(user2, memberof=[group3, group2, group1, rule]),
+        conn.make_entry(user3, memberof=[group3, group2, group1, rule]),
+    ]
+    membership = baseldap.IndirectMembership(
+        conn, DN('dc=example'), entries)
+    membership.filter_chunk_size = 2
+
+    membership.get_memberindirect(entries[0])
+    assert set(entries[0].raw['memberindirect']) == raw(group3, user2, user3)
+
+    membership.get_memberindirect(entries[1])
+    assert 'memberindirect' not in entries[1]
+
+    membership.get_memberofindirect(entries[2])
+    assert set(entries[2].raw['memberof']) == raw(group3)
+    assert set(entries[2].raw['memberofindirect']) == raw(
+        group2, group1, rule)
+
+    # group1 is also reachable through group3, it is checked separately
+    membership.get_memberofindirect(entries[3])
+    assert set(entries[3].raw['memberof']) == raw(group1, group3)
+    assert set(entries[3].raw['memberofindirect']) == raw(group2, rule)
+
+    # only the found entries are looked up, in chunks, once
+    assert len(conn.filters) == 7
+    for filter in conn.filters:
+        assert str(user1) not in filter
+
+    entry = conn.make_entry(DN('cn=a\\,b,cn=groups,dc=example'))
+    assert not membership.resolvable(entry)
+
+
+@pytest.mark.tier0
+def test_indirect_membership_large_group():
+    """Test that the member lists of parents are not read"""
+    group = DN('cn=group,cn=groups,dc=example')
+    users = [DN(('uid', 'user%d' % i), 'cn=users,dc=example')
+             for i in range(250)]
+
+    conn = FakeMembershipClient([(group, dict(member=users))])
+    entries = [conn.make_entry(dn, memberof=[group]) for dn in users]
+    membership = baseldap.IndirectMembership(
+        conn, DN('dc=example'), entries)
+
+    for entry in entries:
+        membership.get_memberofindirect(entry)
+        assert set(entry.raw['memberof']) == raw(group)
+        assert 'memberofindirect' not in entry
+
+    # one search per chunk, nothing but the DN of the group is returned
+    assert len(conn.filters) == 4
+    assert conn.transferred == 0
+
+
+@pytest.mark.tier0
+def test_member_classifier():
+    """Test the MemberClassifier raw member value matching"""
+    class FakePrimaryKey:
+        def __init__(self, name):
+            self.name = name
+
+    class FakeObject:
+        rdn_attribute = ''
+
+        def __init__(self, name, container_dn, pkey):
+            self.name = name
+            self.container_dn = container_dn
+            self.primary_key = FakePrimaryKey(pkey)
+
+        def get_primary_key_from_dn(self, dn):
+            return dn[self.primary_key.name]
+
+    class FakeEnv:
+        basedn = DN('dc=example,dc=com')
+
+    class FakeAPI:
+        env = FakeEnv()
+        Object = {
+            'user': FakeObject('user', DN('cn=users,cn=accounts'), 'uid'),
+            'group': FakeObject('group', DN('cn=groups,cn=accounts'), 'cn'),
+        }
+
+    classifier = baseldap.MemberClassifier(
+        FakeAPI(), 'member', ['user', 'group'])
+
+    assert classifier.classify(
+        b'uid=admin,cn=users,cn=accounts,dc=example,dc=com'
+    ) == ('member_user', u'admin')
+    assert classifier.classify(
+        b'cn=admins,CN=Groups,cn=accounts,dc=example,dc=com'
+    ) == ('member_group', u'admins')
+    # escaped values are matched by parsing the DN
+    assert classifier.classify(
+        b'cn=a\\2Cb,cn=groups,cn=accounts,dc=example,dc=com'
+    ) == ('member_group', u'a,b')
+    assert classifier.classify(
+        b'cn=admins,cn=hostgroups,cn=accounts,dc=example,dc=com'
+    ) is None
@@ -21,7 +21,12 @@
 Test the `ipaserver/plugins/batch.py` module.
 """
 
-from ipalib import api
+import threading
+import time
+
+from ipalib import api, crud, errors
+from ipalib.frontend import Command
+from ipaserver.plugins import batch as batch_plugin
 from ipatests.test_xmlrpc import objectclasses
 from ipatests.util import Fuzzy, assert_deepequal
 from ipatests.test_xmlrpc.xmlrpc_test import (Declarative, fuzzy_digits,
@@ -265,3 +270,123 @@ class test_batch(Declarative):
         ),
 
     ]
+
+
+class ping(Command):
+    pass
+
+
+class FakeLDAP:
+    def __init__(self, fail_connect=False):
+        self.fail_connect = fail_connect
+        self.connected = set()
+
+    def isconnected(self):
+        return True
+
+    def connect(self, ccache=None):
+        if self.fail_connect:
+            raise errors.ACIError(info=u'cannot connect')
+        self.connected.add(threading.current_thread())
+
+
+class FakeAPI:
+    def __init__(self, workers, fail_connect=False):
+        self.env = type('env', (), dict(
+            in_server=True, batch_parallel_workers=workers))
+        self.Backend = type('Backend', (), dict(
+            ldap2=FakeLDAP(fail_connect)))
+        self.Command = {
+            'ping': ping(self),
+            'show': crud.Retrieve(self),
+            'find': crud.Search(self),
+            'add': crud.Create(self),
+        }
+
+
+@pytest.mark.tier0
+class TestParallelBatch:
+    """
+    Test concurrent execution of read-only batch requests.
+    """
+
+    @pytest.fixture(autouse=True)
+    def batch_setup(self, monkeypatch):
+        self.executed = []
+        self.lock = threading.Lock()
+
+        def _validate_request(cmd, request):
+            if request['method'] not in cmd.api.Command:
+                raise errors.CommandError(name=request['method'])
+
+        def _execute_request(cmd, request, version):
+            if request['method'] != 'add':
+                # give the other workers a chance to run concurrently
+                time.sleep(0.05)
+            with self.lock:
+                self.executed.append(
+                    (request['params'], threading.current_thread()))
+            return dict(params=request['params'], error=None)
+
+        monkeypatch.setattr(
+            batch_plugin.batch, '_validate_request', _validate_request)
+        monkeypatch.setattr(
+            batch_plugin.batch, '_execute_request', _execute_request)
+
+    def request(self, method, i):
+        return dict(method=method, params=i)
+
+    def test_is_read_only(self):
+        cmd = batch_plugin.batch(FakeAPI(4))
+        assert cmd._is_read_only(self.request('ping', 0))
+        assert cmd._is_read_only(self.request('show', 0))
+        assert cmd._is_read_only(self.request('find', 0))
+        assert not cmd._is_read_only(self.request('add', 0))
+        # malformed requests are executed in order
+        assert not cmd._is_read_only(self.request('nonexistent', 0))
+
+    def test_order_and_barrier(self):
+        fake_api = FakeAPI(4)
+        cmd = batch_plugin.batch(fake_api)
+        methods = [self.request('show', 0), self.request('find', 1),
+                   self.request('show', 2), self.request('add', 3),
+                   self.request('show', 4), self.request('find', 5)]
+
+        result = cmd.execute(methods, version=u'2.0')
+
+        # results are in the order of the requests
+        assert result['count'] == 6
+        assert [r['params'] for r in result['results']] == list(range(6))
+
+        # the write request runs in the calling thread after all previous
+        # requests finished and before all following ones started
+        order = [params for params, _thread in self.executed]
+        assert sorted(order[:3]) == [0, 1, 2]
+        assert order[3] == 3
+        assert sorted(order[4:]) == [4, 5]
+        threads = dict(self.executed)
+        assert threads[3] is threading.current_thread()
+        for i in (0, 1, 2, 4, 5):
+            assert threads[i] is not threading.current_thread()
+            assert threads[i] in fake_api.Backend.ldap2.connected
+
+    def test_connect_failure(self):
+        cmd = batch_plugin.batch(FakeAPI(4, fail_connect=True))
+        methods = [self.request('show', i) for i in range(3)]
+
+        result = cmd.execute(methods, version=u'2.0')
+
+        # the requests are run in the calling thread instead
+        assert [r['params'] for r in result['results']] == [0, 1, 2]
+        assert all(thread is threading.current_thread()
+                   for _params, thread in self.executed)
+
+    def test_single_worker(self):
+        cmd = batch_plugin.batch(FakeAPI(1))
+        methods = [self.request('show', i) for i in range(3)]
+
+        cmd.execute(methods, version=u'2.0')
+
+        assert [params for params, _thread in self.executed] == [0, 1, 2]
+        assert all(thread is threading.current_thread()
+                   for _params, thread in self.executed)
@@ -22,7 +22,10 @@ Test the `ipaserver/plugins/cert.py` module against a RA.
 from __future__ import print_function, absolute_import
 
 import base64
+import collections
 import os
+import threading
+import time
 
 import pytest
 import six
@@ -504,3 +507,183 @@ class test_cert_revocation(BaseCert):
 
     def test_revoke_with_reason_10(self):
         self.revoke_cert(10)
+
+
+@pytest.mark.tier0
+class TestCertParseCache:
+    """Test the LRU cache of BaseCertObject._parse()"""
+
+    @pytest.fixture(autouse=True)
+    def parse_cache(self, monkeypatch):
+        from ipaserver.plugins import cert as cert_plugin
+
+        self.parsed = []
+
+        def parse_certificate(obj, certificate, full):
+            self.parsed.append(certificate)
+            return {'serial_number': len(self.parsed), 'san_dnsname': [u'a']}
+
+        monkeypatch.setattr(cert_plugin, '_parse_cache',
+                            collections.OrderedDict())
+        monkeypatch.setattr(cert_plugin, 'CERT_PARSE_CACHE_SIZE', 2)
+        monkeypatch.setattr(cert_plugin.BaseCertObject, '_parse_certificate',
+                            parse_certificate)
+        self.obj = cert_plugin.cert(api)
+
+    def parse(self, certificate, key, full=True):
+        result = {'certificate': certificate}
+        self.obj._parse(result, full, cache_key=key)
+        return result
+
+    def test_reuse(self):
+        first = self.parse('cert1', ('issuer', 1))
+        second = self.parse('cert1', ('issuer', 1))
+        assert first == second
+        assert self.parsed == ['cert1']
+
+        # cached lists are not shared with the results
+        second['san_dnsname'].append(u'b')
+        assert self.parse('cert1', ('issuer', 1))['san_dnsname'] == [u'a']
+
+        # full and short results are cached separately
+        self.parse('cert1', ('issuer', 1), full=False)
+        assert self.parsed == ['cert1', 'cert1']
+
+    def test_different_certificate(self):
+        # a colliding key never returns the data of another certificate
+        self.parse('cert1', ('issuer', 1))
+        self.parse('cert2', ('issuer', 1))
+        assert self.parsed == ['cert1', 'cert2']
+
+    def test_lru(self):
+        self.parse('cert1', ('issuer', 1))
+        self.parse('cert2', ('issuer', 2))
+        # cert1 becomes the most recently used entry
+        self.parse('cert1', ('issuer', 1))
+        self.parse('cert3', ('issuer', 3))
+        assert self.parsed == ['cert1', 'cert2', 'cert3']
+
+        self.parse('cert1', ('issuer', 1))
+        assert self.parsed == ['cert1', 'cert2', 'cert3']
+        self.parse('cert2', ('issuer', 2))
+        assert self.parsed == ['cert1', 'cert2', 'cert3', 'cert2']
+
+    def test_no_cache_key(self):
+        self.parse('cert1', None)
+        self.parse('cert1', None)
+        assert self.parsed == ['cert1', 'cert1']
+
+
+@pytest.mark.tier0
+class TestGetCertificates:
+    """Test the concurrent retrieval of certificates in cert_find --all"""
+
+    class FakeEnv:
+        tls_ca_cert = None
+        in_tree = False
+
+    def make_ra(self):
+        from ipaserver.plugins import dogtag as dogtag_plugin
+
+        test = self
+
+        class FakeRA(dogtag_plugin.ra):
+            def _select_ca_host(self):
+                test.selected.append(threading.current_thread())
+                return 'ca.example'
+
+            def get_certificate(self, serial_number):
+                test.threads.add(threading.current_thread())
+                # the later requests finish first
+                time.sleep(0.01 * (10 - int(serial_number)))
+                if serial_number == test.failing:
+                    raise errors.CertificateOperationError(error=u'failed')
+                return {'certificate': u'cert%s' % serial_number}
+
+        fake_api = type('FakeAPI', (), {'env': self.FakeEnv()})()
+        self.selected = []
+        self.threads = set()
+        self.failing = None
+        return FakeRA(fake_api)
+
+    def test_order(self):
+        ra = self.make_ra()
+        serial_numbers = [str(i) for i in range(8)]
+        result = ra.get_certificates(serial_numbers)
+        assert result == [{'certificate': u'cert%d' % i} for i in range(8)]
+        assert len(self.threads) > 1
+        assert threading.current_thread() not in self.threads
+        # the CA host is selected before the workers start
+        assert self.selected == [threading.current_thread()]
+
+    def test_failure(self):
+        ra = self.make_ra()
+        self.failing = '3'
+        with pytest.raises(errors.CertificateOperationError):
+            ra.get_certificates([str(i) for i in range(8)])
+
+    def test_single(self):
+        ra = self.make_ra()
+        assert ra.get_certificates(['1']) == [{'certificate': u'cert1'}]
+        assert self.threads == {threading.current_thread()}
+        assert not self.selected
+
+    def test_sizelimit_before_fetch(self, monkeypatch):
+        from ipaserver.plugins import cert as cert_plugin
+
+        ra = self.make_ra()
+        fetched = []
+
+        def get_certificates(serial_numbers):
+            serial_numbers = list(serial_numbers)
+            fetched.extend(serial_numbers)
+            return [{'certificate': u'cert%s' % serial_number}
+                    for serial_number in serial_numbers]
+
+        def search(result, truncated):
+            def sub_search(self, **options):
+                return result, truncated, False
+            return sub_search
+
+        found = collections.OrderedDict(
+            (('issuer', i), {'cacn': u'ipa', 'serial_number': i})
+            for i in range(5))
+        monkeypatch.setattr(cert_plugin.cert_find, '_cert_search',
+                            search(found, True))
+        monkeypatch.setattr(cert_plugin.cert_find, '_ca_search',
+                            search({}, False))
+        monkeypatch.setattr(cert_plugin.cert_find, '_ldap_search',
+                            search({}, False))
+        monkeypatch.setattr(ra, 'get_certificates', get_certificates)
+
+        class FakeCommand:
+            @staticmethod
+            def ca_is_enabled():
+                return {'result': True}
+
+            @staticmethod
+            def ca_show(cacn, all=False):
+                return {'result': {}}
+
+        class FakeLDAP:
+            time_limit = None
+            size_limit = None
+
+        class FakeBackend:
+            def __init__(self):
+                self.ra = ra
+                self.ldap2 = FakeLDAP()
+
+        class FakeAPI:
+            def __init__(self):
+                self.env = TestGetCertificates.FakeEnv()
+                self.Command = FakeCommand()
+                self.Backend = FakeBackend()
+
+        cmd = cert_plugin.cert_find(FakeAPI())
+        result = cmd.execute(all=True, raw=True, sizelimit=2)
+        assert fetched == ['0', '1']
+        assert result['count'] == 2
+        assert result['truncated']
+        assert [obj['certificate'] for obj in result['result']] == [
+            u'cert0', u'cert1']
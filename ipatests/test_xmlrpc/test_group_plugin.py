@@ -561,6 +561,22 @@ class TestGroupMember(XMLRPC_test):
         group2.ensure_exists()
         group.remove_member(dict(group=group2.cn))
 
+    def test_add_and_remove_several_members(self, group, group2):
+        """ Add and remove an existing and a non-existent member at once """
+        group.ensure_exists()
+        group2.ensure_exists()
+        members = dict(group=[group2.cn, notagroup])
+
+        result = group.make_add_member_command(members)()
+        assert result['completed'] == 1
+        assert_deepequal([(notagroup, u'no such entry')],
+                         result['failed']['member']['group'])
+
+        result = group.make_remove_member_command(members)()
+        assert result['completed'] == 1
+        assert_deepequal([(notagroup, u'This entry is not a member')],
+                         result['failed']['member']['group'])
+
     def test_add_and_remove_group_from_admins(self, group, admins):
         """ Add group to protected admins group and then remove it """
         # Test scenario from ticket #4448
@@ -1052,6 +1052,32 @@ class test_idviews(Declarative):
             ),
         ),
 
+        dict(
+            desc=u'Apply %s to %s again and to a missing host' % (
+                idview1, host3),
+            command=(
+                'idview_apply',
+                [idview1],
+                dict(host=[get_fqdn(host3), get_fqdn(u'nonexistenthost')])
+            ),
+            expected=dict(
+                completed=0,
+                succeeded=dict(
+                    host=tuple(),
+                ),
+                failed=dict(
+                    memberhost=dict(
+                        host=([get_fqdn(host3),
+                               u'ID View already applied'],
+                              [get_fqdn(u'nonexistenthost'),
+                               u'not found'],),
+                        hostgroup=tuple(),
+                    ),
+                ),
+                summary=u'Applied ID View "%s"' % idview1,
+            ),
+        ),
+
         dict(
             desc='Check that %s has %s applied' % (host3, idview1),
             command=('host_show', [get_fqdn(host3)], {'all': True}),
@@ -29,6 +29,7 @@ import base64
 import datetime
 import ldap
 import re
+import threading
 
 from ipalib import api, errors
 from ipaplatform.constants import constants as platformconstants
@@ -1232,3 +1233,69 @@ def not_upg_check(response):
     assert_not_equal(response['result']['uidnumber'],
                      response['result']['gidnumber'])
     return True
+
+
+@pytest.mark.tier0
+class TestUserStatusReplicas:
+    """Test the concurrent retrieval of the lockout status from masters"""
+
+    class FakeEnv:
+        context = 'server'
+        ldap_pool_size = 2
+        ldap_pool_ttl = 60
+
+    def test_timeout(self, monkeypatch):
+        from ipalib import krb_utils
+        from ipalib.request import context, destroy_context
+        from ipaserver.plugins import user as user_plugin
+
+        principal = u'admin@EXAMPLE.TEST'
+        release = threading.Event()
+        closed = threading.Event()
+        clients = {}
+
+        class FakeClient:
+            def __init__(self, host):
+                self.host = host
+
+            def get_entry(self, dn, attrs_list):
+                if self.host == 'slow.example.test':
+                    release.wait()
+                return self.host
+
+            def unbind(self):
+                pass
+
+            def close(self):
+                closed.set()
+
+        class FakeUserStatus(user_plugin.user_status):
+            def _connect_replica(self, host, key, expires):
+                clients[host] = FakeClient(host)
+                return clients[host], expires
+
+        monkeypatch.setattr(user_plugin, 'USER_STATUS_DEADLINE', 0.1)
+        monkeypatch.setattr(krb_utils, 'get_credentials_if_valid',
+                            lambda: type('Creds', (), {'lifetime': 3600}))
+        fake_api = type('FakeAPI', (), {'env': self.FakeEnv()})()
+        cmd = FakeUserStatus(fake_api)
+        context.principal = principal
+        try:
+            results = cmd._get_replica_entries(
+                ['fast.example.test', 'slow.example.test'],
+                DN('uid=admin'), ['nsaccountlock'])
+        finally:
+            destroy_context()
+
+        assert results[0] == (None, 'fast.example.test')
+        stage, e = results[1]
+        assert stage == 'connect'
+        assert isinstance(e, errors.NetworkError)
+
+        # the master which responded too late is not pooled
+        release.set()
+        assert closed.wait(5)
+        pooled, _expires = cmd._pool.get(('fast.example.test', principal))
+        assert pooled is clients['fast.example.test']
+        pooled, _expires = cmd._pool.get(('slow.example.test', principal))
+        assert pooled is None